@@ -0,0 +1,31 @@
+"""Добавление колонок идентичности файла (file_inode, file_mtime_ns) в audio_files.
+
+Идентичность файла (inode + size + mtime) позволяет распознавать переименование или
+перемещение внутри папки модели и обновлять filename/storage_path на месте,
+сохраняя готовые расшифровки вместо удаления и повторной обработки.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3b7e4c1a9d25'
+down_revision: Union[str, Sequence[str], None] = 'f1ceca8f974f'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('audio_files', sa.Column('file_inode', sa.BigInteger(), nullable=True))
+    op.add_column('audio_files', sa.Column('file_mtime_ns', sa.BigInteger(), nullable=True))
+    op.create_index('ix_audio_files_whisper_model_file_inode', 'audio_files', ['whisper_model', 'file_inode'])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_audio_files_whisper_model_file_inode', table_name='audio_files')
+    op.drop_column('audio_files', 'file_mtime_ns')
+    op.drop_column('audio_files', 'file_inode')
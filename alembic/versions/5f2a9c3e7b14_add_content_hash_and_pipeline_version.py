@@ -0,0 +1,31 @@
+"""Добавление content_hash в audio_files и pipeline_version в transcripts.
+
+Кэш результатов: копия уже обработанного аудио (то же содержимое под другим именем)
+той же модели получает готовые Transcript/Translation/Summary по ключу
+(content_hash, whisper_model, pipeline_version) вместо повторного распознавания.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5f2a9c3e7b14'
+down_revision: Union[str, Sequence[str], None] = '8c41d2e07f6a'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('audio_files', sa.Column('content_hash', sa.String(length=64), nullable=True))
+    op.create_index('ix_audio_files_content_hash_whisper_model', 'audio_files', ['content_hash', 'whisper_model'])
+    op.add_column('transcripts', sa.Column('pipeline_version', sa.String(), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('transcripts', 'pipeline_version')
+    op.drop_index('ix_audio_files_content_hash_whisper_model', table_name='audio_files')
+    op.drop_column('audio_files', 'content_hash')
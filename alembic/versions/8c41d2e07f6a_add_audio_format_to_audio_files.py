@@ -0,0 +1,29 @@
+"""Добавление параметров аудио (sample_rate, channels) в audio_files.
+
+Длительность, частота, число каналов и MIME-тип определяются по заголовкам файла
+при добавлении записи (`app.processing.probe`); audio_duration_seconds и content_type
+уже есть в таблице.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8c41d2e07f6a'
+down_revision: Union[str, Sequence[str], None] = '3b7e4c1a9d25'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('audio_files', sa.Column('sample_rate', sa.Integer(), nullable=True))
+    op.add_column('audio_files', sa.Column('channels', sa.Integer(), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('audio_files', 'channels')
+    op.drop_column('audio_files', 'sample_rate')
@@ -0,0 +1,26 @@
+"""Добавление языка речи (language) в transcripts.
+
+Язык определяет движок ASR при распознавании; этап перевода берёт его как исходный
+язык и не переводит текст на тот же язык.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a7d3e9f1c2b8'
+down_revision: Union[str, Sequence[str], None] = '5f2a9c3e7b14'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('transcripts', sa.Column('language', sa.String(), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('transcripts', 'language')
@@ -8,13 +8,14 @@
 `app.db.ops.sync_impl` — там реализованы те же операции в синхронном виде.
 """
 
-from typing import Optional, List, Any, cast
+from typing import Optional, List, Any, AsyncIterator, Sequence, cast
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy import select
 from datetime import datetime
 
 from app.models.audio_file import AudioFile
+from app.db.ops.rows import DEFAULT_COLUMNS, row_type, select_columns
 from app.utils.settings import settings
 
 
@@ -90,6 +91,21 @@ async def get_all_audio_files() -> List[AudioFile]:
         return list(q.scalars().all())
 
 
+async def stream_audio_files(columns: Sequence[str] = DEFAULT_COLUMNS, batch_size: int = 1000,
+                             **filters) -> AsyncIterator[Any]:
+    """Потоково вернуть записи как компактные namedtuple `AudioFileRow`.
+
+    Async-аналог `iter_audio_files_sync`: только запрошенные колонки, строки
+    читаются пачками через server-side курсор (`AsyncSession.stream`).
+    """
+    make_row = row_type(columns)
+    stmt = select(*select_columns(columns)).filter_by(**filters).execution_options(yield_per=batch_size)
+    async with AsyncSessionLocal() as s:
+        result = await s.stream(stmt)
+        async for row in result:
+            yield make_row(*row)
+
+
 async def update_audio_file_status(audio_file_id: int, status):
     """Обновить статус записи по её id. Возвращает True/False по успеху."""
     async with AsyncSessionLocal() as s:
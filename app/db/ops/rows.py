@@ -0,0 +1,33 @@
+"""
+Компактные строки audio_files для потокового чтения.
+
+Вместо полноценных ORM-объектов `AudioFile` потоковые хелперы (`iter_audio_files_sync`,
+`stream_audio_files`) возвращают namedtuple только с запрошенными колонками:
+namedtuple не имеет `__dict__` (`__slots__ = ()`), поэтому миллион строк занимает
+память порядка кортежей, а не ORM identity map.
+"""
+
+from collections import namedtuple
+from typing import Any, Dict, List, Sequence, Tuple
+
+from app.models.audio_file import AudioFile
+
+DEFAULT_COLUMNS: Tuple[str, ...] = ("id", "filename", "whisper_model")
+
+_row_types: Dict[Tuple[str, ...], Any] = {}
+
+
+def row_type(columns: Sequence[str]):
+    """Вернуть (кэшированный) namedtuple-тип `AudioFileRow` для набора колонок."""
+    key = tuple(columns)
+    if key not in _row_types:
+        _row_types[key] = namedtuple("AudioFileRow", key)  # type: ignore[misc]
+    return _row_types[key]
+
+
+def select_columns(columns: Sequence[str]) -> List[Any]:
+    """Колонки модели AudioFile по именам (ValueError для неизвестного имени)."""
+    try:
+        return [AudioFile.__table__.c[name] for name in columns]
+    except KeyError as e:
+        raise ValueError(f"Unknown audio_files column: {e}") from None
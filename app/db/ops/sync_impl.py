@@ -6,13 +6,19 @@
 аналогами в `app.db.ops.async_impl`.
 """
 
-from typing import Optional, List
-from sqlalchemy import create_engine
+import os
+from contextlib import contextmanager
+from typing import Optional, List, Iterator, Tuple, Sequence, Dict, Any, cast
+from sqlalchemy import create_engine, event, select, delete, insert, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.engine import CursorResult
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy.exc import IntegrityError
 from datetime import datetime
 
 from app.models.audio_file import AudioFile
+from app.models.enums import AudioFileStatus, SummaryStatus, TranscriptStatus, TranslationStatus, WhisperModel
+from app.db.ops.rows import DEFAULT_COLUMNS, row_type, select_columns
 # ensure related models are imported so SQLAlchemy can resolve relationships
 from app.models import transcript  # noqa: F401
 from app.models import translation  # noqa: F401
@@ -38,7 +44,9 @@ def get_audio_file_by_id_sync(audio_file_id: int) -> Optional[AudioFile]:
 
 
 def add_audio_file_sync(user_id: int, filename: str, original_name: str, content_type: str,
-                        size: int, whisper_model: str, storage_path: str, audio_duration_seconds: float) -> Optional[int]:
+                        size: int, whisper_model: str, storage_path: str, audio_duration_seconds: float,
+                        file_inode: Optional[int] = None, file_mtime_ns: Optional[int] = None,
+                        sample_rate: Optional[int] = None, channels: Optional[int] = None) -> Optional[int]:
     """Добавить запись в таблицу и вернуть её id.
 
     Если вставка ломается из-за уникального ограничения, функция откатывает
@@ -57,6 +65,10 @@ def add_audio_file_sync(user_id: int, filename: str, original_name: str, content
                 status='uploaded',
                 storage_path=storage_path,
                 audio_duration_seconds=audio_duration_seconds,
+                file_inode=file_inode,
+                file_mtime_ns=file_mtime_ns,
+                sample_rate=sample_rate,
+                channels=channels,
             )
             s.add(af)
             s.commit()
@@ -67,6 +79,120 @@ def add_audio_file_sync(user_id: int, filename: str, original_name: str, content
             return existing.id if existing else None
 
 
+def _as_whisper_model(value) -> WhisperModel:
+    """Привести 'base' / 'BASE' / WhisperModel.BASE к члену enum WhisperModel."""
+    return WhisperModel(str(getattr(value, "value", value)).lower())
+
+
+def _insert_for_dialect():
+    """Вернуть конструктор INSERT с поддержкой ON CONFLICT для текущего движка."""
+    if _engine.dialect.name == "sqlite":
+        return sqlite.insert
+    return postgresql.insert
+
+
+def add_audio_files_bulk_sync(files: Sequence[Dict[str, Any]], user_id: int = 1,
+                              chunk_size: int = 500, columns: Optional[Sequence[str]] = None) -> List[Any]:
+    """Вставить пачку записей AudioFile и вернуть id только реально новых строк.
+
+    Каждый chunk — один `INSERT ... ON CONFLICT (filename, whisper_model) DO NOTHING
+    RETURNING id`, поэтому уже существующие файлы молча пропускаются без
+    IntegrityError и повторных SELECT'ов.
+
+    Args:
+        files: словари с ключами filename, whisper_model, storage_path, size и
+            необязательными original_name, content_type, audio_duration_seconds,
+            sample_rate, channels (см. `app.processing.probe`),
+            inode, mtime_ns (идентичность файла для распознавания переименований).
+        user_id (int): владелец новых записей.
+        chunk_size (int): количество строк в одном INSERT.
+        columns: если задано — вернуть не id, а `AudioFileRow` с этими колонками новых строк
+            (через тот же RETURNING, без дополнительного SELECT).
+    """
+    new_rows: List[Any] = []
+    now = datetime.now()
+    with _Session() as s:
+        for start in range(0, len(files), chunk_size):
+            new_rows.extend(_execute_insert(s, files[start:start + chunk_size], user_id, now, columns))
+            s.commit()
+    return new_rows
+
+
+def _execute_insert(s, files: Sequence[Dict[str, Any]], user_id: int, now: datetime,
+                    columns: Optional[Sequence[str]]) -> List[Any]:
+    stmt = _insert_ignore_stmt(files, user_id, now)
+    if columns is None:
+        return list(s.execute(stmt.returning(AudioFile.id)).scalars().all())
+    make_row = row_type(columns)
+    return [make_row(*r) for r in s.execute(stmt.returning(*select_columns(columns))).all()]
+
+
+def _insert_ignore_stmt(files: Sequence[Dict[str, Any]], user_id: int, now: datetime):
+    """`INSERT ... ON CONFLICT (filename, whisper_model) DO NOTHING` для пачки файлов (RETURNING — у вызывающего)."""
+    insert = _insert_for_dialect()
+    rows = [
+        {
+            "user_id": user_id,
+            "filename": f["filename"],
+            "original_name": f.get("original_name") or f["filename"],
+            "content_type": f.get("content_type") or "audio/unknown",
+            "size": f["size"],
+            "upload_time": now,
+            "whisper_model": _as_whisper_model(f["whisper_model"]),
+            "status": AudioFileStatus.UPLOADED,
+            "storage_path": f["storage_path"],
+            "audio_duration_seconds": f.get("audio_duration_seconds") or 0.0,
+            "file_inode": f.get("inode") or None,
+            "file_mtime_ns": f.get("mtime_ns"),
+            "sample_rate": f.get("sample_rate"),
+            "channels": f.get("channels"),
+        }
+        for f in files
+    ]
+    return (
+        insert(AudioFile)
+        .values(rows)
+        .on_conflict_do_nothing(index_elements=["filename", "whisper_model"])
+    )
+
+
+def apply_file_events_sync(adds: Sequence[Dict[str, Any]], deletes: Sequence[Tuple[str, str]],
+                           user_id: int = 1, chunk_size: int = 500,
+                           columns: Optional[Sequence[str]] = None) -> Tuple[List[Any], int]:
+    """Применить пачку событий watcher'а (удаления и добавления) одной транзакцией.
+
+    Удаления выполняются первыми: файл, удалённый и созданный заново в одном окне,
+    получает новую запись. Вставка — `ON CONFLICT DO NOTHING`, как в `add_audio_files_bulk_sync`.
+
+    Args:
+        adds: словари файлов (формат `add_audio_files_bulk_sync`).
+        deletes: пары `(whisper_model, filename)`.
+        columns: как в `add_audio_files_bulk_sync`.
+
+    Returns:
+        (new_ids, deleted): id (или `AudioFileRow`) вставленных строк и число удалённых строк.
+    """
+    by_model: Dict[WhisperModel, List[str]] = {}
+    for model_name, filename in deletes:
+        by_model.setdefault(_as_whisper_model(model_name), []).append(filename)
+    new_ids: List[Any] = []
+    deleted = 0
+    now = datetime.now()
+    with _Session() as s:
+        for model, names in by_model.items():
+            for start in range(0, len(names), chunk_size):
+                result = cast(CursorResult, s.execute(
+                    delete(AudioFile)
+                    .where((AudioFile.whisper_model == model) & AudioFile.filename.in_(names[start:start + chunk_size]))
+                    .execution_options(synchronize_session=False)
+                ))
+                deleted += result.rowcount or 0
+        for start in range(0, len(adds), chunk_size):
+            new_ids.extend(_execute_insert(s, adds[start:start + chunk_size], user_id, now, columns))
+        s.commit()
+    return new_ids, deleted
+
+
 def delete_audio_file_sync(filename: str, whisper_model: str) -> bool:
     """Удалить запись по имени файла и модели. Возвращает True/False по успеху."""
     with _Session() as s:
@@ -78,6 +204,27 @@ def delete_audio_file_sync(filename: str, whisper_model: str) -> bool:
         return False
 
 
+def delete_audio_files_by_ids_sync(ids: Sequence[int], chunk_size: int = 500) -> int:
+    """Удалить записи AudioFile по списку id, один DELETE на chunk.
+
+    Связанные Transcript/Translation/Summary не загружаются в сессию — их
+    удаляет сама БД через `ON DELETE CASCADE` внешних ключей.
+
+    Returns:
+        int: количество удалённых строк.
+    """
+    deleted = 0
+    with _Session() as s:
+        for start in range(0, len(ids), chunk_size):
+            chunk = list(ids[start:start + chunk_size])
+            result = cast(CursorResult, s.execute(
+                delete(AudioFile).where(AudioFile.id.in_(chunk)).execution_options(synchronize_session=False)
+            ))
+            deleted += result.rowcount or 0
+            s.commit()
+    return deleted
+
+
 def get_all_audio_files_sync() -> List[AudioFile]:
     """Вернуть все записи AudioFile как список моделей."""
     with _Session() as s:
@@ -93,3 +240,462 @@ def update_audio_file_status_sync(audio_file_id: int, status):
         af.status = status
         s.commit()
         return True
+
+
+def _transcript_values(status: TranscriptStatus, text: Optional[str], processing_seconds: Optional[float],
+                       audio_duration_seconds: Optional[float], now: datetime,
+                       pipeline_version: Optional[str] = None, language: Optional[str] = None) -> Dict[str, Any]:
+    return {
+        'status': status,
+        'pipeline_version': pipeline_version,
+        'text': text,
+        'language': language,
+        'text_chars': len(text) if text is not None else None,
+        'processing_seconds': processing_seconds,
+        'real_time_factor': (processing_seconds / audio_duration_seconds
+                             if processing_seconds is not None and audio_duration_seconds else None),
+        'updated_at': now,
+    }
+
+
+def save_transcript_sync(audio_file_id: int, status: TranscriptStatus, text: Optional[str] = None,
+                         processing_seconds: Optional[float] = None,
+                         audio_duration_seconds: Optional[float] = None,
+                         pipeline_version: Optional[str] = None,
+                         audio_file_status: Optional[AudioFileStatus] = None,
+                         language: Optional[str] = None) -> Optional[int]:
+    """Создать или обновить транскрипт записи (один на audio_file). Возвращает id транскрипта.
+
+    Если задан `audio_file_status`, статус записи меняется в той же транзакции.
+    """
+    now = datetime.now()
+    with _Session() as s:
+        af = s.get(AudioFile, audio_file_id)
+        if af is None:
+            return None
+        if audio_file_status is not None:
+            af.status = audio_file_status
+        values = _transcript_values(status, text, processing_seconds, audio_duration_seconds, now, pipeline_version,
+                                    language)
+        tr = s.query(transcript.Transcript).filter_by(audio_file_id=audio_file_id).first()
+        if tr is None:
+            tr = transcript.Transcript(audio_file_id=audio_file_id, created_at=now, **values)
+            s.add(tr)
+        else:
+            for name, value in values.items():
+                setattr(tr, name, value)
+        s.commit()
+        return tr.id
+
+
+def claim_audio_files_sync(ids: Sequence[int],
+                           columns: Sequence[str] = ("id", "filename", "storage_path", "audio_duration_seconds")
+                           ) -> List[Any]:
+    """Пометить записи PROCESSING и вернуть их строки `AudioFileRow` одной транзакцией.
+
+    Отсутствующие (удалённые) id пропускаются; порядок строк — порядок `ids`.
+    """
+    if not ids:
+        return []
+    make_row = row_type(columns)
+    cols = list(columns) if "id" in columns else ["id", *columns]
+    with _Session() as s:
+        found = {row[cols.index("id")]: row for row in s.execute(
+            select(*select_columns(cols)).where(AudioFile.id.in_(list(ids)))
+        )}
+        if found:
+            s.execute(update(AudioFile).where(AudioFile.id.in_(list(found))).values(status=AudioFileStatus.PROCESSING))
+        s.commit()
+    return [make_row(*(found[i][cols.index(c)] for c in columns)) for i in ids if i in found]
+
+
+def save_transcripts_sync(results: Sequence[Dict[str, Any]],
+                          done_status: AudioFileStatus = AudioFileStatus.DONE) -> int:
+    """Сохранить транскрипты пачки записей и их статусы одной транзакцией.
+
+    Args:
+        results: словари {audio_file_id, status (TranscriptStatus), text, processing_seconds,
+            audio_duration_seconds, pipeline_version, language}.
+        done_status: статус записи при TranscriptStatus.DONE (при ошибке — FAILED).
+
+    Returns:
+        int: число сохранённых транскриптов (удалённые за время обработки записи пропускаются).
+    """
+    if not results:
+        return 0
+    now = datetime.now()
+    ids = [r['audio_file_id'] for r in results]
+    with _Session() as s:
+        alive = set(s.execute(select(AudioFile.id).where(AudioFile.id.in_(ids))).scalars())
+        existing = {
+            tr.audio_file_id: tr
+            for tr in s.query(transcript.Transcript).filter(transcript.Transcript.audio_file_id.in_(list(alive)))
+        }
+        statuses: Dict[AudioFileStatus, List[int]] = {}
+        new_rows = []
+        for r in results:
+            audio_file_id = r['audio_file_id']
+            if audio_file_id not in alive:
+                continue
+            values = _transcript_values(r['status'], r.get('text'), r.get('processing_seconds'),
+                                        r.get('audio_duration_seconds'), now, r.get('pipeline_version'),
+                                        r.get('language'))
+            tr = existing.get(audio_file_id)
+            if tr is None:
+                new_rows.append({'audio_file_id': audio_file_id, 'created_at': now, **values})
+            else:
+                for name, value in values.items():
+                    setattr(tr, name, value)
+            status = done_status if r['status'] == TranscriptStatus.DONE else AudioFileStatus.FAILED
+            statuses.setdefault(status, []).append(audio_file_id)
+        if new_rows:
+            s.execute(insert(transcript.Transcript), new_rows)
+        for status, status_ids in statuses.items():
+            s.execute(update(AudioFile).where(AudioFile.id.in_(status_ids)).values(status=status))
+        s.commit()
+    return sum(len(v) for v in statuses.values())
+
+
+def get_pipeline_state_sync(audio_file_id: int) -> Optional[Dict[str, Any]]:
+    """Состояние этапов обработки записи одним запросом (None, если записи нет).
+
+    Returns:
+        dict: {transcript_id, transcript_status, transcript_text, transcript_language, pipeline_version,
+            translation_id, translation_status, source_language, text_en, text_ru, summary_status};
+            поля отсутствующих этапов — None.
+    """
+    Transcript, Translation, Summary = transcript.Transcript, translation.Translation, summary.Summary
+    stmt = (
+        select(AudioFile.id, Transcript.id, Transcript.status, Transcript.text, Transcript.language,
+               Transcript.pipeline_version,
+               Translation.id, Translation.status, Translation.source_language, Translation.text_en,
+               Translation.text_ru, Summary.status)
+        .outerjoin(Transcript, Transcript.audio_file_id == AudioFile.id)
+        .outerjoin(Translation, Translation.transcript_id == Transcript.id)
+        .outerjoin(Summary, Summary.translation_id == Translation.id)
+        .where(AudioFile.id == audio_file_id)
+    )
+    with _Session() as s:
+        row = s.execute(stmt).first()
+    if row is None:
+        return None
+    keys = ('audio_file_id', 'transcript_id', 'transcript_status', 'transcript_text', 'transcript_language',
+            'pipeline_version',
+            'translation_id', 'translation_status', 'source_language', 'text_en', 'text_ru', 'summary_status')
+    return dict(zip(keys, row))
+
+
+def completed_transcripts_sync(ids: Sequence[int], pipeline_version: str) -> List[int]:
+    """id записей из `ids`, у которых уже есть транскрипт DONE версии `pipeline_version`."""
+    if not ids:
+        return []
+    Transcript = transcript.Transcript
+    with _Session() as s:
+        return list(s.execute(
+            select(Transcript.audio_file_id).where(
+                Transcript.audio_file_id.in_(list(ids)), Transcript.status == TranscriptStatus.DONE,
+                Transcript.pipeline_version == pipeline_version,
+            )
+        ).scalars())
+
+
+def save_translation_sync(transcript_id: int, status: TranslationStatus, source_language: Optional[str] = None,
+                          text_en: Optional[str] = None, text_ru: Optional[str] = None,
+                          processing_seconds: Optional[float] = None,
+                          audio_file_status: Optional[AudioFileStatus] = None) -> Optional[int]:
+    """Создать или обновить перевод транскрипта (и, если задан, статус записи) одной транзакцией.
+
+    Returns:
+        id перевода или None, если транскрипта нет.
+    """
+    now = datetime.now()
+    with _Session() as s:
+        tr = s.get(transcript.Transcript, transcript_id)
+        if tr is None:
+            return None
+        texts = [t for t in (text_en, text_ru) if t is not None]
+        values = {
+            'status': status,
+            'source_language': source_language or 'unknown',
+            'text_en': text_en,
+            'text_ru': text_ru,
+            'processing_seconds': processing_seconds,
+            'text_chars': sum(len(t) for t in texts) if texts else None,
+            'updated_at': now,
+        }
+        tl = s.query(translation.Translation).filter_by(transcript_id=transcript_id).first()
+        if tl is None:
+            tl = translation.Translation(transcript_id=transcript_id, created_at=now, **values)
+            s.add(tl)
+        else:
+            for name, value in values.items():
+                setattr(tl, name, value)
+        if audio_file_status is not None:
+            s.execute(update(AudioFile).where(AudioFile.id == tr.audio_file_id).values(status=audio_file_status))
+        s.commit()
+        return tl.id
+
+
+def save_summary_sync(translation_id: int, status: SummaryStatus, base_language: str, target_language: str,
+                      text: Optional[str] = None,
+                      audio_file_status: Optional[AudioFileStatus] = None) -> Optional[int]:
+    """Создать или обновить саммари перевода (и, если задан, статус записи) одной транзакцией.
+
+    Returns:
+        id саммари или None, если перевода нет.
+    """
+    now = datetime.now()
+    with _Session() as s:
+        tl = s.get(translation.Translation, translation_id)
+        if tl is None:
+            return None
+        values = {
+            'status': status,
+            'base_language': base_language,
+            'target_language': target_language,
+            'text': text,
+            'updated_at': now,
+        }
+        sm = s.query(summary.Summary).filter_by(translation_id=translation_id).first()
+        if sm is None:
+            sm = summary.Summary(translation_id=translation_id, created_at=now, **values)
+            s.add(sm)
+        else:
+            for name, value in values.items():
+                setattr(sm, name, value)
+        if audio_file_status is not None:
+            s.execute(update(AudioFile).where(AudioFile.id == tl.transcript.audio_file_id)
+                      .values(status=audio_file_status))
+        s.commit()
+        return sm.id
+
+
+def _clone(obj, **overrides):
+    """Копия ORM-строки без первичного ключа (со значениями `overrides`)."""
+    values = {c.key: getattr(obj, c.key) for c in obj.__table__.columns if c.key != 'id'}
+    values.update(overrides)
+    return type(obj)(**values)
+
+
+def reuse_cached_results_sync(files: Sequence[Tuple[int, Optional[str]]], whisper_model,
+                              pipeline_version: str,
+                              audio_file_status: AudioFileStatus = AudioFileStatus.DONE) -> Dict[int, int]:
+    """Сохранить отпечатки записей и скопировать им готовые результаты копий того же аудио.
+
+    Для каждой пары (audio_file_id, content_hash) одной транзакцией: content_hash
+    сохраняется в записи; если у другой записи той же модели с тем же content_hash есть
+    транскрипт DONE версии `pipeline_version`, транскрипт (и его Translation/Summary)
+    копируется, а запись получает статус `audio_file_status`. Время обработки копий — 0.
+
+    Returns:
+        dict: {audio_file_id: id записи-источника} для записей, получивших результаты.
+    """
+    hashed: List[Tuple[int, str]] = [(i, h) for i, h in files if h]
+    if not hashed:
+        return {}
+    model = _as_whisper_model(whisper_model)
+    ids = [i for i, _ in hashed]
+    hashes = sorted({h for _, h in hashed})
+    Transcript = transcript.Transcript
+    now = datetime.now()
+    reused: Dict[int, int] = {}
+    with _Session() as s:
+        s.execute(update(AudioFile), [{'id': i, 'content_hash': h} for i, h in hashed])
+        sources: Dict[str, Any] = {}
+        for tr, af_hash in s.execute(
+            select(Transcript, AudioFile.content_hash)
+            .join(AudioFile, Transcript.audio_file_id == AudioFile.id)
+            .where(AudioFile.content_hash.in_(hashes), AudioFile.whisper_model == model,
+                   AudioFile.id.not_in(ids), Transcript.status == TranscriptStatus.DONE,
+                   Transcript.pipeline_version == pipeline_version)
+            .order_by(Transcript.id)
+        ):
+            if af_hash is not None:
+                sources.setdefault(af_hash, tr)
+        targets = [(i, sources[h]) for i, h in hashed if h in sources]
+        if targets:
+            existing = {
+                tr.audio_file_id: tr for tr in s.query(Transcript).filter(
+                    Transcript.audio_file_id.in_([i for i, _ in targets]))
+            }
+            for audio_file_id, source in targets:
+                # повторная обработка: старый транскрипт (с переводом и саммари) заменяется
+                if audio_file_id in existing:
+                    s.delete(existing[audio_file_id])
+            s.flush()
+            for audio_file_id, source in targets:
+                copy = _clone(source, audio_file_id=audio_file_id, processing_seconds=0.0, real_time_factor=0.0,
+                              created_at=now, updated_at=now)
+                if source.translation is not None:
+                    copy.translation = _clone(source.translation, transcript_id=None, processing_seconds=0.0,
+                                              created_at=now, updated_at=now)
+                    if source.translation.summary is not None:
+                        copy.translation.summary = _clone(source.translation.summary, translation_id=None,
+                                                          created_at=now, updated_at=now)
+                s.add(copy)
+                reused[audio_file_id] = source.audio_file_id
+            s.execute(update(AudioFile).where(AudioFile.id.in_(list(reused))).values(status=audio_file_status))
+        s.commit()
+    return reused
+
+
+def iter_audio_files_sync(columns: Sequence[str] = DEFAULT_COLUMNS, batch_size: int = 1000,
+                          **filters) -> Iterator[Any]:
+    """Потоково вернуть записи audio_files как компактные namedtuple `AudioFileRow`.
+
+    Читается только перечисленный набор колонок; строки приходят пачками по
+    `batch_size` через server-side курсор (`yield_per`), так что обход таблицы любого
+    размера идёт в постоянной памяти. Enum-колонки возвращаются членами enum.
+
+    Args:
+        columns: имена колонок audio_files.
+        batch_size: размер пачки курсора.
+        filters: равенства по колонкам (как в `filter_by`).
+    """
+    make_row = row_type(columns)
+    stmt = select(*select_columns(columns)).filter_by(**filters).execution_options(yield_per=batch_size)
+    with _Session() as s:
+        for row in s.execute(stmt):
+            yield make_row(*row)
+
+
+def iter_audio_file_keys_sync(batch_size: int = 1000) -> Iterator[Tuple[int, str, str]]:
+    """Потоково вернуть `(id, filename, whisper_model)` всех записей.
+
+    `whisper_model` возвращается как строковое значение enum (имя подпапки в
+    storage, например 'base').
+    """
+    for row in iter_audio_files_sync(("id", "filename", "whisper_model"), batch_size=batch_size):
+        yield row.id, row.filename, getattr(row.whisper_model, "value", row.whisper_model)
+
+
+# Колонки идентичности файла: по ним сверка распознаёт переименования
+_IDENTITY_COLUMNS = ("id", "filename", "size", "file_inode", "file_mtime_ns")
+
+
+def iter_audio_file_keys_in_range_sync(whisper_model: str, after: Optional[str] = None, upto: Optional[str] = None,
+                                       batch_size: int = 1000) -> Iterator[Any]:
+    """Потоково вернуть строки `(id, filename, size, file_inode, file_mtime_ns)` одной модели
+    с filename в диапазоне `(after, upto]`.
+
+    Сравнение и сортировка выполняются побайтово (COLLATE "C" в PostgreSQL), чтобы
+    порядок совпадал с сортировкой строк в Python и диапазоны шардов синхронизации
+    покрывали таблицу без пропусков. `None` на любой границе означает «без ограничения».
+    """
+    model = _as_whisper_model(whisper_model)
+    name = AudioFile.filename if _engine.dialect.name == "sqlite" else AudioFile.filename.collate("C")
+    cond = AudioFile.whisper_model == model
+    if after is not None:
+        cond = cond & (name > after)
+    if upto is not None:
+        cond = cond & (name <= upto)
+    with _Session() as s:
+        result = s.execute(
+            select(*select_columns(_IDENTITY_COLUMNS))
+            .where(cond).order_by(name).execution_options(yield_per=batch_size)
+        )
+        make_row = row_type(_IDENTITY_COLUMNS)
+        for r in result:
+            yield make_row(*r)
+
+
+def get_audio_file_ids_sync(whisper_model: str, filenames: Sequence[str], chunk_size: int = 500) -> Dict[str, int]:
+    """Вернуть `{filename: id}` для указанных файлов одной модели (один SELECT на chunk)."""
+    model = _as_whisper_model(whisper_model)
+    found: Dict[str, int] = {}
+    with _Session() as s:
+        for start in range(0, len(filenames), chunk_size):
+            chunk = list(filenames[start:start + chunk_size])
+            rows = s.execute(
+                select(AudioFile.filename, AudioFile.id).where(
+                    (AudioFile.whisper_model == model) & (AudioFile.filename.in_(chunk))
+                )
+            )
+            found.update({filename: id_ for filename, id_ in rows})
+    return found
+
+
+def find_audio_files_by_inode_sync(whisper_model: str, inodes: Sequence[int]) -> List[Any]:
+    """Найти записи одной модели по inode файла (кандидаты на переименование).
+
+    Returns:
+        List[AudioFileRow]: строки с полями id, filename, size, file_inode, file_mtime_ns.
+    """
+    inodes = [i for i in inodes if i]
+    if not inodes:
+        return []
+    model = _as_whisper_model(whisper_model)
+    make_row = row_type(_IDENTITY_COLUMNS)
+    with _Session() as s:
+        rows = s.execute(
+            select(*select_columns(_IDENTITY_COLUMNS)).where(
+                (AudioFile.whisper_model == model) & (AudioFile.file_inode.in_(inodes))
+            )
+        )
+        return [make_row(*r) for r in rows]
+
+
+def rename_audio_files_sync(whisper_model: str, renames: Sequence[Tuple[str, str]]) -> Dict[str, int]:
+    """Переименовать записи одной модели на месте, сохраняя связанные результаты.
+
+    Для каждой пары `(old_filename, new_filename)` обновляются filename и storage_path.
+    Если запись под новым именем уже существует (например, её успел вставить путь
+    добавления), старая запись — сирота и удаляется. Отсутствующая старая запись
+    пропускается: операция идемпотентна для повторных доставок.
+
+    Returns:
+        dict: {'renamed': n, 'deleted': n, 'missing': n}
+    """
+    model = _as_whisper_model(whisper_model)
+    stats = {"renamed": 0, "deleted": 0, "missing": 0}
+    with _Session() as s:
+        for old, new in renames:
+            old_id = s.execute(
+                select(AudioFile.id).where((AudioFile.whisper_model == model) & (AudioFile.filename == old))
+            ).scalar()
+            if old_id is None:
+                stats["missing"] += 1
+                continue
+            new_id = s.execute(
+                select(AudioFile.id).where((AudioFile.whisper_model == model) & (AudioFile.filename == new))
+            ).scalar()
+            if new_id is not None:
+                s.execute(delete(AudioFile).where(AudioFile.id == old_id).execution_options(synchronize_session=False))
+                stats["deleted"] += 1
+                continue
+            s.execute(
+                update(AudioFile).where(AudioFile.id == old_id)
+                .values(filename=new, storage_path=os.path.join(model.value, new))
+                .execution_options(synchronize_session=False)
+            )
+            stats["renamed"] += 1
+        s.commit()
+    return stats
+
+
+class QueryCounter:
+    """Счётчик SQL-выражений, отправленных движком внутри `count_queries()`."""
+
+    def __init__(self) -> None:
+        self.count = 0
+
+    def _on_execute(self, conn, cursor, statement, parameters, context, executemany) -> None:
+        self.count += 1
+
+
+@contextmanager
+def count_queries() -> Iterator[QueryCounter]:
+    """Посчитать количество SQL-запросов к БД внутри блока `with`.
+
+    Пример:
+        with count_queries() as counter:
+            ...
+        print(counter.count)
+    """
+    counter = QueryCounter()
+    engine = _engine
+    event.listen(engine, "before_cursor_execute", counter._on_execute)
+    try:
+        yield counter
+    finally:
+        event.remove(engine, "before_cursor_execute", counter._on_execute)
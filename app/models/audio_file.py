@@ -14,16 +14,20 @@
 Примечания:
     - Модель использует типы Enum для полей статуса и выбора модели Whisper.
     - В таблице присутствует уникальный индекс на (filename, whisper_model).
+    - Индекс (whisper_model, file_inode) используется для поиска переименованных файлов.
+    - Индекс (content_hash, whisper_model) — поиск готовых результатов для копии того же
+      аудио (кэш результатов, см. `app.processing.fingerprint`).
 """
 
 from __future__ import annotations
 
 import sqlalchemy
-from sqlalchemy import Integer, String, DateTime, ForeignKey, Float
+from sqlalchemy import Integer, BigInteger, String, DateTime, ForeignKey, Float
 from sqlalchemy import sql as sqlalchemy_sql
 from sqlalchemy.orm import relationship, Mapped, mapped_column
 from sqlalchemy.types import Enum as SQLEnum
 from datetime import datetime
+from typing import Optional
 
 from .database import Base
 from app.models.enums import AudioFileStatus, WhisperModel
@@ -43,10 +47,20 @@ class AudioFile(Base):
         whisper_model (str): Название модели Whisper, выбранной для транскрибации.
         status (str): Статус обработки: uploaded, processing, done, failed.
         storage_path (str): Относительный путь (model/user/filename).
+        file_inode (int | None): inode файла на диске.
+        file_mtime_ns (int | None): mtime файла (нс) на момент регистрации. Вместе с
+            file_inode и size — идентичность файла для распознавания переименований.
+        audio_duration_seconds (float): длительность по заголовкам (`app.processing.probe`), 0 — неизвестна.
+        sample_rate (int | None): частота дискретизации, Гц.
+        channels (int | None): число каналов.
+        content_hash (str | None): SHA-256 содержимого файла; считается один раз при первой
+            обработке.
     """
     __tablename__ = "audio_files"
     __table_args__ = (
         sqlalchemy.UniqueConstraint('filename', 'whisper_model', name='uix_filename_whisper_model'),
+        sqlalchemy.Index('ix_audio_files_whisper_model_file_inode', 'whisper_model', 'file_inode'),
+        sqlalchemy.Index('ix_audio_files_content_hash_whisper_model', 'content_hash', 'whisper_model'),
         {'sqlite_autoincrement': True}
     )
 
@@ -61,8 +75,13 @@ class AudioFile(Base):
     status: Mapped[AudioFileStatus] = mapped_column(SQLEnum(AudioFileStatus), nullable=False, default=AudioFileStatus.UPLOADED)
     storage_path: Mapped[str] = mapped_column(String, nullable=False)
     audio_duration_seconds: Mapped[float] = mapped_column(Float, nullable=False)
+    file_inode: Mapped[Optional[int]] = mapped_column(BigInteger, nullable=True)
+    file_mtime_ns: Mapped[Optional[int]] = mapped_column(BigInteger, nullable=True)
+    sample_rate: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)
+    channels: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)
+    content_hash: Mapped[Optional[str]] = mapped_column(String(64), nullable=True)
 
-    transcript: Mapped["Transcript"] = relationship("Transcript", back_populates="audio_file", uselist=False, cascade="all, delete-orphan")
+    transcript: Mapped["Transcript"] = relationship("Transcript", back_populates="audio_file", uselist=False, cascade="all, delete-orphan", passive_deletes=True)
     user: Mapped["User"] = relationship("User")
 
 from typing import TYPE_CHECKING
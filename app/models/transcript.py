@@ -3,7 +3,8 @@
 
 Содержит ORM-модель транскрипта, которая привязана к записи в таблице
 `audio_files` через внешний ключ. Модель хранит текст транскрипта,
-статус обработки, метрики производительности и временные метки.
+язык речи, определённый движком ASR, статус обработки, метрики производительности, версию конвейера, которым
+получен результат (`pipeline_version`), и временные метки.
 
 Используется совместно с моделями `Translation` и `AudioFile`.
 """
@@ -30,14 +31,16 @@ class Transcript(Base):
     audio_file_id: Mapped[int] = mapped_column(Integer, ForeignKey("audio_files.id", ondelete="CASCADE"), nullable=False, unique=True)
     status: Mapped[TranscriptStatus] = mapped_column(SQLEnum(TranscriptStatus), nullable=False, default=TranscriptStatus.PROCESSING)
     text: Mapped[str] = mapped_column(String, nullable=True)
+    language: Mapped[str] = mapped_column(String, nullable=True)
     processing_seconds: Mapped[float] = mapped_column(Float, nullable=True)
     text_chars: Mapped[int] = mapped_column(Integer, nullable=True)
     real_time_factor: Mapped[float] = mapped_column(Float, nullable=True)
+    pipeline_version: Mapped[str] = mapped_column(String, nullable=True)
     created_at: Mapped[DateTime] = mapped_column(DateTime, nullable=False)
     updated_at: Mapped[DateTime] = mapped_column(DateTime, nullable=False)
 
     audio_file: Mapped["AudioFile"] = relationship("AudioFile", back_populates="transcript")
-    translation: Mapped["Translation"] = relationship("Translation", back_populates="transcript", uselist=False, cascade="all, delete-orphan")
+    translation: Mapped["Translation"] = relationship("Translation", back_populates="transcript", uselist=False, cascade="all, delete-orphan", passive_deletes=True)
 
 if TYPE_CHECKING:
     from app.models.audio_file import AudioFile
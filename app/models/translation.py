@@ -36,7 +36,7 @@ class Translation(Base):
     updated_at: Mapped[DateTime] = mapped_column(DateTime, nullable=False)
 
     transcript: Mapped["Transcript"] = relationship("Transcript", back_populates="translation")
-    summary: Mapped["Summary"] = relationship("Summary", back_populates="translation", uselist=False, cascade="all, delete-orphan")
+    summary: Mapped["Summary"] = relationship("Summary", back_populates="translation", uselist=False, cascade="all, delete-orphan", passive_deletes=True)
 
 if TYPE_CHECKING:
     from app.models.transcript import Transcript
@@ -0,0 +1,298 @@
+"""
+Потоковое декодирование аудио для ASR.
+
+Назначение:
+    - Многогигабайтные WAV в storage нельзя читать в память целиком (бюджет MIN_FREE_RAM_MB).
+      `stream()` отдаёт запись блоками фиксированного размера: float32 моно с частотой модели
+      (`SAMPLE_RATE`), так что потребители (поиск пауз в `app.processing.chunking`, движок ASR)
+      держат в памяти только текущий блок.
+    - WAV: заголовок RIFF разбирается вручную, данные отображаются в память (`np.memmap`);
+      страницы подтягивает ОС по мере чтения блока, а копия создаётся только для
+      сконвертированного блока. Поддерживаются PCM 8/16/24/32 бит, IEEE float 32/64
+      и WAVE_FORMAT_EXTENSIBLE с этими подформатами.
+    - Прочие форматы (MP3 и т.п.) декодирует подпроцесс `ffmpeg` сразу в f32le/моно/`SAMPLE_RATE`;
+      stdout читается блоками того же размера.
+    - Смена частоты — `StreamingResampler`: линейная интерполяция с переносом состояния
+      между блоками (результат не зависит от размера блока).
+
+    - `read()` собирает интервал в один массив только до ASR_MAX_IN_MEMORY_SECONDS: это
+      жёсткий предел для путей, которым нужен весь сигнал сразу (фрагмент в
+      `app.processing.chunking`, короткий файл в движке ASR). Более длинная запись не
+      декодируется в память, а даёт AudioDecodeError — её нужно распознавать фрагментами.
+
+Конфигурация через окружение:
+    - FFMPEG_BINARY - путь к ffmpeg (по умолчанию `ffmpeg` из PATH).
+    - ASR_MAX_IN_MEMORY_SECONDS - предел длины сигнала для `read()`, с (по умолчанию 600,
+      ~38 МБ float32 при 16 кГц).
+"""
+
+import os
+import shutil
+import struct
+import subprocess
+from typing import IO, Iterator, NamedTuple, Optional, cast
+
+import numpy as np
+
+from app.processing.engines import SAMPLE_RATE
+
+# Размер блока по умолчанию: 2^16 отсчётов на выходе (~4 с при 16 кГц)
+BLOCK_FRAMES = 1 << 16
+
+_WAVE_FORMAT_PCM = 0x0001
+_WAVE_FORMAT_IEEE_FLOAT = 0x0003
+_WAVE_FORMAT_EXTENSIBLE = 0xFFFE
+
+
+class AudioDecodeError(Exception):
+    """Файл не удалось декодировать."""
+    pass
+
+
+class WavInfo(NamedTuple):
+    sample_rate: int
+    channels: int
+    sampwidth: int
+    is_float: bool
+    data_offset: int
+    frames: int
+
+    @property
+    def duration(self) -> float:
+        return self.frames / self.sample_rate if self.sample_rate else 0.0
+
+
+def read_wav_info(path: str) -> Optional[WavInfo]:
+    """Разобрать заголовок RIFF/WAVE; None, если файл не WAV или формат не поддерживается."""
+    try:
+        with open(path, 'rb') as f:
+            header = f.read(12)
+            if len(header) < 12 or header[:4] != b'RIFF' or header[8:12] != b'WAVE':
+                return None
+            file_size = os.fstat(f.fileno()).st_size
+            fmt = None
+            while True:
+                chunk = f.read(8)
+                if len(chunk) < 8:
+                    return None
+                chunk_id, size = chunk[:4], struct.unpack('<I', chunk[4:])[0]
+                if chunk_id == b'fmt ':
+                    fmt = f.read(size)
+                elif chunk_id == b'data':
+                    if fmt is None or len(fmt) < 16:
+                        return None
+                    offset = f.tell()
+                    # размер data у незакрытой записи бывает 0/0xFFFFFFFF — берём фактический
+                    size = min(size, file_size - offset) if size not in (0, 0xFFFFFFFF) else file_size - offset
+                    break
+                else:
+                    f.seek(size, os.SEEK_CUR)
+                if size % 2:
+                    f.seek(1, os.SEEK_CUR)
+    except OSError:
+        return None
+    tag, channels, rate, _, block_align, bits = struct.unpack('<HHIIHH', fmt[:16])
+    if tag == _WAVE_FORMAT_EXTENSIBLE and len(fmt) >= 26:
+        tag = struct.unpack('<H', fmt[24:26])[0]
+    sampwidth = bits // 8
+    is_float = tag == _WAVE_FORMAT_IEEE_FLOAT
+    if tag not in (_WAVE_FORMAT_PCM, _WAVE_FORMAT_IEEE_FLOAT) or not channels or not rate:
+        return None
+    if (is_float and sampwidth not in (4, 8)) or (not is_float and sampwidth not in (1, 2, 3, 4)):
+        return None
+    frame_bytes = block_align or sampwidth * channels
+    return WavInfo(rate, channels, sampwidth, is_float, offset, size // frame_bytes)
+
+
+def duration(path: str) -> Optional[float]:
+    """Длительность по заголовку WAV без декодирования; None для прочих форматов."""
+    info = read_wav_info(path)
+    return info.duration if info else None
+
+
+def _to_float_mono(raw: np.ndarray, info: WavInfo) -> np.ndarray:
+    """Блок кадров memmap (frames x channels[*3]) -> float32 моно в [-1, 1]."""
+    if info.is_float:
+        samples = raw.astype(np.float32)
+    elif info.sampwidth == 1:
+        samples = (raw.astype(np.float32) - 128.0) / 128.0
+    elif info.sampwidth == 2:
+        samples = raw.astype(np.float32) / 32768.0
+    elif info.sampwidth == 3:
+        b = raw.reshape(len(raw), info.channels, 3).astype(np.int32)
+        ints = b[..., 0] | (b[..., 1] << 8) | (b[..., 2] << 16)
+        ints = np.where(ints >= 1 << 23, ints - (1 << 24), ints)
+        samples = ints.astype(np.float32) / float(1 << 23)
+    else:
+        samples = raw.astype(np.float32) / float(1 << 31)
+    if samples.ndim > 1:
+        samples = samples.mean(axis=1) if samples.shape[1] > 1 else samples[:, 0]
+    return samples.astype(np.float32, copy=False)
+
+
+def _wav_memmap(path: str, info: WavInfo) -> np.ndarray:
+    if info.is_float:
+        dtype = '<f4' if info.sampwidth == 4 else '<f8'
+    else:
+        dtype = {1: 'u1', 2: '<i2', 3: 'u1', 4: '<i4'}[info.sampwidth]
+    width = info.channels * (3 if info.sampwidth == 3 else 1)
+    if not info.frames:
+        return np.zeros((0, width), dtype=dtype)
+    return np.memmap(path, dtype=dtype, mode='r', offset=info.data_offset, shape=(info.frames, width))
+
+
+class StreamingResampler:
+    """Линейный ресемплер, обрабатывающий сигнал по блокам с сохранением состояния."""
+
+    def __init__(self, src_rate: int, dst_rate: int):
+        self.step = src_rate / dst_rate
+        # позиция следующего выходного отсчёта относительно начала хвоста `_tail`
+        self._pos = 0.0
+        self._tail = np.zeros(0, dtype=np.float32)
+
+    def process(self, block: np.ndarray) -> np.ndarray:
+        buf = np.concatenate((self._tail, block)) if len(self._tail) else block
+        # для интерполяции в точке p нужен отсчёт floor(p) + 1
+        count = int(np.ceil((len(buf) - 1 - self._pos) / self.step)) if len(buf) > 1 else 0
+        count = max(0, count)
+        positions = self._pos + np.arange(count) * self.step
+        out = np.interp(positions, np.arange(len(buf)), buf).astype(np.float32) if count else \
+            np.zeros(0, dtype=np.float32)
+        next_pos = self._pos + count * self.step
+        keep_from = min(int(next_pos), len(buf))
+        self._tail = buf[keep_from:].astype(np.float32, copy=True)
+        self._pos = next_pos - keep_from
+        return out
+
+    def flush(self) -> np.ndarray:
+        """Досчитать отсчёты на последнем входном отсчёте (конец записи)."""
+        if not len(self._tail):
+            return np.zeros(0, dtype=np.float32)
+        count = int(np.ceil((len(self._tail) - self._pos) / self.step))
+        positions = self._pos + np.arange(max(0, count)) * self.step
+        out = np.interp(positions, np.arange(len(self._tail)), self._tail).astype(np.float32)
+        self._tail = np.zeros(0, dtype=np.float32)
+        self._pos = 0.0
+        return out
+
+
+def _stream_wav(path: str, info: WavInfo, sample_rate: int, block_frames: int,
+                start: float, end: Optional[float]) -> Iterator[np.ndarray]:
+    frames = _wav_memmap(path, info)
+    first = min(info.frames, int(start * info.sample_rate))
+    last = info.frames if end is None else min(info.frames, int(end * info.sample_rate))
+    resampler = StreamingResampler(info.sample_rate, sample_rate) if info.sample_rate != sample_rate else None
+    # входной блок такого размера, чтобы на выходе было около block_frames отсчётов
+    in_block = max(1, int(block_frames * info.sample_rate / sample_rate))
+    try:
+        for pos in range(first, last, in_block):
+            block = _to_float_mono(frames[pos:min(last, pos + in_block)], info)
+            if resampler is not None:
+                block = resampler.process(block)
+            if len(block):
+                yield block
+        if resampler is not None:
+            tail = resampler.flush()
+            if len(tail):
+                yield tail
+    finally:
+        del frames
+
+
+def ffmpeg_binary() -> Optional[str]:
+    return shutil.which(os.getenv('FFMPEG_BINARY', 'ffmpeg'))
+
+
+def _stream_ffmpeg(path: str, sample_rate: int, block_frames: int,
+                   start: float, end: Optional[float]) -> Iterator[np.ndarray]:
+    binary = ffmpeg_binary()
+    if binary is None:
+        raise AudioDecodeError("ffmpeg is not installed; only WAV files can be decoded")
+    cmd = [binary, '-nostdin', '-v', 'error']
+    if start:
+        cmd += ['-ss', f'{start:.3f}']
+    cmd += ['-i', path]
+    if end is not None:
+        cmd += ['-t', f'{max(0.0, end - start):.3f}']
+    cmd += ['-vn', '-ac', '1', '-ar', str(sample_rate), '-f', 'f32le', '-']
+    proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    stdout = cast(IO[bytes], proc.stdout)
+    block_bytes = block_frames * 4
+    pending = b''
+    try:
+        while True:
+            data = stdout.read(block_bytes - len(pending))
+            if not data:
+                break
+            pending += data
+            if len(pending) == block_bytes:
+                yield np.frombuffer(pending, dtype='<f4').copy()
+                pending = b''
+        usable = len(pending) - len(pending) % 4
+        if usable:
+            yield np.frombuffer(pending[:usable], dtype='<f4').copy()
+        proc.wait()
+        if proc.returncode:
+            err = proc.stderr.read().decode('utf-8', 'replace').strip() if proc.stderr else ''
+            raise AudioDecodeError(f"ffmpeg failed to decode {path}: {err[-500:]}")
+    finally:
+        if proc.poll() is None:
+            proc.kill()
+            proc.wait()
+        stdout.close()
+        if proc.stderr:
+            proc.stderr.close()
+
+
+def stream(path: str, sample_rate: int = SAMPLE_RATE, block_frames: int = BLOCK_FRAMES,
+           start: float = 0.0, end: Optional[float] = None) -> Iterator[np.ndarray]:
+    """
+    Декодировать интервал [start, end) записи блоками float32 моно с частотой `sample_rate`.
+
+    Блоки (кроме последнего) содержат около `block_frames` отсчётов; вся запись в памяти
+    не хранится.
+    """
+    info = read_wav_info(path)
+    if info is not None:
+        return _stream_wav(path, info, sample_rate, block_frames, start, end)
+    return _stream_ffmpeg(path, sample_rate, block_frames, start, end)
+
+
+def max_in_memory_seconds() -> float:
+    """Предел длины сигнала, который `read()` собирает в один массив (ASR_MAX_IN_MEMORY_SECONDS)."""
+    try:
+        return max(1.0, float(os.getenv('ASR_MAX_IN_MEMORY_SECONDS', '600')))
+    except Exception:
+        return 600.0
+
+
+def read(path: str, start: float = 0.0, end: Optional[float] = None, sample_rate: int = SAMPLE_RATE) -> np.ndarray:
+    """Декодировать интервал записи в один массив (для фрагментов ограниченной длины).
+
+    Raises:
+        AudioDecodeError: интервал длиннее `max_in_memory_seconds()`; декодирование
+            останавливается, как только предел превышен.
+    """
+    limit = int(max_in_memory_seconds() * sample_rate)
+    blocks = []
+    total = 0
+    it = stream(path, sample_rate, start=start, end=end)
+    try:
+        for block in it:
+            total += len(block)
+            if total > limit:
+                raise AudioDecodeError(
+                    f"{path}: interval is longer than ASR_MAX_IN_MEMORY_SECONDS={limit // sample_rate}s, "
+                    "transcribe it in chunks (ASR_CHUNK_SECONDS > 0)"
+                )
+            blocks.append(block)
+    finally:
+        close = getattr(it, 'close', None)
+        if close is not None:
+            close()
+    return np.concatenate(blocks) if blocks else np.zeros(0, dtype=np.float32)
+
+
+def can_decode(path: str) -> bool:
+    """WAV поддерживаемого формата или любой файл при наличии ffmpeg."""
+    return read_wav_info(path) is not None or ffmpeg_binary() is not None
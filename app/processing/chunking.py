@@ -0,0 +1,231 @@
+"""
+Транскрипция длинных записей фрагментами на пуле процессов.
+
+Назначение:
+    - Двухчасовая запись, распознаваемая целиком, занимает воркер на всё время и при
+      падении теряется полностью. Здесь запись режется на фрагменты по паузам, фрагменты
+      распознаются параллельно на пуле процессов, а сегменты склеиваются обратно со
+      сдвигом таймкодов на начало фрагмента.
+    - Границы фрагментов: каждые `chunk_seconds` ищется самое тихое место (минимум
+      сглаженной RMS-энергии) в окне вокруг целевой границы. Соседние фрагменты
+      перекрываются на `overlap` секунд; сегмент из зоны перекрытия остаётся у того
+      фрагмента, которому принадлежит его середина, поэтому дублей при склейке нет.
+    - Пул процессов живёт всё время процесса воркера: у каждого процесса пула свой
+      `ModelCache`, модель загружается один раз на процесс, а не на фрагмент. Размер
+      пула — число CPU (ASR_CHUNK_WORKERS), но не больше, чем моделей помещается в
+      свободную RAM сверх MIN_FREE_RAM_MB. Ядра делятся между процессами (ASR_CPU_THREADS).
+    - Аудио декодируется потоком (`app.processing.audio_io`): поиск пауз идёт по блокам,
+      а процесс пула декодирует только свой фрагмент, поэтому запись целиком в памяти
+      не бывает. Без ffmpeg фрагментами режутся только WAV.
+
+Ограничения:
+    - Процессы пула запускаются методом spawn и видят только движки, зарегистрированные
+      при импорте `app.processing.engines`.
+    - Celery-воркер с prefork-пулом не может порождать процессы из своих (daemon) детей:
+      для фрагментной транскрипции нужен `--pool=solo` или `--pool=threads`.
+
+Конфигурация через окружение:
+    - ASR_CHUNK_SECONDS - целевая длина фрагмента (по умолчанию 300; 0 — не резать). Длина
+      ограничивается так, чтобы фрагмент с перекрытием укладывался в
+      ASR_MAX_IN_MEMORY_SECONDS (`audio_io.read`). Без фрагментов запись длиннее этого
+      предела не распознаётся (TranscriptionError), а не декодируется в память целиком.
+    - ASR_CHUNK_OVERLAP_SECONDS - перекрытие соседних фрагментов (по умолчанию 1.0).
+    - ASR_CHUNK_WORKERS - размер пула (по умолчанию число CPU).
+"""
+
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+from app.processing import audio_io
+from app.processing.engines import SAMPLE_RATE, get_engine
+from app.processing.model_cache import free_ram_mb, min_free_ram_mb, model_cache
+from app.processing.probe import probe
+
+# Шаг окна энергии, с
+FRAME_SECONDS = 0.1
+# Сглаживание энергии при поиске паузы (кадров): граница — в паузе, а не в случайном тихом кадре
+_SMOOTH_FRAMES = 5
+
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name, str(default)))
+    except Exception:
+        return default
+
+
+class Chunk(NamedTuple):
+    """Фрагмент: распознаваемый интервал [start, end) и собственный интервал [own_start, own_end)."""
+    start: float
+    end: float
+    own_start: float
+    own_end: float
+
+
+def plan_chunks(energy: np.ndarray, frame_seconds: float, chunk_seconds: float, overlap: float,
+                search_seconds: Optional[float] = None) -> List[Chunk]:
+    """
+    Разбить запись на фрагменты по паузам.
+
+    Args:
+        energy: RMS-энергия по кадрам длиной `frame_seconds`.
+        chunk_seconds: целевая длина фрагмента.
+        overlap: перекрытие соседних фрагментов, с.
+        search_seconds: полуширина окна поиска паузы вокруг целевой границы
+            (по умолчанию 10% длины фрагмента, не больше 30 с).
+    """
+    duration = len(energy) * frame_seconds
+    if search_seconds is None:
+        search_seconds = min(30.0, chunk_seconds * 0.1)
+    if len(energy) >= _SMOOTH_FRAMES:
+        energy = np.convolve(energy, np.ones(_SMOOTH_FRAMES) / _SMOOTH_FRAMES, mode='same')
+    cuts = [0.0]
+    # хвост короче четверти фрагмента присоединяется к последнему фрагменту
+    while duration - cuts[-1] > chunk_seconds * 1.25:
+        target = cuts[-1] + chunk_seconds
+        lo = int(max(cuts[-1] + chunk_seconds / 2, target - search_seconds) / frame_seconds)
+        hi = int(min(target + search_seconds, duration - chunk_seconds / 4) / frame_seconds)
+        if hi <= lo:
+            cut = target
+        else:
+            cut = (lo + int(np.argmin(energy[lo:hi])) + 0.5) * frame_seconds
+        cuts.append(cut)
+    cuts.append(duration)
+    return [
+        Chunk(max(0.0, a - overlap), min(duration, b + overlap), a, b)
+        for a, b in zip(cuts, cuts[1:])
+    ]
+
+
+def stitch(chunks: List[Chunk], results: List[Dict], duration: float) -> Dict:
+    """Склеить результаты фрагментов: сдвинуть таймкоды и отбросить дубли из зон перекрытия."""
+    segments = []
+    for i, (chunk, result) in enumerate(zip(chunks, results)):
+        last = i == len(chunks) - 1
+        for seg in result.get("segments") or []:
+            start, end = seg["start"] + chunk.start, seg["end"] + chunk.start
+            middle = (start + end) / 2
+            if chunk.own_start <= middle and (middle < chunk.own_end or last):
+                segments.append({**seg, "start": start, "end": end})
+    return {
+        "text": " ".join(seg["text"] for seg in segments if seg.get("text")),
+        "segments": segments,
+        "duration": duration,
+        "language": next((r.get("language") for r in results if r.get("language")), None),
+    }
+
+
+def energy(path: str, frame_seconds: float = FRAME_SECONDS) -> Tuple[np.ndarray, float]:
+    """RMS-энергия записи по кадрам `frame_seconds` и её длительность (декодирование потоком)."""
+    info = audio_io.read_wav_info(path)
+    # для WAV энергия считается на исходной частоте — ресемплинг здесь не нужен
+    rate = info.sample_rate if info else SAMPLE_RATE
+    frame = max(1, int(rate * frame_seconds))
+    parts = []
+    carry = np.zeros(0, dtype=np.float32)
+    total = 0
+    for block in audio_io.stream(path, sample_rate=rate):
+        total += len(block)
+        buf = np.concatenate((carry, block)) if len(carry) else block
+        n = len(buf) // frame
+        if n:
+            parts.append(np.sqrt(np.mean(buf[:n * frame].reshape(n, frame) ** 2, axis=1)))
+        carry = buf[n * frame:]
+    return (np.concatenate(parts) if parts else np.zeros(0, dtype=np.float32)), total / rate
+
+
+def _init_worker(cpu_threads: int) -> None:
+    os.environ['ASR_CPU_THREADS'] = str(cpu_threads)
+    os.environ['OMP_NUM_THREADS'] = str(cpu_threads)
+
+
+def _transcribe_chunk(engine_name: str, model: str, audio_path: str, start: float, end: float,
+                      opts: Dict[str, Any]) -> Dict:
+    """Выполняется в процессе пула: модель берётся из кэша этого процесса."""
+    engine = get_engine(engine_name)
+    handle = model_cache().get(engine, model)
+    return engine.transcribe_array(handle, audio_io.read(audio_path, start, end), **opts)
+
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_pid: Optional[int] = None
+
+
+def pool_size(engine_name: str, model: str) -> int:
+    """Размер пула: ASR_CHUNK_WORKERS / число CPU, но не больше моделей, помещающихся в свободную RAM."""
+    try:
+        workers = int(os.getenv('ASR_CHUNK_WORKERS', '0')) or (os.cpu_count() or 1)
+    except Exception:
+        workers = os.cpu_count() or 1
+    spare_mb = free_ram_mb() - min_free_ram_mb()
+    return max(1, min(workers, spare_mb // max(1, get_engine(engine_name).estimate_mb(model))))
+
+
+def _get_pool(workers: int) -> ProcessPoolExecutor:
+    global _pool, _pool_pid
+    if _pool is None or _pool_pid != os.getpid():
+        threads = max(1, (os.cpu_count() or 1) // workers)
+        _pool = ProcessPoolExecutor(
+            max_workers=workers, mp_context=multiprocessing.get_context('spawn'),
+            initializer=_init_worker, initargs=(threads,),
+        )
+        _pool_pid = os.getpid()
+    return _pool
+
+
+def shutdown_pool(wait: bool = False) -> None:
+    """Остановить пул процессов (при завершении воркера или после падения процесса пула)."""
+    global _pool, _pool_pid
+    if _pool is not None and _pool_pid == os.getpid():
+        _pool.shutdown(wait=wait, cancel_futures=True)
+    _pool, _pool_pid = None, None
+
+
+def chunk_seconds_for(audio_path: str, chunk_seconds: Optional[float] = None,
+                      duration: Optional[float] = None) -> float:
+    """
+    Длина фрагмента для файла либо 0, если файл распознаётся целиком.
+
+    Длительность берётся из аргумента (известна из БД), иначе из заголовков файла; если она
+    неизвестна, но файл декодируется, решение о разбиении принимает `plan_chunks`.
+    """
+    if chunk_seconds is None:
+        chunk_seconds = _env_float('ASR_CHUNK_SECONDS', 300.0)
+    if chunk_seconds <= 0:
+        return 0.0
+    # фрагмент может вырасти до 1.25 длины плюс перекрытия и всё равно читается в память целиком
+    overlap = _env_float('ASR_CHUNK_OVERLAP_SECONDS', 1.0)
+    chunk_seconds = max(1.0, min(chunk_seconds, (audio_io.max_in_memory_seconds() - 2 * overlap) / 1.25))
+    if not duration:
+        info = probe(audio_path)
+        duration = info.duration if info else None
+    if duration:
+        return chunk_seconds if duration > chunk_seconds * 1.25 else 0.0
+    return chunk_seconds if audio_io.can_decode(audio_path) else 0.0
+
+
+def transcribe_chunked(audio_path: str, model: str, engine_name: str, chunk_seconds: float,
+                       overlap: Optional[float] = None, workers: Optional[int] = None, **opts) -> Dict:
+    """Распознать запись фрагментами на пуле процессов и склеить результат."""
+    if overlap is None:
+        overlap = _env_float('ASR_CHUNK_OVERLAP_SECONDS', 1.0)
+    frame_energy, duration = energy(audio_path)
+    chunks = plan_chunks(frame_energy, FRAME_SECONDS, chunk_seconds, overlap)
+    opts.pop('duration', None)
+    pool = _get_pool(workers or pool_size(engine_name, model))
+    try:
+        futures = [
+            pool.submit(_transcribe_chunk, engine_name, model, audio_path, c.start, c.end, opts) for c in chunks
+        ]
+        results = [f.result() for f in futures]
+    except BrokenProcessPool:
+        shutdown_pool()
+        raise
+    result = stitch(chunks, results, duration)
+    result["chunks"] = len(chunks)
+    return result
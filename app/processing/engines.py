@@ -0,0 +1,230 @@
+"""
+Реестр движков распознавания речи (ASR).
+
+Контракт движка (`ASREngine`):
+- load(model: str) -> handle — загрузить модель размера `WhisperModel` (дорого, кэшируется);
+- transcribe(handle, audio_path: str, **opts) -> dict — тот же формат, что у
+  `app.processing.transcribe.process`: {"text", "segments", "duration"};
+- transcribe_array(handle, samples, **opts) -> dict — то же для фрагмента PCM
+  (float32 моно с частотой `SAMPLE_RATE`); таймкоды сегментов — от начала фрагмента;
+- transcribe_batch(handle, audio_paths: list, durations=None, **opts) -> list[dict] — пачка
+  коротких файлов за один вызов модели (по умолчанию — по одному через `transcribe`);
+- estimate_mb(model: str) -> int — оценка RAM загруженной модели (для бюджета кэша).
+
+`load`, `transcribe` и `estimate_mb` абстрактные: движок без них не создаётся и не
+регистрируется (`register_engine` бросает TypeError для абстрактного класса).
+
+Встроенные движки:
+    - `fake` — детерминированный движок без зависимостей (тесты, локальный запуск);
+    - `faster_whisper` — CTranslate2-реализация Whisper, опциональная зависимость
+      (`pip install faster-whisper`), импортируется только при загрузке модели.
+
+Конфигурация через окружение:
+    - ASR_ENGINE - имя движка по умолчанию (по умолчанию fake).
+    - ASR_DEVICE / ASR_COMPUTE_TYPE - параметры faster_whisper (по умолчанию cpu / int8).
+    - ASR_CPU_THREADS - потоков CTranslate2 на модель (по умолчанию 0 — все ядра; пул
+      фрагментов `app.processing.chunking` делит ядра между процессами).
+"""
+
+import abc
+import hashlib
+import inspect
+import os
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+# Частота дискретизации входа моделей Whisper
+SAMPLE_RATE = 16000
+
+# Пауза между файлами пачки при склейке в один сигнал, с
+BATCH_GAP_SECONDS = 1.0
+
+# Приблизительный размер модели в памяти (int8 на CPU), МБ
+MODEL_RAM_MB = {
+    'base': 300,
+    'small': 900,
+    'medium': 2500,
+    'large': 5000,
+}
+
+
+class ASREngine(abc.ABC):
+    """Базовый класс движка ASR."""
+
+    name = 'base'
+
+    @abc.abstractmethod
+    def load(self, model: str) -> Any:
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def transcribe(self, handle: Any, audio_path: str, **opts) -> Dict:
+        raise NotImplementedError
+
+    def transcribe_array(self, handle: Any, samples: Any, **opts) -> Dict:
+        raise NotImplementedError
+
+    def transcribe_batch(self, handle: Any, audio_paths: Sequence[str],
+                         durations: Optional[Sequence[Optional[float]]] = None, **opts) -> List[Dict]:
+        durations = durations or [None] * len(audio_paths)
+        return [self.transcribe(handle, path, duration=d, **opts) for path, d in zip(audio_paths, durations)]
+
+    @abc.abstractmethod
+    def estimate_mb(self, model: str) -> int:
+        raise NotImplementedError
+
+
+def _model_ram_mb(model: str) -> int:
+    """Оценка RAM модели Whisper по `MODEL_RAM_MB` (неизвестный размер считается как large)."""
+    return MODEL_RAM_MB.get(model, MODEL_RAM_MB['large'])
+
+
+class FakeEngine(ASREngine):
+    """Детерминированный движок: результат зависит только от модели и содержимого файла."""
+
+    name = 'fake'
+
+    def __init__(self):
+        self.loads = 0
+        self.batches = 0
+
+    def load(self, model: str) -> Any:
+        self.loads += 1
+        return {'model': model}
+
+    def transcribe(self, handle: Any, audio_path: str, **opts) -> Dict:
+        digest = hashlib.sha1()
+        with open(audio_path, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b''):
+                digest.update(block)
+        text = f"[{handle['model']}] {os.path.basename(audio_path)} {digest.hexdigest()[:12]}"
+        duration = float(opts.get('duration') or 0.0)
+        return {"text": text, "segments": [{"start": 0.0, "end": duration, "text": text}], "duration": duration,
+                "language": opts.get('language')}
+
+    def transcribe_array(self, handle: Any, samples: Any, **opts) -> Dict:
+        duration = len(samples) / SAMPLE_RATE
+        text = f"[{handle['model']}] {hashlib.sha1(samples.tobytes()).hexdigest()[:12]}"
+        return {"text": text, "segments": [{"start": 0.0, "end": duration, "text": text}], "duration": duration,
+                "language": opts.get('language')}
+
+    def transcribe_batch(self, handle: Any, audio_paths: Sequence[str],
+                         durations: Optional[Sequence[Optional[float]]] = None, **opts) -> List[Dict]:
+        self.batches += 1
+        return super().transcribe_batch(handle, audio_paths, durations, **opts)
+
+    def estimate_mb(self, model: str) -> int:
+        return _model_ram_mb(model)
+
+
+class FasterWhisperEngine(ASREngine):
+    """Whisper через faster-whisper (CTranslate2)."""
+
+    name = 'faster_whisper'
+
+    def __init__(self, device: Optional[str] = None, compute_type: Optional[str] = None):
+        self.device = device or os.getenv('ASR_DEVICE', 'cpu')
+        self.compute_type = compute_type or os.getenv('ASR_COMPUTE_TYPE', 'int8')
+        self.cpu_threads = int(os.getenv('ASR_CPU_THREADS', '0'))
+
+    def load(self, model: str) -> Any:
+        from faster_whisper import WhisperModel as FWModel
+        # имена моделей faster-whisper: base/small/medium/large-v3
+        size = 'large-v3' if model == 'large' else model
+        return FWModel(size, device=self.device, compute_type=self.compute_type, cpu_threads=self.cpu_threads)
+
+    def estimate_mb(self, model: str) -> int:
+        return _model_ram_mb(model)
+
+    def transcribe(self, handle: Any, audio_path: str, **opts) -> Dict:
+        # декодирование общим потоковым слоем (WAV через memmap, прочее через ffmpeg); файл длиннее
+        # ASR_MAX_IN_MEMORY_SECONDS не читается в память, а отклоняется — такие записи идут фрагментами
+        from app.processing import audio_io
+        return self._run(handle, audio_io.read(audio_path), **opts)
+
+    def transcribe_array(self, handle: Any, samples: Any, **opts) -> Dict:
+        return self._run(handle, samples, **opts)
+
+    def transcribe_batch(self, handle: Any, audio_paths: Sequence[str],
+                         durations: Optional[Sequence[Optional[float]]] = None, **opts) -> List[Dict]:
+        """
+        Склеить файлы пачки в один сигнал через паузы `BATCH_GAP_SECONDS` и распознать
+        одним вызовом: для коротких файлов это один проход энкодера по 30-секундным окнам
+        вместо отдельного прохода (и отдельного определения языка) на каждый файл.
+        Сегмент достаётся файлу, в интервал которого (вместе с паузой после него) попадает
+        его середина; таймкоды сдвигаются к началу файла. Язык определяется один раз на
+        пачку — для пачек на разных языках передайте `language`.
+        """
+        import numpy as np
+        from app.processing import audio_io
+        arrays = [audio_io.read(path) for path in audio_paths]
+        gap = np.zeros(int(BATCH_GAP_SECONDS * SAMPLE_RATE), dtype=np.float32)
+        bounds: List[Tuple[int, int]] = []
+        parts: List[Any] = []
+        pos = 0
+        for samples in arrays:
+            bounds.append((pos, pos + len(samples)))
+            parts.extend((samples, gap))
+            pos += len(samples) + len(gap)
+        opts.setdefault('condition_on_previous_text', False)
+        result = self._run(handle, np.concatenate(parts) if parts else gap, **opts)
+        results: List[Dict] = []
+        for lo, hi in bounds:
+            # пауза после файла относится к нему же
+            start, end, until = lo / SAMPLE_RATE, hi / SAMPLE_RATE, (hi + len(gap)) / SAMPLE_RATE
+            segments = [
+                {**seg, "start": max(0.0, min(end, seg["start"]) - start),
+                 "end": max(0.0, min(end, seg["end"]) - start)}
+                for seg in result["segments"] if start <= (seg["start"] + seg["end"]) / 2 < until
+            ]
+            results.append({
+                "text": " ".join(seg["text"] for seg in segments if seg["text"]),
+                "segments": segments,
+                "duration": end - start,
+                "language": result.get("language"),
+            })
+        return results
+
+    def _run(self, handle: Any, audio: Any, **opts) -> Dict:
+        opts.pop('duration', None)
+        segments_iter, info = handle.transcribe(audio, **opts)
+        segments = [{"start": s.start, "end": s.end, "text": s.text.strip()} for s in segments_iter]
+        return {
+            "text": " ".join(s["text"] for s in segments),
+            "segments": segments,
+            "duration": float(info.duration),
+            "language": info.language,
+        }
+
+
+_ENGINES: Dict[str, Callable[[], ASREngine]] = {
+    FakeEngine.name: FakeEngine,
+    FasterWhisperEngine.name: FasterWhisperEngine,
+}
+# Экземпляры движков процесса (движок без состояния модели, модели — в ModelCache)
+_instances: Dict[str, ASREngine] = {}
+
+
+def register_engine(name: str, factory: Callable[[], ASREngine]) -> None:
+    """Зарегистрировать движок под именем `name` (заменяет существующий).
+
+    Raises:
+        TypeError: `factory` — класс движка, в котором не реализованы абстрактные методы.
+    """
+    if inspect.isclass(factory) and inspect.isabstract(factory):
+        missing = ', '.join(sorted(getattr(factory, '__abstractmethods__', ())))
+        raise TypeError(f"ASR engine {name} does not implement: {missing}")
+    _ENGINES[name] = factory
+    _instances.pop(name, None)
+
+
+def get_engine(name: Optional[str] = None) -> ASREngine:
+    """Вернуть экземпляр движка по имени (по умолчанию ASR_ENGINE)."""
+    name = name or os.getenv('ASR_ENGINE') or FakeEngine.name
+    engine = _instances.get(name)
+    if engine is None:
+        try:
+            factory = _ENGINES[name]
+        except KeyError:
+            raise ValueError(f"Unknown ASR engine: {name}") from None
+        engine = _instances[name] = factory()
+    return engine
@@ -0,0 +1,49 @@
+"""
+Отпечаток содержимого аудиофайла и версия конвейера обработки — ключ кэша результатов.
+
+Назначение:
+    - Пользователи загружают одну и ту же запись под новыми именами. Если у записи той же
+      модели уже есть готовый транскрипт, полученный той же версией конвейера, результаты
+      (Transcript/Translation/Summary) копируются, а распознавание не запускается.
+    - Ключ кэша: (content_hash, whisper_model, pipeline_version).
+        * content_hash — SHA-256 содержимого, читается потоком блоками по 1 МБ и
+          сохраняется в `AudioFile.content_hash` (считается один раз на файл);
+        * pipeline_version — движок ASR и ASR_PIPELINE_VERSION: смена движка или
+          повышение версии (новые параметры, модель другой ревизии) делает старые
+          результаты непригодными для копирования.
+
+Конфигурация через окружение:
+    - ASR_PIPELINE_VERSION - версия конвейера (по умолчанию 1).
+    - ASR_RESULT_CACHE - 0, чтобы не использовать кэш результатов (по умолчанию 1).
+"""
+
+import hashlib
+import os
+from typing import Optional
+
+from app.processing.engines import FakeEngine
+
+# Размер блока чтения при хэшировании
+HASH_BLOCK_BYTES = 1 << 20
+
+
+def content_hash(path: str) -> Optional[str]:
+    """SHA-256 содержимого файла (hex); None, если файл не читается."""
+    digest = hashlib.sha256()
+    try:
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(HASH_BLOCK_BYTES), b''):
+                digest.update(block)
+    except OSError:
+        return None
+    return digest.hexdigest()
+
+
+def pipeline_version(engine_name: Optional[str] = None) -> str:
+    """Версия конвейера для ключа кэша: '<движок>/<ASR_PIPELINE_VERSION>'."""
+    engine_name = engine_name or os.getenv('ASR_ENGINE') or FakeEngine.name
+    return f"{engine_name}/{os.getenv('ASR_PIPELINE_VERSION', '1')}"
+
+
+def cache_enabled() -> bool:
+    return os.getenv('ASR_RESULT_CACHE', '1').lower() not in ('0', 'false', 'no')
@@ -0,0 +1,126 @@
+"""
+Кэш загруженных моделей ASR внутри процесса воркера.
+
+Назначение:
+    - Загрузка модели Whisper занимает секунды и гигабайты RAM; загружать её на каждую
+      задачу нельзя. Процесс воркера держит загруженные модели в LRU-кэше.
+    - Кэш ограничен бюджетом RAM (ASR_MODEL_CACHE_MB, по оценке `engine.estimate_mb`)
+      и свободной памятью машины: перед загрузкой вытесняются наименее недавно
+      использованные модели, пока новая не помещается в бюджет и после неё остаётся
+      не меньше MIN_FREE_RAM_MB свободной памяти (тот же сигнал psutil, по которому
+      `process_audio_file` откладывает задачу).
+    - Кэш свой у каждого процесса (после fork создаётся заново).
+
+Конфигурация через окружение:
+    - ASR_MODEL_CACHE_MB - бюджет RAM на загруженные модели (по умолчанию 4096).
+    - MIN_FREE_RAM_MB - минимум свободной RAM (по умолчанию 1024).
+"""
+
+import gc
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Optional, Tuple
+
+import psutil
+
+from app.processing.engines import ASREngine
+
+
+def free_ram_mb() -> int:
+    """Доступная RAM машины, МБ (psutil)."""
+    return psutil.virtual_memory().available // (1024 * 1024)
+
+
+def min_free_ram_mb() -> int:
+    """Порог свободной RAM, ниже которого обработка откладывается, МБ."""
+    return int(os.getenv("MIN_FREE_RAM_MB", "1024"))
+
+
+def _budget_mb() -> int:
+    try:
+        return int(os.getenv("ASR_MODEL_CACHE_MB", "4096"))
+    except Exception:
+        return 4096
+
+
+class ModelCache:
+    """LRU загруженных моделей `(engine, model) -> handle` с бюджетом RAM."""
+
+    def __init__(self, budget_mb: Optional[int] = None, min_free_mb: Optional[int] = None,
+                 free_mb: Callable[[], int] = free_ram_mb):
+        self.budget_mb = _budget_mb() if budget_mb is None else budget_mb
+        self.min_free_mb = min_free_ram_mb() if min_free_mb is None else min_free_mb
+        self._free_mb = free_mb
+        # (engine name, model) -> (handle, оценка МБ); порядок — от давно использованных к недавним
+        self._models: "OrderedDict[Tuple[str, str], Tuple[Any, int]]" = OrderedDict()
+        # загрузка под lock'ом: два потока не грузят одну модель дважды
+        self._lock = threading.RLock()
+        self.hits = 0
+        self.loads = 0
+        self.evictions = 0
+
+    def get(self, engine: ASREngine, model: str) -> Any:
+        """Вернуть загруженную модель, при необходимости вытеснив старые и загрузив её."""
+        key = (engine.name, model)
+        with self._lock:
+            cached = self._models.get(key)
+            if cached is not None:
+                self._models.move_to_end(key)
+                self.hits += 1
+                return cached[0]
+            need = engine.estimate_mb(model)
+            self._make_room(need)
+            handle = engine.load(model)
+            self._models[key] = (handle, need)
+            self.loads += 1
+            return handle
+
+    def relieve_pressure(self) -> int:
+        """Вытеснять модели, пока свободной RAM меньше MIN_FREE_RAM_MB; вернуть число вытесненных."""
+        evicted = 0
+        with self._lock:
+            while self._models and self._free_mb() < self.min_free_mb:
+                self._evict_lru()
+                evicted += 1
+        return evicted
+
+    @property
+    def used_mb(self) -> int:
+        return sum(mb for _, mb in self._models.values())
+
+    def __len__(self) -> int:
+        return len(self._models)
+
+    def __contains__(self, key: Tuple[str, str]) -> bool:
+        return key in self._models
+
+    def clear(self) -> None:
+        with self._lock:
+            self._models.clear()
+            gc.collect()
+
+    def _make_room(self, need: int) -> None:
+        while self._models and (
+            self.used_mb + need > self.budget_mb or self._free_mb() - need < self.min_free_mb
+        ):
+            self._evict_lru()
+
+    def _evict_lru(self) -> None:
+        key, _ = self._models.popitem(last=False)
+        self.evictions += 1
+        # освободить память модели до следующего замера свободной RAM
+        gc.collect()
+        print(f"[asr] Evicted model {key[1]} ({key[0]}) from cache")
+
+
+_cache: Optional[ModelCache] = None
+_cache_pid: Optional[int] = None
+
+
+def model_cache() -> ModelCache:
+    """Кэш моделей текущего процесса."""
+    global _cache, _cache_pid
+    if _cache is None or _cache_pid != os.getpid():
+        _cache, _cache_pid = ModelCache(), os.getpid()
+    return _cache
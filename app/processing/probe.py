@@ -0,0 +1,168 @@
+"""
+Быстрое определение параметров аудиофайла по заголовкам, без декодирования.
+
+Назначение:
+    - При добавлении файла (путь add в `app.tasks.core`) нужно знать длительность, частоту,
+      число каналов и MIME-тип: по длительности планируется стоимость задачи и считается
+      `Transcript.real_time_factor`. Декодирование ради этого слишком дорого.
+    - WAV: длительность из заголовка RIFF (`audio_io.read_wav_info`).
+    - MP3: пропускается тег ID3v2, находится первый кадр (синхрослово подтверждается
+      следующим кадром). Если в первом кадре есть заголовок Xing/Info или VBRI —
+      длительность = число кадров x отсчётов в кадре / частота. Иначе, если битрейт первых
+      кадров постоянен (CBR), длительность считается по размеру аудиоданных; для VBR без
+      заголовка сканируются только 4-байтовые заголовки кадров с переходом по их длине.
+
+Контракт:
+- probe(path: str) -> Optional[AudioProbe] — None, если формат не распознан или файл битый.
+"""
+
+import os
+import struct
+from typing import BinaryIO, NamedTuple, Optional, Tuple
+
+from app.processing import audio_io
+
+
+class AudioProbe(NamedTuple):
+    duration: float
+    sample_rate: int
+    channels: int
+    content_type: str
+
+
+# Битрейты (кбит/с) по (версия MPEG-1 или 2/2.5, слой) и индексу
+_BITRATES = {
+    (1, 1): (0, 32, 64, 96, 128, 160, 192, 224, 256, 288, 320, 352, 384, 416, 448),
+    (1, 2): (0, 32, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320, 384),
+    (1, 3): (0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320),
+    (2, 1): (0, 32, 48, 56, 64, 80, 96, 112, 128, 144, 160, 176, 192, 224, 256),
+    (2, 2): (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),
+    (2, 3): (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),
+}
+_SAMPLE_RATES = {3: (44100, 48000, 32000), 2: (22050, 24000, 16000), 0: (11025, 12000, 8000)}
+
+# Сколько байт от начала аудиоданных искать первый кадр (мусор/обложка перед ним)
+_SYNC_SEARCH_BYTES = 1 << 16
+# Сколько первых кадров проверять на постоянство битрейта
+_CBR_CHECK_FRAMES = 32
+
+
+class _Frame(NamedTuple):
+    version_bits: int  # 3 — MPEG-1, 2 — MPEG-2, 0 — MPEG-2.5
+    layer: int
+    bitrate: int  # бит/с
+    sample_rate: int
+    channels: int
+    length: int  # байт
+    samples: int  # отсчётов на кадр
+
+
+def _parse_frame_header(b: bytes) -> Optional[_Frame]:
+    if len(b) < 4 or b[0] != 0xFF or (b[1] & 0xE0) != 0xE0:
+        return None
+    version_bits = (b[1] >> 3) & 0x03
+    layer_bits = (b[1] >> 1) & 0x03
+    bitrate_idx = b[2] >> 4
+    rate_idx = (b[2] >> 2) & 0x03
+    if version_bits == 1 or layer_bits == 0 or bitrate_idx in (0, 15) or rate_idx == 3:
+        return None
+    layer = 4 - layer_bits
+    mpeg1 = version_bits == 3
+    bitrate = _BITRATES[(1 if mpeg1 else 2, layer)][bitrate_idx] * 1000
+    sample_rate = _SAMPLE_RATES[version_bits][rate_idx]
+    padding = (b[2] >> 1) & 0x01
+    channels = 1 if (b[3] >> 6) == 3 else 2
+    if layer == 1:
+        samples = 384
+        length = (12 * bitrate // sample_rate + padding) * 4
+    else:
+        samples = 1152 if (layer == 2 or mpeg1) else 576
+        length = samples // 8 * bitrate // sample_rate + padding
+    return _Frame(version_bits, layer, bitrate, sample_rate, channels, length, samples)
+
+
+def _skip_id3v2(f: BinaryIO) -> int:
+    header = f.read(10)
+    if len(header) == 10 and header[:3] == b'ID3':
+        size = (header[6] & 0x7F) << 21 | (header[7] & 0x7F) << 14 | (header[8] & 0x7F) << 7 | (header[9] & 0x7F)
+        footer = 10 if header[5] & 0x10 else 0
+        return 10 + size + footer
+    return 0
+
+
+def _find_first_frame(f: BinaryIO, start: int) -> Optional[Tuple[int, _Frame]]:
+    f.seek(start)
+    buf = f.read(_SYNC_SEARCH_BYTES)
+    pos = buf.find(b'\xff')
+    while 0 <= pos < len(buf) - 4:
+        frame = _parse_frame_header(buf[pos:pos + 4])
+        if frame is not None and frame.length > 4:
+            # синхрослово подтверждается заголовком следующего кадра
+            f.seek(start + pos + frame.length)
+            nxt = _parse_frame_header(f.read(4))
+            if nxt is not None and nxt.sample_rate == frame.sample_rate:
+                return start + pos, frame
+        pos = buf.find(b'\xff', pos + 1)
+    return None
+
+
+def _vbr_frames(first: bytes, frame: _Frame) -> Optional[int]:
+    """Число кадров из заголовка Xing/Info или VBRI первого кадра."""
+    mpeg1 = frame.version_bits == 3
+    side_info = (32 if frame.channels == 2 else 17) if mpeg1 else (17 if frame.channels == 2 else 9)
+    xing = 4 + side_info
+    if first[xing:xing + 4] in (b'Xing', b'Info') and len(first) >= xing + 12:
+        flags = struct.unpack('>I', first[xing + 4:xing + 8])[0]
+        if flags & 0x01:
+            return struct.unpack('>I', first[xing + 8:xing + 12])[0]
+    if first[36:40] == b'VBRI' and len(first) >= 36 + 18:
+        return struct.unpack('>I', first[36 + 14:36 + 18])[0]
+    return None
+
+
+def _probe_mp3(path: str) -> Optional[AudioProbe]:
+    size = os.path.getsize(path)
+    with open(path, 'rb') as f:
+        found = _find_first_frame(f, _skip_id3v2(f))
+        if found is None:
+            return None
+        offset, frame = found
+        end = size
+        f.seek(max(0, size - 128))
+        if f.read(3) == b'TAG':
+            end -= 128
+        f.seek(offset)
+        first = f.read(frame.length)
+        frames = _vbr_frames(first, frame)
+        if frames is not None:
+            return AudioProbe(frames * frame.samples / frame.sample_rate, frame.sample_rate, frame.channels,
+                              'audio/mpeg')
+        # без заголовка VBR: проверить, постоянен ли битрейт первых кадров
+        pos, count, samples, cbr = offset, 0, 0, True
+        while pos + 4 <= end:
+            f.seek(pos)
+            current = _parse_frame_header(f.read(4))
+            if current is None or current.length <= 4:
+                break
+            if current.bitrate != frame.bitrate:
+                cbr = False
+            count += 1
+            samples += current.samples
+            pos += current.length
+            if cbr and count >= _CBR_CHECK_FRAMES:
+                duration = (end - offset) * 8 / frame.bitrate
+                return AudioProbe(duration, frame.sample_rate, frame.channels, 'audio/mpeg')
+    if not count:
+        return None
+    return AudioProbe(samples / frame.sample_rate, frame.sample_rate, frame.channels, 'audio/mpeg')
+
+
+def probe(path: str) -> Optional[AudioProbe]:
+    """Длительность, частота, каналы и MIME-тип файла по заголовкам; None, если не распознан."""
+    try:
+        info = audio_io.read_wav_info(path)
+        if info is not None:
+            return AudioProbe(info.duration, info.sample_rate, info.channels, 'audio/wav')
+        return _probe_mp3(path)
+    except (OSError, struct.error):
+        return None
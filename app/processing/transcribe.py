@@ -3,13 +3,23 @@
 
 Контракт:
 - process(audio_path: str, model: str = 'base', **opts) -> dict
-  - возвращает: {"text": str, "segments": Optional[list], "duration": float}
+  - возвращает: {"text": str, "segments": Optional[list], "duration": float,
+    "language": Optional[str]}
   - может бросать TranscriptionError при ошибках
+- process_batch(audio_paths: list, model: str = 'base', durations=None, **opts) -> list
+  - пачка коротких файлов за один вызов движка (`engine.transcribe_batch`);
+    элемент результата — dict как у process или TranscriptionError для файла
 
-Реализация здесь минимальна и служит точкой расширения для реальной интеграции
-(Whisper, сервисы ASR и т.п.).
+Распознавание выполняет движок из реестра `app.processing.engines` (по умолчанию
+ASR_ENGINE); загруженные модели переиспользуются между задачами через кэш процесса
+`app.processing.model_cache`. Длинные WAV-записи режутся по паузам и распознаются
+параллельно на пуле процессов (`app.processing.chunking`).
 """
-from typing import Optional, Dict
+from typing import Dict, List, Optional, Sequence, Union
+
+from app.processing import chunking
+from app.processing.engines import get_engine
+from app.processing.model_cache import model_cache
 
 
 class TranscriptionError(Exception):
@@ -23,16 +33,57 @@ def process(audio_path: str, model: str = "base", **opts) -> Dict:
     Параметры:
         audio_path: путь к файлу на диске
         model: имя/версия модели (строка)
-        opts: доп. параметры (chunking, timeout и т.п.)
+        opts: доп. параметры (engine — имя движка, duration — известная длительность,
+            chunk_seconds / chunk_overlap / chunk_workers — фрагментная транскрипция,
+            остальные передаются движку)
 
     Возвращает словарь с ключами:
         text: полный транскрипт (str)
         segments: опциональный список сегментов/таймкодов
         duration: длительность в секундах (float)
+        language: язык речи, определённый движком (или None)
+    """
+    try:
+        engine = get_engine(opts.pop("engine", None))
+        chunk_seconds = chunking.chunk_seconds_for(audio_path, opts.pop("chunk_seconds", None), opts.get("duration"))
+        overlap = opts.pop("chunk_overlap", None)
+        workers = opts.pop("chunk_workers", None)
+        if chunk_seconds:
+            return chunking.transcribe_chunked(
+                audio_path, model, engine.name, chunk_seconds, overlap=overlap, workers=workers, **opts,
+            )
+        handle = model_cache().get(engine, model)
+        return engine.transcribe(handle, audio_path, **opts)
+    except Exception as e:
+        raise TranscriptionError(str(e)) from e
+
+
+def process_batch(audio_paths: Sequence[str], model: str = "base",
+                  durations: Optional[Sequence[Optional[float]]] = None,
+                  **opts) -> List[Union[Dict, TranscriptionError]]:
+    """Распознать пачку коротких файлов одним вызовом движка.
+
+    Если вызов на всю пачку упал (например, один файл не декодируется), файлы
+    распознаются по одному, чтобы ошибка одного не помечала FAILED всю пачку.
+
+    Возвращает список той же длины, что `audio_paths`: результат (dict, как у `process`)
+    или TranscriptionError для файла. Ошибка загрузки модели бросается как TranscriptionError.
     """
-    # Заглушка: на проде здесь будет интеграция с моделью ASR
+    durations = list(durations) if durations is not None else [None] * len(audio_paths)
+    try:
+        engine = get_engine(opts.pop("engine", None))
+        handle = model_cache().get(engine, model)
+    except Exception as e:
+        raise TranscriptionError(str(e)) from e
     try:
-        # TODO: реальная логика транскрипции
-        return {"text": "", "segments": [], "duration": 0.0}
+        return list(engine.transcribe_batch(handle, list(audio_paths), durations, **opts))
     except Exception as e:
-        raise TranscriptionError(str(e))
+        if len(audio_paths) == 1:
+            return [TranscriptionError(str(e))]
+    results: List[Union[Dict, TranscriptionError]] = []
+    for path, duration in zip(audio_paths, durations):
+        try:
+            results.append(engine.transcribe(handle, path, duration=duration, **opts))
+        except Exception as e:
+            results.append(TranscriptionError(str(e)))
+    return results
@@ -0,0 +1,32 @@
+"""
+Роутер метрик Prometheus.
+
+Назначение:
+    - `GET /metrics` — метрики watcher'а в текстовом формате Prometheus. Если watcher
+      работает в потоке API (ENABLE_API_WATCHER=true), отдаются метрики этого процесса,
+      иначе — последний снимок, опубликованный сервисом `app.watcher_service` в Redis.
+
+Пример:
+    GET /metrics -> "# HELP sciber_watcher_events_total ..."
+"""
+
+import os
+
+from fastapi import APIRouter
+from fastapi.responses import Response
+from prometheus_client import CONTENT_TYPE_LATEST
+
+from app.utils import metrics
+
+router = APIRouter()
+
+
+@router.get('/metrics')
+def prometheus_metrics():
+    """Вернуть метрики watcher'а для сборщика Prometheus."""
+    if os.getenv("ENABLE_API_WATCHER", "false").lower() in ("1", "true", "yes"):
+        body = metrics.render()
+    else:
+        from app.tasks.core import redis_client
+        body = metrics.read_snapshot(redis_client)
+    return Response(content=body, media_type=CONTENT_TYPE_LATEST)
@@ -0,0 +1,21 @@
+"""
+Роутер служебной статистики.
+
+Назначение:
+    - `GET /stats/dedup` — счётчики дубликатов enqueue, отброшенных Redis-ключами
+      идемпотентности (по видам add/delete/process).
+
+Пример:
+    GET /stats/dedup -> {"suppressed": {"add": 12, "delete": 1}}
+"""
+
+from fastapi import APIRouter
+
+router = APIRouter()
+
+
+@router.get('/stats/dedup')
+def dedup_stats():
+    """Вернуть количество подавленных дубликатов постановки задач."""
+    from app.tasks.dedup import suppressed_counts
+    return {"suppressed": suppressed_counts()}
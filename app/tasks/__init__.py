@@ -7,4 +7,4 @@
 
 from .queue import *  # re-export задач для удобства
 
-__all__ = ["enqueue_add_file", "enqueue_delete_file", "process_audio_file", "sync_storage_with_db"]
+__all__ = ["enqueue_add_file", "enqueue_add_files_bulk", "enqueue_delete_file", "enqueue_delete_files_bulk", "enqueue_file_events_batch", "enqueue_rename_files_bulk", "process_audio_batch", "process_audio_file", "summarize_audio_file", "sync_storage_shard", "sync_storage_with_db", "translate_audio_file"]
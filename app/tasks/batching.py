@@ -0,0 +1,136 @@
+"""
+Микропакетная обработка коротких файлов.
+
+Назначение:
+    - У коротких голосовых заметок время распознавания сравнимо с накладными расходами
+      задачи: сообщение в брокер, несколько сессий БД на смену статусов, подготовка вызова
+      модели. В режиме пакетов (ASR_BATCH_SIZE > 1) файлы короткой полосы (`app.tasks.routing`)
+      не ставятся отдельными `process_audio_file`: их id копятся в списке Redis своей
+      модели, а одна задача `process_audio_batch` забирает до ASR_BATCH_SIZE id (или
+      ждёт их не дольше ASR_BATCH_WAIT_MS), распознаёт одним вызовом движка и пишет
+      транскрипты и статусы одной транзакцией.
+    - Забранные id не удаляются из Redis, а переносятся (LMOVE/BLMOVE) в список
+      «в работе» задачи сборки (по id задачи Celery). После успешной обработки список
+      очищается, при ошибке или откладывании id возвращаются в начало очереди модели.
+      Если воркер упал посреди пачки, брокер переотдаёт сообщение (acks_late) с тем же
+      id задачи, и она продолжает ту же пачку из своего списка «в работе».
+    - Сообщение в брокер уходит только когда задачу сборки ещё никто не поставил
+      (флаг `armed`). Задача, забрав пачку, снимает флаг и, если в списке уже есть новые
+      id, ставит следующую — так пачки разных воркеров собираются параллельно.
+
+Ключи:
+    - `sciber:asr:batch:<model>`       — список id записей, ожидающих обработки;
+    - `sciber:asr:batch:<model>:armed` — задача сборки пачки уже в очереди (TTL на случай
+      падения воркера: после него следующий `push` поставит задачу заново);
+    - `sciber:asr:batch:<model>:inflight:<task_id>` — id пачки, которую обрабатывает задача.
+
+Конфигурация через окружение:
+    - ASR_BATCH_SIZE - максимум файлов в пачке (по умолчанию 1 — режим выключен).
+    - ASR_BATCH_WAIT_MS - сколько ждать добора пачки, мс (по умолчанию 200).
+
+Примечание: при недоступном Redis `push` бросает redis.RedisError — producer ставит
+обычную задачу `process_audio_file`.
+"""
+
+import os
+import time
+from typing import List
+
+import redis
+
+ARMED_TTL_SECONDS = 600
+
+
+def _client():
+    from app.tasks.core import redis_client
+    return redis_client
+
+
+def batch_size() -> int:
+    try:
+        return max(1, int(os.getenv('ASR_BATCH_SIZE', '1')))
+    except Exception:
+        return 1
+
+
+def batch_wait_ms() -> float:
+    try:
+        return max(0.0, float(os.getenv('ASR_BATCH_WAIT_MS', '200')))
+    except Exception:
+        return 200.0
+
+
+def enabled() -> bool:
+    return batch_size() > 1
+
+
+def pending_key(whisper_model: str) -> str:
+    return f"sciber:asr:batch:{whisper_model}"
+
+
+def armed_key(whisper_model: str) -> str:
+    return f"sciber:asr:batch:{whisper_model}:armed"
+
+
+def inflight_key(whisper_model: str, task_id: str) -> str:
+    return f"sciber:asr:batch:{whisper_model}:inflight:{task_id}"
+
+
+def push(whisper_model: str, audio_file_id: int) -> bool:
+    """Добавить id в список модели. True, если нужно поставить задачу сборки пачки."""
+    client = _client()
+    client.rpush(pending_key(whisper_model), audio_file_id)
+    return bool(client.set(armed_key(whisper_model), b'1', nx=True, ex=ARMED_TTL_SECONDS))
+
+
+def claimed(inflight: str) -> List[int]:
+    """id, уже забранные задачей (повторная доставка её сообщения после падения воркера)."""
+    return [int(v) for v in _client().lrange(inflight, 0, -1)]
+
+
+def pop(whisper_model: str, size: int, wait_ms: float, inflight: str) -> List[int]:
+    """Перенести до `size` id в список `inflight`; если их меньше, ждать добора не дольше `wait_ms`."""
+    client = _client()
+    key = pending_key(whisper_model)
+    deadline = time.monotonic() + wait_ms / 1000.0
+    ids: List[int] = []
+    while len(ids) < size:
+        value = client.lmove(key, inflight, 'LEFT', 'RIGHT')
+        if value is not None:
+            ids.append(int(value))
+            continue
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            break
+        # timeout=0 у BLMOVE — ждать бесконечно, поэтому не меньше 10 мс
+        value = client.blmove(key, inflight, max(0.01, remaining), 'LEFT', 'RIGHT')
+        if value is None:
+            break
+        ids.append(int(value))
+    return ids
+
+
+def finish(inflight: str) -> None:
+    """Пачка обработана: очистить список «в работе»."""
+    _client().delete(inflight)
+
+
+def rearm(whisper_model: str) -> bool:
+    """Снять флаг задачи сборки. True, если в списке остались id и нужна следующая задача."""
+    client = _client()
+    client.delete(armed_key(whisper_model))
+    if not client.llen(pending_key(whisper_model)):
+        return False
+    return bool(client.set(armed_key(whisper_model), b'1', nx=True, ex=ARMED_TTL_SECONDS))
+
+
+def requeue(whisper_model: str, inflight: str) -> None:
+    """Вернуть id из списка «в работе» в начало очереди модели (порядок сохраняется)."""
+    client = _client()
+    key = pending_key(whisper_model)
+    try:
+        # каждый LMOVE атомарен: id всегда лежит либо в одном списке, либо в другом
+        while client.lmove(inflight, key, 'RIGHT', 'LEFT') is not None:
+            pass
+    except redis.RedisError as e:
+        print(f"[batch] Failed to requeue files of {inflight}: {e}")
@@ -1,13 +1,10 @@
 import os
-import psutil
-from app.utils.settings import settings
-from datetime import datetime
 from celery import Celery
-from app.models.audio_file import AudioFile
 from app.models.enums import AudioFileStatus
-from app.db.session import SessionLocal
 import redis
+import json
 import time
+import uuid
 
 """
 Модуль Celery задач приложения.
@@ -30,135 +27,1013 @@ try:
 except Exception:
     _sync_interval = 30
 
+# Number of files per bulk enqueue message / per INSERT statement
+try:
+    _bulk_chunk_size = int(os.getenv("SYNC_BULK_CHUNK_SIZE", "500"))
+except Exception:
+    _bulk_chunk_size = 500
+
+# Full deep-verify (rescan of every model dir + full DB diff) runs much less often
+try:
+    _deep_sync_interval = int(os.getenv("WATCHER_DEEP_SYNC_INTERVAL_SECONDS", "3600"))
+except Exception:
+    _deep_sync_interval = 3600
+
+# Deep sync is split into shards: every whisper model x up to N contiguous filename ranges
+try:
+    _shard_buckets = max(1, int(os.getenv("SYNC_SHARD_BUCKETS", "4")))
+except Exception:
+    _shard_buckets = 4
+
+# Wall-clock budget of one shard run; unfinished shards resume from a cursor on the next tick
+try:
+    _shard_time_budget = float(os.getenv("SYNC_SHARD_TIME_BUDGET_SECONDS", str(max(5, int(_sync_interval * 0.8)))))
+except Exception:
+    _shard_time_budget = max(5.0, _sync_interval * 0.8)
+
 celery_app.conf.beat_schedule = {
     'sync_storage_with_db': {
         'task': 'app.tasks.core.sync_storage_with_db',
         'schedule': _sync_interval,
-    }
+    },
+    'sync_storage_with_db_deep': {
+        'task': 'app.tasks.core.sync_storage_with_db',
+        'schedule': _deep_sync_interval,
+        'kwargs': {'deep': True},
+    },
 }
 celery_app.conf.timezone = os.getenv('TZ', 'UTC')
+# Задачи обработки длинные: воркер не резервирует следующие сообщения, пока занят
+# (иначе короткая задача ждёт за длинной в буфере prefetch). Задачи очередей asr.*
+# подтверждаются по завершении (acks_late в их декораторах); Redis переотдаёт
+# неподтверждённое сообщение другому воркеру через visibility_timeout, поэтому он должен
+# быть больше самой долгой транскрипции (по умолчанию 12 ч)
+celery_app.conf.worker_prefetch_multiplier = 1
+try:
+    _visibility_timeout = int(os.getenv("CELERY_VISIBILITY_TIMEOUT_SECONDS", str(12 * 3600)))
+except Exception:
+    _visibility_timeout = 12 * 3600
+celery_app.conf.broker_transport_options = {'visibility_timeout': _visibility_timeout}
 
-# Redis client for lightweight coordination if needed
+# Redis client for lightweight coordination (sync locks, shard cursors)
 redis_client = redis.Redis(host=os.getenv('REDIS_HOST', 'redis'), port=6379, db=0)
 
-@celery_app.task
+SYNC_LOCK_KEY = 'sciber:sync:lock'
+SYNC_PENDING_SHARDS_KEY = 'sciber:sync:pending'
+
+
+class _NoLock:
+    """Заглушка lock'а, когда Redis недоступен (синхронизация идёт без взаимоисключения)."""
+
+    def release(self):
+        pass
+
+
+def _try_lock(name, timeout):
+    """
+    Взять распределённый lock в Redis без ожидания.
+
+    Returns:
+        объект lock с методом release(), либо None если lock уже занят другим процессом.
+    """
+    lock = redis_client.lock(name, timeout=timeout, blocking=False)
+    try:
+        if lock.acquire(blocking=False):
+            return lock
+        return None
+    except redis.RedisError as e:
+        print(f"[beat] Redis lock {name} unavailable, continuing without it: {e}")
+        return _NoLock()
+
+
+def _release_lock(lock):
+    try:
+        lock.release()
+    except Exception as e:
+        # lock мог истечь по timeout — это не ошибка синхронизации
+        print(f"[beat] Failed to release lock: {e}")
+
+@celery_app.task(acks_late=True)
 def process_audio_file(audio_file_id):
     """
-    Задача Celery: обработка одного аудиофайла по его id.
+    Задача Celery: первый этап обработки одного аудиофайла по его id — транскрипция.
 
     Логика:
-        - Проверяет наличие свободной оперативной памяти и при необходимости делает retry.
-        - Помечает запись в БД как PROCESSING (через синхронный helper) перед началом работы.
-        - Выполняет обработку (здесь место для реальной работы: транскрибция/транслейшн/и т.п.).
-        - По завершении помечает запись как DONE.
+        - Проверяет наличие свободной оперативной памяти; если её не хватает, сначала
+          вытесняет модели из кэша процесса, и только затем делает retry.
+        - Если у записи уже есть готовый транскрипт текущей версии конвейера (повтор задачи
+          после падения воркера на следующих этапах), распознавание пропускается.
+        - Считает отпечаток содержимого файла (один раз, хранится в записи); если у копии
+          того же аудио той же модели уже есть результаты текущей версии конвейера, копирует
+          их без распознавания (`_reuse_cached_results`).
+        - Иначе помечает запись как PROCESSING, транскрибирует файл движком ASR
+          (`app.processing.transcribe`; модель берётся из кэша процесса) и сохраняет
+          Transcript; при ошибке транскрипции запись получает статус FAILED.
+        - После готового транскрипта ставит цепочку следующих этапов — перевод и саммари
+          (`_start_followup_stages`); статус DONE запись получает после последнего этапа.
+
+    Очередь задачи выбирает продюсер (`_enqueue_processing`, `app.tasks.routing`) по модели
+    и длительности файла.
 
     Важно: все изменения в БД делаются через синхронные helper'ы из
     `app.db.ops.sync_impl`, чтобы не смешивать async и sync сессии.
     """
-    from app.models.audio_file import AudioFile
-    from app.models.enums import AudioFileStatus
-    from app.db.session import SessionLocal
-    min_free_ram_mb = int(os.getenv("MIN_FREE_RAM_MB", "1024"))
-    free_ram_mb = psutil.virtual_memory().available // (1024 * 1024)
-    if free_ram_mb < min_free_ram_mb:
+    from app.models.enums import AudioFileStatus, TranscriptStatus
+    from app.processing import transcribe
+    from app.processing.fingerprint import pipeline_version
+    from app.processing.model_cache import free_ram_mb, min_free_ram_mb, model_cache
+    if free_ram_mb() < min_free_ram_mb() and (
+        not model_cache().relieve_pressure() or free_ram_mb() < min_free_ram_mb()
+    ):
         raise process_audio_file.retry(countdown=30)
-    from app.db.ops.sync_impl import get_audio_file_by_id_sync, update_audio_file_status_sync
+    from app.db.ops.sync_impl import (
+        get_audio_file_by_id_sync, get_pipeline_state_sync, update_audio_file_status_sync, save_transcript_sync,
+    )
     audio_file = get_audio_file_by_id_sync(audio_file_id)
     if not audio_file:
         return f"AudioFile {audio_file_id} not found"
+    state = get_pipeline_state_sync(audio_file_id) or {}
+    if state.get('transcript_status') == TranscriptStatus.DONE and state.get('pipeline_version') == pipeline_version():
+        _start_followup_stages([audio_file_id])
+        return audio_file.filename
+    model_name = _model_name(audio_file.whisper_model)
+    audio_path = os.path.join(os.getenv('STORAGE_DIR', '/app/storage'), audio_file.storage_path)
+    if _reuse_cached_results([(audio_file_id, audio_file.content_hash, audio_path)], model_name):
+        _start_followup_stages([audio_file_id])
+        return audio_file.filename
     # Меняем статус на PROCESSING только при реальном старте обработки
     update_audio_file_status_sync(audio_file_id, AudioFileStatus.PROCESSING)
-    # TODO: добавить реальную обработку файла
-    print(f"Started processing: {audio_file.filename}")
-    # ... обработка файла ...
-    # После успешной обработки: обновим статус через sync-хелпер
-    update_audio_file_status_sync(audio_file_id, AudioFileStatus.DONE)
+    started = time.perf_counter()
+    try:
+        result = transcribe.process(audio_path, model_name, duration=audio_file.audio_duration_seconds)
+    except transcribe.TranscriptionError as e:
+        print(f"Transcription failed for {audio_file.filename}: {e}")
+        save_transcript_sync(audio_file_id, TranscriptStatus.FAILED, audio_file_status=AudioFileStatus.FAILED)
+        return audio_file.filename
+    save_transcript_sync(
+        audio_file_id, TranscriptStatus.DONE, text=result.get("text", ""),
+        processing_seconds=time.perf_counter() - started,
+        audio_duration_seconds=result.get("duration") or audio_file.audio_duration_seconds,
+        pipeline_version=pipeline_version(), language=result.get("language"),
+    )
+    _start_followup_stages([audio_file_id])
     return audio_file.filename
 
 
 @celery_app.task
-def enqueue_add_file(filename, whisper_model, storage_path, size, original_name, user_id=1):
+def translate_audio_file(audio_file_id):
     """
-    Синхронно добавить запись в БД (в Celery worker) и поставить задачу обработки.
+    Задача Celery: второй этап — перевод готового транскрипта на английский и русский
+    (`app.processing.translate`).
+
+    Исходный язык берётся из транскрипта (его определил движок ASR): текст копируется в
+    колонку этого языка, переводится только на остальные языки TRANSLATION_LANGUAGES.
+
+    Этап идемпотентен: без готового транскрипта ничего не делает, готовый перевод не
+    пересчитывает. Перевод и его статус сохраняются до того, как цепочка перейдёт к саммари.
+    При ошибке перевод и запись получают статус FAILED, а задача делает retry — повтор
+    продолжает цепочку с этого этапа.
+
+    Returns:
+        int | None: id перевода.
+    """
+    from app.models.enums import AudioFileStatus, TranscriptStatus, TranslationStatus
+    from app.processing import translate
+    from app.db.ops.sync_impl import get_pipeline_state_sync, save_translation_sync
+    state = get_pipeline_state_sync(audio_file_id)
+    if not state or state['transcript_status'] != TranscriptStatus.DONE:
+        return None
+    if state['translation_status'] == TranslationStatus.DONE:
+        return state['translation_id']
+    started = time.perf_counter()
+    try:
+        text = state['transcript_text'] or ''
+        # язык речи уже определён движком ASR; без него язык определяет первый перевод
+        source = state['transcript_language']
+        texts = {}
+        for lang in TRANSLATION_LANGUAGES:
+            if lang == source:
+                texts[lang] = text
+                continue
+            result = translate.process(text, source, lang)
+            source = source or result.get('detected_src')
+            texts[lang] = text if lang == source else result.get('translated_text', '')
+    except translate.TranslationError as e:
+        print(f"Translation failed for AudioFile {audio_file_id}: {e}")
+        save_translation_sync(state['transcript_id'], TranslationStatus.FAILED,
+                              audio_file_status=AudioFileStatus.FAILED)
+        raise translate_audio_file.retry(exc=e, countdown=60)
+    return save_translation_sync(
+        state['transcript_id'], TranslationStatus.DONE, source_language=source,
+        text_en=texts.get('en'), text_ru=texts.get('ru'), processing_seconds=time.perf_counter() - started,
+        audio_file_status=AudioFileStatus.PROCESSING,
+    )
+
+
+@celery_app.task
+def summarize_audio_file(audio_file_id):
+    """
+    Задача Celery: последний этап — саммари английского перевода на SUMMARY_LANGUAGE
+    (`app.processing.summarize`).
+
+    Этап идемпотентен: без готового перевода ничего не делает, готовое саммари не
+    пересчитывает. Саммари и статус записи DONE сохраняются одной транзакцией; при ошибке
+    саммари и запись получают статус FAILED, а задача делает retry.
+
+    Returns:
+        int | None: id саммари.
+    """
+    from app.models.enums import AudioFileStatus, SummaryStatus, TranslationStatus
+    from app.processing import summarize
+    from app.db.ops.sync_impl import get_pipeline_state_sync, save_summary_sync, update_audio_file_status_sync
+    state = get_pipeline_state_sync(audio_file_id)
+    if not state or state['translation_status'] != TranslationStatus.DONE:
+        return None
+    if state['summary_status'] == SummaryStatus.DONE:
+        update_audio_file_status_sync(audio_file_id, AudioFileStatus.DONE)
+        return None
+    base = 'en' if state['text_en'] else (state['source_language'] or 'unknown')
+    try:
+        result = summarize.process(state['text_en'] or state['transcript_text'] or '', target_lang=SUMMARY_LANGUAGE)
+    except summarize.SummaryError as e:
+        print(f"Summary failed for AudioFile {audio_file_id}: {e}")
+        save_summary_sync(state['translation_id'], SummaryStatus.FAILED, base, SUMMARY_LANGUAGE,
+                          audio_file_status=AudioFileStatus.FAILED)
+        raise summarize_audio_file.retry(exc=e, countdown=60)
+    return save_summary_sync(state['translation_id'], SummaryStatus.DONE, base, SUMMARY_LANGUAGE,
+                             text=result.get('summary', ''), audio_file_status=AudioFileStatus.DONE)
+
+
+# Языки перевода транскрипта (колонки Translation.text_en / text_ru) и язык саммари
+TRANSLATION_LANGUAGES = ('en', 'ru')
+SUMMARY_LANGUAGE = os.getenv('SUMMARY_LANGUAGE', 'ru')
+
+
+def _start_followup_stages(audio_file_ids):
+    """Поставить цепочку этапов после транскрипции: перевод -> саммари (по цепочке на запись).
+
+    Каждый этап сохраняет результат и статус до перехода к следующему и пропускает уже
+    готовую работу, поэтому повторная постановка цепочки продолжает с незавершённого этапа.
+    """
+    from celery import chain
+    from app.tasks.routing import DEFAULT_QUEUE
+    for audio_file_id in audio_file_ids:
+        chain(
+            translate_audio_file.si(audio_file_id).set(queue=DEFAULT_QUEUE),
+            summarize_audio_file.si(audio_file_id).set(queue=DEFAULT_QUEUE),
+        ).apply_async()
+
+
+@celery_app.task(acks_late=True)
+def process_audio_batch(whisper_model):
+    """
+    Задача Celery: обработать пачку коротких файлов одной модели (режим пакетов,
+    см. `app.tasks.batching`).
+
+    Логика:
+        - Переносит из списка модели в свой список «в работе» до ASR_BATCH_SIZE id, дожидаясь
+          добора не дольше ASR_BATCH_WAIT_MS, и сразу ставит следующую задачу сборки, если
+          список не пуст. Повторно доставленное сообщение (воркер упал посреди пачки)
+          продолжает ту же пачку из списка «в работе».
+        - При нехватке RAM или ошибке возвращает id в список модели (при нехватке RAM —
+          с retry, как `process_audio_file`); после успешной обработки список «в работе»
+          очищается.
+        - Одной транзакцией помечает записи PROCESSING и читает их пути; копиям уже
+          обработанного аудио результаты копируются (`_reuse_cached_results`).
+        - Распознаёт пачку одним вызовом движка (`transcribe.process_batch`); время
+          обработки делится между файлами пропорционально длительности.
+        - Транскрипты и статусы всех файлов пишутся одной транзакцией, затем для готовых
+          ставятся этапы перевода и саммари (`_start_followup_stages`). Записи с уже готовым
+          транскриптом (повтор после падения) сразу переходят к этим этапам.
+
+    Returns:
+        list[int]: id обработанных записей.
+    """
+    from app.processing.model_cache import free_ram_mb, min_free_ram_mb, model_cache
+    from app.tasks import batching
+    from app.tasks.routing import short_queue
+    inflight = batching.inflight_key(whisper_model, process_audio_batch.request.id or uuid.uuid4().hex)
+    # повторная доставка после падения воркера: продолжаем уже забранную пачку
+    ids = batching.claimed(inflight) or batching.pop(
+        whisper_model, batching.batch_size(), batching.batch_wait_ms(), inflight,
+    )
+    if batching.rearm(whisper_model):
+        process_audio_batch.apply_async((whisper_model,), queue=short_queue(whisper_model))
+    if not ids:
+        return []
+    if free_ram_mb() < min_free_ram_mb() and (
+        not model_cache().relieve_pressure() or free_ram_mb() < min_free_ram_mb()
+    ):
+        batching.requeue(whisper_model, inflight)
+        raise process_audio_batch.retry(countdown=30)
+    try:
+        done = _process_batch(whisper_model, ids)
+    except Exception:
+        batching.requeue(whisper_model, inflight)
+        raise
+    batching.finish(inflight)
+    return done
+
+
+def _process_batch(whisper_model, ids):
+    """Распознать забранную пачку и сохранить результаты (тело `process_audio_batch`)."""
+    from app.models.enums import AudioFileStatus, TranscriptStatus
+    from app.processing import transcribe
+    from app.processing.fingerprint import pipeline_version
+    from app.db.ops.sync_impl import claim_audio_files_sync, completed_transcripts_sync, save_transcripts_sync
+    transcribed = completed_transcripts_sync(ids, pipeline_version())
+    _start_followup_stages(transcribed)
+    rows = claim_audio_files_sync([i for i in ids if i not in transcribed], columns=_BATCH_COLUMNS)
+    storage_dir = os.getenv('STORAGE_DIR', '/app/storage')
+    reused = _reuse_cached_results(
+        [(row.id, row.content_hash, os.path.join(storage_dir, row.storage_path)) for row in rows], whisper_model,
+    )
+    done = transcribed + [row.id for row in rows if row.id in reused]
+    rows = [row for row in rows if row.id not in reused]
+    _start_followup_stages(list(reused))
+    if not rows:
+        return done
+    durations = [row.audio_duration_seconds for row in rows]
+    started = time.perf_counter()
+    try:
+        results = transcribe.process_batch(
+            [os.path.join(storage_dir, row.storage_path) for row in rows], whisper_model, durations=durations,
+        )
+    except transcribe.TranscriptionError as e:
+        print(f"Batch transcription failed for {len(rows)} files ({whisper_model}): {e}")
+        results = [e] * len(rows)
+    elapsed = time.perf_counter() - started
+    version = pipeline_version()
+    total = sum(d or 0.0 for d in durations)
+    records = []
+    for row, duration, result in zip(rows, durations, results):
+        if isinstance(result, transcribe.TranscriptionError):
+            print(f"Transcription failed for {row.filename}: {result}")
+            records.append({'audio_file_id': row.id, 'status': TranscriptStatus.FAILED})
+            continue
+        records.append({
+            'audio_file_id': row.id,
+            'status': TranscriptStatus.DONE,
+            'text': result.get("text", ""),
+            'processing_seconds': elapsed * (duration / total) if total and duration else elapsed / len(rows),
+            'audio_duration_seconds': result.get("duration") or duration,
+            'pipeline_version': version,
+            'language': result.get("language"),
+        })
+    save_transcripts_sync(records, done_status=AudioFileStatus.PROCESSING)
+    _start_followup_stages([r['audio_file_id'] for r in records if r['status'] == TranscriptStatus.DONE])
+    return done + [row.id for row in rows]
+
+
+@celery_app.task
+def enqueue_add_file(filename, whisper_model, storage_path, size, original_name, user_id=1, mtime_ns=None, inode=None):
     """
-    from app.models.audio_file import AudioFile
-    from app.models.enums import AudioFileStatus
-    from app.db.session import SessionLocal
+    Синхронно добавить запись в БД (в Celery worker) и поставить задачу обработки.
 
+    Если файл оказался переименованной копией уже известной записи (см. `_apply_renames`),
+    запись переименовывается на месте и повторная обработка не ставится.
+    Длительность, частота, каналы и MIME-тип новой записи берутся из заголовков файла
+    (`_probe_fields`).
+    """
     from app.db.ops.sync_impl import add_audio_file_sync, get_audio_file_sync
     exists = get_audio_file_sync(filename, whisper_model)
     if exists:
         return exists.id
+    if inode and not _apply_renames([_file_payload(filename, whisper_model, size, mtime_ns, inode)]):
+        renamed = get_audio_file_sync(filename, whisper_model)
+        return renamed.id if renamed else None
+    audio = _probe_fields(storage_path)
     new_id = add_audio_file_sync(
         user_id=user_id,
         filename=filename,
         original_name=original_name,
-        content_type="audio/unknown",
+        content_type=audio.get('content_type') or "audio/unknown",
         size=size,
         whisper_model=whisper_model,
         storage_path=storage_path,
-        audio_duration_seconds=0.0,
+        audio_duration_seconds=audio.get('audio_duration_seconds') or 0.0,
+        file_inode=inode,
+        file_mtime_ns=mtime_ns,
+        sample_rate=audio.get('sample_rate'),
+        channels=audio.get('channels'),
     )
     if new_id:
-        process_audio_file.delay(new_id)
+        _enqueue_processing(new_id, whisper_model, audio.get('audio_duration_seconds'))
     return new_id
 
 
+@celery_app.task
+def enqueue_add_files_bulk(files, user_id=1):
+    """
+    Добавить пачку файлов одним `INSERT ... ON CONFLICT DO NOTHING RETURNING id`
+    на chunk и поставить задачи обработки только для реально новых записей.
+    Переименованные файлы (см. `_apply_renames`) не вставляются, а переименовываются на месте.
+
+    Args:
+        files: список словарей {filename, whisper_model, storage_path, size, original_name,
+            mtime_ns, inode}.
+        user_id: владелец новых записей.
+
+    Returns:
+        list[int]: id вставленных записей.
+    """
+    from app.db.ops.sync_impl import add_audio_files_bulk_sync
+    files = _with_probe(_apply_renames(files))
+    rows = add_audio_files_bulk_sync(files, user_id=user_id, chunk_size=_bulk_chunk_size, columns=_ROUTE_COLUMNS)
+    for row in rows:
+        _enqueue_processing(row.id, row.whisper_model, row.audio_duration_seconds)
+    return [row.id for row in rows]
+
+
 @celery_app.task
 def enqueue_delete_file(filename, whisper_model):
     """
     Синхронно удалить запись аудиофайла (и каскадно связанные сущности).
     """
-    from app.models.audio_file import AudioFile
-    from app.db.session import SessionLocal
-
     from app.db.ops.sync_impl import delete_audio_file_sync
     return delete_audio_file_sync(filename, whisper_model)
 
 
-# Full sync task for Celery beat: scans storage and enqueues per-file add/delete tasks
 @celery_app.task
-def sync_storage_with_db():
+def enqueue_delete_files_bulk(ids):
+    """
+    Удалить пачку записей по id (один DELETE на chunk, каскад — на стороне БД).
+
+    Returns:
+        int: количество удалённых строк.
+    """
+    from app.db.ops.sync_impl import delete_audio_files_by_ids_sync
+    return delete_audio_files_by_ids_sync(ids, chunk_size=_bulk_chunk_size)
+
+
+@celery_app.task
+def enqueue_rename_files_bulk(whisper_model, renames):
+    """
+    Переименовать записи одной модели на месте, сохранив готовые результаты обработки.
+
+    Args:
+        whisper_model: папка модели.
+        renames: список пар [old_filename, new_filename].
+
+    Returns:
+        dict: {'renamed', 'deleted', 'missing'} (см. `rename_audio_files_sync`).
+    """
+    from app.db.ops.sync_impl import rename_audio_files_sync
+    return rename_audio_files_sync(whisper_model, [(old, new) for old, new in renames])
+
+
+@celery_app.task
+def enqueue_file_events_batch(adds, deletes, user_id=1):
+    """
+    Применить пачку событий watcher'а одним сообщением и одной транзакцией БД.
+
+    Args:
+        adds: список словарей файлов (формат `_file_payload`).
+        deletes: список пар [whisper_model, filename].
+        user_id: владелец новых записей.
+
+    Returns:
+        dict: {'added': [id, ...], 'deleted': n}.
+    """
+    from app.db.ops.sync_impl import apply_file_events_sync
+    adds = _with_probe(_apply_renames(adds))
+    rows, deleted = apply_file_events_sync(adds, [(m, f) for m, f in deletes], user_id=user_id,
+                                           chunk_size=_bulk_chunk_size, columns=_ROUTE_COLUMNS)
+    for row in rows:
+        _enqueue_processing(row.id, row.whisper_model, row.audio_duration_seconds)
+    return {'added': [row.id for row in rows], 'deleted': deleted}
+
+
+# Колонки новых строк, по которым выбирается очередь обработки (`app.tasks.routing`)
+_ROUTE_COLUMNS = ("id", "whisper_model", "audio_duration_seconds")
+
+
+# Колонки записей пачки для `process_audio_batch`
+_BATCH_COLUMNS = ("id", "filename", "storage_path", "audio_duration_seconds", "content_hash")
+
+
+def _reuse_cached_results(files, whisper_model):
+    """Сохранить отпечатки файлов и скопировать готовые результаты копий того же аудио.
+
+    Args:
+        files: список (audio_file_id, сохранённый content_hash или None, путь к файлу);
+            отпечаток считается (`app.processing.fingerprint`), только если он ещё не сохранён.
+        whisper_model: модель записей.
+
+    Returns:
+        dict: {audio_file_id: id записи-источника} для записей, получивших результаты из кэша.
+    """
+    from app.processing import fingerprint
+    from app.db.ops.sync_impl import reuse_cached_results_sync
+    if not files or not fingerprint.cache_enabled():
+        return {}
+    hashed = [(audio_file_id, content_hash or fingerprint.content_hash(path))
+              for audio_file_id, content_hash, path in files]
+    # статус DONE запись получит на последнем этапе цепочки (скопированные этапы пропускаются)
+    reused = reuse_cached_results_sync(hashed, whisper_model, fingerprint.pipeline_version(),
+                                       audio_file_status=AudioFileStatus.PROCESSING)
+    for audio_file_id, source_id in reused.items():
+        print(f"[cache] AudioFile {audio_file_id}: results copied from {source_id}")
+    return reused
+
+
+def _model_name(whisper_model):
+    return str(getattr(whisper_model, 'value', whisper_model)).lower()
+
+
+def _enqueue_processing(audio_file_id, whisper_model, duration):
+    """Поставить обработку записи (один раз за TTL дедупликации) в очередь модели/длительности.
+
+    В режиме пакетов (`app.tasks.batching`) короткий файл не получает своей задачи: его id
+    добавляется в список модели, а `process_audio_batch` ставится, только если его ещё
+    никто не поставил.
+    """
+    from app.tasks import batching, dedup
+    from app.tasks.routing import is_short, processing_queue, short_queue
+    if not dedup.claim_process(audio_file_id):
+        return
+    if batching.enabled() and is_short(duration):
+        model = _model_name(whisper_model)
+        try:
+            if batching.push(model, audio_file_id):
+                process_audio_batch.apply_async((model,), queue=short_queue(model))
+            return
+        except redis.RedisError as e:
+            print(f"[batch] Redis unavailable, enqueueing {audio_file_id} without batching: {e}")
+    process_audio_file.apply_async((audio_file_id,), queue=processing_queue(whisper_model, duration))
+
+
+def _probe_fields(storage_path):
+    """Длительность, частота, каналы и MIME-тип файла по заголовкам (`app.processing.probe`).
+
+    Returns:
+        dict: поля для записи AudioFile (пустой, если формат не распознан).
+    """
+    from app.processing.probe import probe
+    info = probe(os.path.join(os.getenv('STORAGE_DIR', '/app/storage'), storage_path))
+    if info is None:
+        return {}
+    return {
+        'audio_duration_seconds': info.duration,
+        'sample_rate': info.sample_rate,
+        'channels': info.channels,
+        'content_type': info.content_type,
+    }
+
+
+def _with_probe(files):
+    """Дополнить словари новых файлов результатами `_probe_fields`."""
+    return [{**f, **_probe_fields(f['storage_path'])} for f in files]
+
+
+def _same_file(row, size, mtime_ns, inode):
+    """True, если строка БД описывает тот же файл на диске (совпали inode, size и mtime).
+
+    Переименование в пределах одной ФС сохраняет все три значения, а повторно
+    использованный inode нового файла почти никогда не совпадает по size и mtime.
+    """
+    return bool(inode) and row.file_inode == inode and row.size == size and row.file_mtime_ns == mtime_ns
+
+
+def _apply_renames(files):
+    """Распознать среди новых файлов переименованные и обновить их строки на месте.
+
+    Файл считается переименованным, если в БД той же модели ровно одна строка совпадает
+    с ним по inode/size/mtime, а файла под её старым именем на диске уже нет.
+
+    Returns:
+        list: файлы, которые нужно вставить как новые.
+    """
+    from app.db.ops.sync_impl import find_audio_files_by_inode_sync, rename_audio_files_sync
+    storage_dir = os.getenv('STORAGE_DIR', '/app/storage')
+    by_model = {}
+    for f in files:
+        if f.get('inode'):
+            by_model.setdefault(f['whisper_model'], []).append(f)
+    renamed = set()
+    for model_name, candidates in by_model.items():
+        rows = find_audio_files_by_inode_sync(model_name, [f['inode'] for f in candidates])
+        renames = []
+        for f in candidates:
+            matches = [
+                r for r in rows
+                if r.filename != f['filename'] and _same_file(r, f['size'], f.get('mtime_ns'), f['inode'])
+                and not os.path.exists(os.path.join(storage_dir, model_name, r.filename))
+            ]
+            if len(matches) == 1:
+                renames.append((matches[0].filename, f['filename']))
+                renamed.add((model_name, f['filename']))
+        if renames:
+            print(f"[beat] Detected {len(renames)} renamed files in {model_name}: {rename_audio_files_sync(model_name, renames)}")
+    return [f for f in files if (f['whisper_model'], f['filename']) not in renamed]
+
+
+def _enqueue_renames(model_name, renames):
+    """Отправить пары переименований одной модели пачками; True если все сообщения ушли."""
+    ok = True
+    for start in range(0, len(renames), _bulk_chunk_size):
+        chunk = renames[start:start + _bulk_chunk_size]
+        try:
+            enqueue_rename_files_bulk.delay(model_name, chunk)
+        except Exception as e:
+            ok = False
+            print(f"[beat] Failed to enqueue bulk rename for {len(chunk)} files: {e}")
+    return ok
+
+
+def _enqueue_add_files(new_files):
+    """Отправить файлы на добавление пачками; True если все сообщения ушли в брокер.
+
+    Файлы, уже поставленные в очередь с тем же size/mtime (watcher или прошлый тик),
+    отбрасываются Redis-ключами идемпотентности до отправки в брокер.
+    """
+    from app.tasks import dedup
+    new_files = dedup.claim_adds(new_files)
+    ok = True
+    for start in range(0, len(new_files), _bulk_chunk_size):
+        chunk = new_files[start:start + _bulk_chunk_size]
+        try:
+            enqueue_add_files_bulk.delay(chunk, 1)
+        except Exception as e:
+            ok = False
+            dedup.release(*(dedup.add_key(f['whisper_model'], f['filename']) for f in chunk))
+            print(f"[beat] Failed to enqueue bulk add for {len(chunk)} files: {e}")
+    return ok
+
+
+def _enqueue_deletes(model_name, ids_by_name):
+    """Отправить строки одной модели (`{filename: id}`) на удаление пачками по id.
+
+    Returns:
+        bool: True если все сообщения ушли в брокер.
+    """
+    from app.tasks import dedup
+    names = dedup.claim_deletes(model_name, sorted(ids_by_name))
+    ok = True
+    for start in range(0, len(names), _bulk_chunk_size):
+        chunk = names[start:start + _bulk_chunk_size]
+        try:
+            enqueue_delete_files_bulk.delay([ids_by_name[n] for n in chunk])
+        except Exception as e:
+            ok = False
+            dedup.release(*(dedup.delete_key(model_name, n) for n in chunk))
+            print(f"[beat] Failed to enqueue bulk delete for {len(chunk)} rows: {e}")
+    return ok
+
+
+def _file_payload(filename, model_name, size, mtime_ns=None, inode=None):
+    return {
+        'filename': filename,
+        'whisper_model': model_name,
+        'storage_path': os.path.join(model_name, filename),
+        'size': size,
+        'original_name': filename,
+        'mtime_ns': mtime_ns,
+        'inode': inode,
+    }
+
+
+# Снимок листинга папки модели для шардов полной сверки (живёт до следующей полной сверки)
+_SNAPSHOT_TTL_SECONDS = 86400
+
+
+def _shard_cursor_key(model_name, bucket):
+    return f"sciber:sync:cursor:{model_name}:{bucket}"
+
+
+def _shard_range_key(model_name, bucket):
+    return f"sciber:sync:range:{model_name}:{bucket}"
+
+
+def _shard_files_key(model_name, bucket):
+    return f"sciber:sync:files:{model_name}:{bucket}"
+
+
+def _inode_index_key(model_name):
+    return f"sciber:sync:inodes:{model_name}"
+
+
+def _plan_shard_ranges(names, buckets):
+    """Разбить отсортированные имена на до `buckets` смежных диапазонов `(lo, hi]`.
+
+    Крайние диапазоны открыты (None), чтобы строки БД до первого и после последнего
+    имени на диске тоже попали в какой-то шард.
+    """
+    count = min(buckets, max(1, len(names)))
+    ranges = []
+    for i in range(count):
+        start, end = len(names) * i // count, len(names) * (i + 1) // count
+        ranges.append((names[start:end],
+                       names[start - 1] if i > 0 else None,
+                       names[end - 1] if i < count - 1 else None))
+    return ranges
+
+
+def _save_shard_snapshot(model_name, files, generation):
+    """Сохранить листинг папки (`{имя: (size, mtime_ns, inode)}`) в Redis по шардам.
+
+    Каждый шард получает свой диапазон имён и свою часть листинга, плюс общий индекс
+    inode -> файл для распознавания переименований между диапазонами.
+
+    Returns:
+        list: номера шардов модели.
+    """
+    ranges = _plan_shard_ranges(sorted(files), _shard_buckets)
+    pipe = redis_client.pipeline(transaction=False)
+    pipe.delete(_inode_index_key(model_name))
+    inodes = {st[2]: json.dumps([name, st[0], st[1]]) for name, st in files.items() if st[2]}
+    if inodes:
+        pipe.hset(_inode_index_key(model_name), mapping=inodes)
+        pipe.expire(_inode_index_key(model_name), _SNAPSHOT_TTL_SECONDS)
+    for bucket in range(_shard_buckets):
+        # курсоры и пометки прошлой сверки относятся к старым диапазонам
+        pipe.delete(_shard_cursor_key(model_name, bucket), _shard_range_key(model_name, bucket),
+                    _shard_files_key(model_name, bucket))
+        pipe.srem(SYNC_PENDING_SHARDS_KEY, f"{model_name}:{bucket}")
+    for bucket, (names, lo, hi) in enumerate(ranges):
+        pipe.set(_shard_range_key(model_name, bucket), json.dumps([generation, lo, hi]), ex=_SNAPSHOT_TTL_SECONDS)
+        if names:
+            pipe.hset(_shard_files_key(model_name, bucket),
+                      mapping={n: json.dumps(files[n]) for n in names})
+            pipe.expire(_shard_files_key(model_name, bucket), _SNAPSHOT_TTL_SECONDS)
+    pipe.execute()
+    return list(range(len(ranges)))
+
+
+def _load_shard_snapshot(model_name, bucket):
+    """Диапазон и листинг шарда из Redis.
+
+    Без снимка (ручной запуск, истёкший TTL) шард сам листит папку и отвечает за всю
+    модель; переименования тогда ищутся по индексу этого листинга.
+
+    Returns:
+        (generation, lo, hi, disk, find_by_inode): `disk` — `{имя: ScanEntry}`,
+        `find_by_inode(inodes)` — `{inode: ScanEntry}` для найденных inode.
+    """
+    from app.utils.storage_scanner import ScanEntry, scan_dir
+    raw_range = redis_client.get(_shard_range_key(model_name, bucket))
+    if raw_range is None:
+        storage_dir = os.getenv('STORAGE_DIR', '/app/storage')
+        listing = scan_dir(os.path.join(storage_dir, model_name))
+        by_inode = {e.inode: e for e in listing if e.inode}
+        return ('local', None, None, {e.filename: e for e in listing},
+                lambda inodes: {i: by_inode[i] for i in inodes if i in by_inode})
+    generation, lo, hi = json.loads(raw_range)
+
+    def entry(name, size, mtime_ns, inode):
+        return ScanEntry(model_name, name, os.path.join(model_name, name), size, mtime_ns, inode)
+
+    disk = {}
+    for name, st in redis_client.hgetall(_shard_files_key(model_name, bucket)).items():
+        name = name.decode('utf-8') if isinstance(name, bytes) else name
+        disk[name] = entry(name, *json.loads(st))
+
+    def find_by_inode(inodes):
+        inodes = list(inodes)
+        if not inodes:
+            return {}
+        found = redis_client.hmget(_inode_index_key(model_name), inodes)
+        return {i: entry(*json.loads(v), i) for i, v in zip(inodes, found) if v is not None}
+
+    return generation, lo, hi, disk, find_by_inode
+
+
+@celery_app.task
+def sync_storage_shard(model_name, bucket, time_budget=None):
+    """
+    Один шард полной сверки: файлы модели `model_name` в диапазоне имён шарда `(lo, hi]`.
+
+    Диапазон и листинг шарда сохраняет в Redis полная сверка (`_sync_full`), которая
+    листит каждую папку один раз; шард читает из БД только строки своего диапазона,
+    так что диск и БД делятся между шардами, а не читаются каждым целиком.
+    Шард идёт по отсортированным именам батчами: для батча с диапазоном `(lo, hi]`
+    из БД потоково читаются строки того же диапазона, разность даёт add/delete.
+    После каждого батча курсор (последнее обработанное имя) сохраняется в Redis;
+    если время `time_budget` исчерпано, шард помечается незавершённым и продолжит
+    с курсора на следующем тике beat вместо того, чтобы начинать заново.
+    Строка-сирота, чей файл найден в папке под другим именем (тот же inode/size/mtime),
+    переименовывается вместо удаления.
+
+    Returns:
+        dict: отчёт шарда (done, объёмы add/delete, число SQL-запросов).
+    """
+    from app.db.ops.sync_impl import iter_audio_file_keys_in_range_sync, count_queries
+
+    budget = _shard_time_budget if time_budget is None else time_budget
+    shard_id = f"{model_name}:{bucket}"
+    lock = _try_lock(f"sciber:sync:shard:{shard_id}", timeout=int(budget) + 60)
+    if lock is None:
+        print(f"[beat] shard {shard_id} is already running, skipping")
+        return {'shard': shard_id, 'skipped': True}
+
+    deadline = time.monotonic() + budget
+    cursor_key = _shard_cursor_key(model_name, bucket)
+    report = {'shard': shard_id, 'done': False, 'to_add': 0, 'to_delete': 0, 'to_rename': 0, 'queries': 0}
+    try:
+        generation, range_lo, range_hi, disk, find_by_inode = _load_shard_snapshot(model_name, bucket)
+        # курсор другой полной сверки (другие диапазоны) не используется
+        raw_cursor = redis_client.get(cursor_key)
+        cursor_generation, cursor = json.loads(raw_cursor) if raw_cursor else (None, None)
+        if cursor_generation != generation:
+            cursor = None
+        names = sorted(n for n in disk if cursor is None or n > cursor)
+
+        with count_queries() as counter:
+            lo = cursor if cursor is not None else range_lo
+            for start in range(0, max(len(names), 1), _bulk_chunk_size):
+                batch = names[start:start + _bulk_chunk_size]
+                last_batch = start + _bulk_chunk_size >= len(names)
+                # последний батч идёт до конца диапазона шарда, чтобы захватить строки БД после последнего имени
+                hi = range_hi if last_batch else batch[-1]
+                db_names = set()
+                missing = []
+                for row in iter_audio_file_keys_in_range_sync(model_name, lo, hi):
+                    db_names.add(row.filename)
+                    if row.filename not in disk:
+                        missing.append(row)
+                # новое имя переименованного файла может лежать в диапазоне другого шарда
+                moved_by_inode = find_by_inode({row.file_inode for row in missing if row.file_inode})
+                orphans = {}
+                renames = []
+                for row in missing:
+                    moved = moved_by_inode.get(row.file_inode)
+                    if moved is not None and _same_file(row, moved.size, moved.mtime_ns, moved.inode):
+                        renames.append((row.filename, moved.filename))
+                    else:
+                        orphans[row.filename] = row.id
+                renamed_to = {new for _, new in renames}
+                new_files = [_file_payload(n, model_name, disk[n].size, disk[n].mtime_ns, disk[n].inode)
+                             for n in batch if n not in db_names and n not in renamed_to]
+                ok = _enqueue_renames(model_name, renames)
+                ok = _enqueue_add_files(new_files) and ok
+                ok = _enqueue_deletes(model_name, orphans) and ok
+                if not ok:
+                    # курсор не двигаем: батч будет повторён на следующем тике
+                    redis_client.sadd(SYNC_PENDING_SHARDS_KEY, shard_id)
+                    break
+                report['to_add'] += len(new_files)
+                report['to_delete'] += len(orphans)
+                report['to_rename'] += len(renames)
+                if last_batch:
+                    report['done'] = True
+                    break
+                lo = hi
+                redis_client.set(cursor_key, json.dumps([generation, hi]), ex=_SNAPSHOT_TTL_SECONDS)
+                if time.monotonic() >= deadline:
+                    redis_client.sadd(SYNC_PENDING_SHARDS_KEY, shard_id)
+                    print(f"[beat] shard {shard_id} hit its time budget, will resume after {hi!r}")
+                    break
+        report['queries'] = counter.count
+        if report['done']:
+            redis_client.delete(cursor_key)
+            redis_client.srem(SYNC_PENDING_SHARDS_KEY, shard_id)
+    finally:
+        _release_lock(lock)
+    print(f"[beat] shard report: {report}")
+    return report
+
+
+def _dispatch_shards(shards):
+    """Запустить шарды полной сверки одной Celery group."""
+    from celery import group
+    if not shards:
+        return 0
+    group(sync_storage_shard.s(model_name, bucket) for model_name, bucket in shards).apply_async()
+    return len(shards)
+
+
+def _sync_full(storage_path, models, manifest):
+    """Полная сверка: свежий снимок манифеста, разбиение папок на диапазоны шардов и их запуск.
+
+    Каждая папка листится здесь один раз; шарды получают свою часть листинга через Redis.
+    """
+    from app.utils.storage_scanner import iter_storage
+
+    # mtime папки снимаем до листинга: изменения во время листинга дадут новый mtime
+    listings = {}
+    for model_name in models:
+        try:
+            listings[model_name] = ((storage_path / model_name).stat().st_mtime_ns, {})
+        except FileNotFoundError:
+            continue
+    for entry in iter_storage(str(storage_path), list(listings)):
+        listings[entry.whisper_model][1][entry.filename] = (entry.size, entry.mtime_ns, entry.inode)
+    manifest.clear()
+    for model_name, (dir_mtime_ns, files) in listings.items():
+        manifest.update_dir(model_name, dir_mtime_ns, files)
+
+    # Шарды нужны и для моделей без папки на диске: их строки в БД — сироты
+    generation = f"{time.time_ns()}"
+    shards = [(m, b) for m in models
+              for b in _save_shard_snapshot(m, listings.get(m, (None, {}))[1], generation)]
+    return {'mode': 'deep', 'disk_files': sum(len(f) for _, f in listings.values()), 'shards': _dispatch_shards(shards)}
+
+
+def _sync_incremental(storage_dir, models, manifest):
+    """Инкрементальная сверка: только папки с изменившимся mtime, только их дельта."""
+    from app.db.ops.sync_impl import get_audio_file_ids_sync, count_queries
+    from app.utils.storage_manifest import scan_incremental
+
+    deltas, skipped = scan_incremental(storage_dir, manifest, models)
+    to_add = to_delete = to_rename = 0
+    with count_queries() as counter:
+        for delta in deltas:
+            model_name = delta.whisper_model
+            # исчезнувший и появившийся файл с тем же (size, mtime_ns, inode) — переименование
+            removed_by_stat = {st: name for name, st in delta.removed.items() if st[2]}
+            renames = [(removed_by_stat[st], name) for name, st in sorted(delta.added.items()) if st in removed_by_stat]
+            renamed_from = {old for old, _ in renames}
+            renamed_to = {new for _, new in renames}
+            new_files = [_file_payload(f, model_name, st[0], st[1], st[2])
+                         for f, st in sorted(delta.added.items()) if f not in renamed_to]
+            removed = sorted(n for n in delta.removed if n not in renamed_from)
+            ids = {}
+            if removed:
+                ids = get_audio_file_ids_sync(model_name, removed)
+            ok = _enqueue_renames(model_name, renames)
+            ok = _enqueue_add_files(new_files) and ok
+            ok = _enqueue_deletes(model_name, ids) and ok
+            to_add += len(new_files)
+            to_delete += len(ids)
+            to_rename += len(renames)
+            if not ok:
+                # папка останется «грязной» и будет пересканирована на следующем тике
+                continue
+            if delta.dir_mtime_ns is None:
+                manifest.drop_dir(model_name)
+            else:
+                manifest.update_dir(model_name, delta.dir_mtime_ns, delta.files)
+    return {
+        'mode': 'incremental',
+        'dirs_scanned': len(deltas),
+        'dirs_skipped': skipped,
+        'to_add': to_add,
+        'to_delete': to_delete,
+        'to_rename': to_rename,
+        'queries': counter.count,
+    }
+
+
+# Sync task for Celery beat: incremental by default, full deep-verify on a rarer schedule
+@celery_app.task
+def sync_storage_with_db(deep=False):
+    """
+    Задача Celery beat: сверка содержимого storage с таблицей audio_files.
+
+    Режимы:
+        - incremental (по умолчанию): по манифесту пропускаются папки моделей, чей mtime
+          не менялся; для остальных в БД отправляется только дельта (новые/удалённые/
+          переименованные файлы).
+          Незавершённые шарды прошлой полной сверки перезапускаются с их курсоров.
+        - deep (`deep=True`, а также при пустом манифесте): манифест строится заново, а
+          сверка с БД выполняется группой шардов `sync_storage_shard` (model x диапазон имён).
+
+    Redis-lock `SYNC_LOCK_KEY` не даёт двум прогонам (beat и стартовый sync watcher'а)
+    выполняться одновременно. Он держится только на время листинга и постановки шардов:
+    сами шарды выполняются после снятия lock'а, каждый под своим lock'ом
+    `sciber:sync:shard:<model>:<n>`; курсор шарда прошлой полной сверки новой не подхватывается.
+
+    Returns:
+        dict: отчёт о прогоне (режим, объёмы дельты, число SQL-запросов, время).
+    """
     storage_dir = os.getenv('STORAGE_DIR', '/app/storage')
     from pathlib import Path
-    from app.tasks.core import enqueue_add_file, enqueue_delete_file
-    from app.db.ops.sync_impl import get_all_audio_files_sync, get_audio_file_sync
     from app.models.enums import WhisperModel
+    from app.utils.storage_manifest import StorageManifest, manifest_path_for
     storage_path = Path(storage_dir)
     if not storage_path.exists():
         print(f"[beat] storage_dir {storage_dir} does not exist, skipping sync")
-        return
+        return None
 
-    disk_files = []
-    for model_dir in storage_path.iterdir():
-        if not model_dir.is_dir():
-            continue
+    lock = _try_lock(SYNC_LOCK_KEY, timeout=max(60, _sync_interval * 2))
+    if lock is None:
+        print("[beat] Previous sync still running, skipping this run")
+        return {'mode': 'skipped'}
+
+    started = time.monotonic()
+    try:
         # Skip directories that are not valid whisper model names to avoid
         # passing invalid enum values into DB queries (causes DataError)
-        model_name = model_dir.name
-        if model_name not in [m.value for m in WhisperModel]:
-            print(f"[beat] skipping unknown model directory: {model_name}")
-            continue
-        for f in model_dir.iterdir():
-            if f.is_file() and f.suffix.lower() in ('.mp3', '.wav'):
-                disk_files.append((f.name, model_dir.name, str(f)))
-
-    # Enqueue add tasks for files missing in DB
-    for filename, model_name, abs_path in disk_files:
-        exists = get_audio_file_sync(filename, model_name)
-        if not exists:
-            try:
-                enqueue_add_file.delay(filename, model_name, os.path.relpath(abs_path, storage_dir), Path(abs_path).stat().st_size, filename, 1)
-            except Exception as e:
-                print(f"[beat] Failed to enqueue add for {filename}: {e}")
-
-    # Enqueue delete tasks for DB entries without files on disk
-    db_files = get_all_audio_files_sync()
-    for af in db_files:
-        expected_path = storage_path / af.whisper_model.value / af.filename
-        if not expected_path.exists():
-            try:
-                enqueue_delete_file.delay(af.filename, af.whisper_model.value)
-            except Exception as e:
-                print(f"[beat] Failed to enqueue delete for {af.filename}: {e}")
-
+        models = [m.value for m in WhisperModel]
+        manifest = StorageManifest.load(manifest_path_for(storage_dir))
+        if deep or manifest.is_empty():
+            report = _sync_full(storage_path, models, manifest)
+        else:
+            report = _sync_incremental(storage_dir, models, manifest)
+            # Шарды прошлой полной сверки, не уложившиеся в бюджет, продолжают с курсора
+            pending = sorted(m.decode('utf-8') if isinstance(m, bytes) else m
+                             for m in redis_client.smembers(SYNC_PENDING_SHARDS_KEY))
+            report['resumed_shards'] = _dispatch_shards(
+                [(p.rsplit(':', 1)[0], int(p.rsplit(':', 1)[1])) for p in pending]
+            )
+        try:
+            # тик без изменений в storage не переписывает манифест
+            if manifest.dirty:
+                manifest.save()
+        except OSError as e:
+            print(f"[beat] Failed to save storage manifest: {e}")
+    finally:
+        _release_lock(lock)
+    report['seconds'] = round(time.monotonic() - started, 3)
+    print(f"[beat] sync report: {report}")
+    return report
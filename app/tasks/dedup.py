@@ -0,0 +1,158 @@
+"""
+Идемпотентная постановка задач: короткоживущие ключи в Redis на стороне producer'а.
+
+Назначение:
+    - Один и тот же файл ставится в очередь из нескольких мест: `AudioFileHandler.on_created`,
+      стартовая синхронизация watcher'а и каждый тик beat до тех пор, пока воркер не вставит
+      строку. Ключи ниже отбрасывают такие дубликаты до отправки сообщения в брокер.
+
+Ключи:
+    - add:     `sciber:dedup:add:<model>:<filename>` со значением `<size>:<mtime_ns>`.
+               Повтор с тем же size/mtime — дубликат; изменившийся файл проходит.
+    - delete:  `sciber:dedup:delete:<model>:<filename>`.
+    - process: `sciber:dedup:process:<audio_file_id>`.
+    Успешный claim add снимает ключ delete того же файла и наоборот, чтобы цикл
+    «удалили — положили снова» не подавлялся.
+
+Счётчики подавленных дубликатов хранятся в хэше `sciber:dedup:suppressed` (по видам
+add/delete/process) и отдаются через `suppressed_counts()` и `GET /stats/dedup`.
+
+Конфигурация через окружение:
+    - ENQUEUE_DEDUP_TTL_SECONDS - время жизни ключей (по умолчанию 300).
+
+Примечание: при недоступном Redis claim всегда успешен (fail-open) — дубликаты
+безопасны для воркера, потерянные события — нет.
+"""
+
+import os
+from typing import Any, Dict, List, Optional, Sequence
+
+import redis
+
+try:
+    _TTL = int(os.getenv('ENQUEUE_DEDUP_TTL_SECONDS', '300'))
+except Exception:
+    _TTL = 300
+
+SUPPRESSED_KEY = 'sciber:dedup:suppressed'
+
+# Локальные счётчики процесса (дополняют общий хэш в Redis)
+_local_suppressed: Dict[str, int] = {}
+
+
+def _client():
+    from app.tasks.core import redis_client
+    return redis_client
+
+
+def add_key(whisper_model: str, filename: str) -> str:
+    return f"sciber:dedup:add:{whisper_model}:{filename}"
+
+
+def delete_key(whisper_model: str, filename: str) -> str:
+    return f"sciber:dedup:delete:{whisper_model}:{filename}"
+
+
+def process_key(audio_file_id: int) -> str:
+    return f"sciber:dedup:process:{audio_file_id}"
+
+
+def _fingerprint(size: Optional[int], mtime_ns: Optional[int]) -> bytes:
+    return f"{size}:{mtime_ns}".encode('utf-8')
+
+
+def _record_suppressed(kind: str, count: int = 1) -> None:
+    _local_suppressed[kind] = _local_suppressed.get(kind, 0) + count
+    try:
+        _client().hincrby(SUPPRESSED_KEY, kind, count)
+    except redis.RedisError:
+        pass
+
+
+def claim_add(whisper_model: str, filename: str, size: Optional[int], mtime_ns: Optional[int]) -> bool:
+    """True, если добавление файла с таким size/mtime ещё не ставилось в очередь за TTL."""
+    return bool(claim_adds([{
+        'whisper_model': whisper_model, 'filename': filename, 'size': size, 'mtime_ns': mtime_ns,
+    }]))
+
+
+def claim_adds(files: Sequence[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Отфильтровать пачку файлов на добавление одним pipeline-запросом к Redis.
+
+    Каждый элемент должен содержать whisper_model, filename, size и (желательно) mtime_ns.
+
+    Returns:
+        список элементов `files`, которые не являются дубликатами.
+    """
+    if not files:
+        return []
+    try:
+        pipe = _client().pipeline(transaction=False)
+        for f in files:
+            pipe.set(add_key(f['whisper_model'], f['filename']), _fingerprint(f['size'], f.get('mtime_ns')),
+                     ex=_TTL, get=True)
+        for f in files:
+            pipe.delete(delete_key(f['whisper_model'], f['filename']))
+        previous = pipe.execute()[:len(files)]
+    except redis.RedisError as e:
+        print(f"[dedup] Redis unavailable, not deduplicating adds: {e}")
+        return list(files)
+    fresh = [f for f, old in zip(files, previous) if old != _fingerprint(f['size'], f.get('mtime_ns'))]
+    if len(fresh) < len(files):
+        _record_suppressed('add', len(files) - len(fresh))
+    return fresh
+
+
+def claim_delete(whisper_model: str, filename: str) -> bool:
+    """True, если удаление файла ещё не ставилось в очередь за TTL."""
+    return bool(claim_deletes(whisper_model, [filename]))
+
+
+def claim_deletes(whisper_model: str, filenames: Sequence[str]) -> List[str]:
+    """Отфильтровать имена файлов одной модели на удаление; возвращает не-дубликаты."""
+    if not filenames:
+        return []
+    try:
+        pipe = _client().pipeline(transaction=False)
+        for name in filenames:
+            pipe.set(delete_key(whisper_model, name), b'1', nx=True, ex=_TTL)
+        for name in filenames:
+            pipe.delete(add_key(whisper_model, name))
+        claimed = pipe.execute()[:len(filenames)]
+    except redis.RedisError as e:
+        print(f"[dedup] Redis unavailable, not deduplicating deletes: {e}")
+        return list(filenames)
+    fresh = [name for name, ok in zip(filenames, claimed) if ok]
+    if len(fresh) < len(filenames):
+        _record_suppressed('delete', len(filenames) - len(fresh))
+    return fresh
+
+
+def claim_process(audio_file_id: int) -> bool:
+    """True, если `process_audio_file` для этой записи ещё не ставился за TTL."""
+    try:
+        ok = _client().set(process_key(audio_file_id), b'1', nx=True, ex=_TTL)
+    except redis.RedisError:
+        return True
+    if not ok:
+        _record_suppressed('process')
+    return bool(ok)
+
+
+def release(*keys: str) -> None:
+    """Снять ключи (например, если отправка в брокер не удалась и её нужно повторить)."""
+    if not keys:
+        return
+    try:
+        _client().delete(*keys)
+    except redis.RedisError:
+        pass
+
+
+def suppressed_counts() -> Dict[str, int]:
+    """Счётчики подавленных дубликатов по видам (общие для всех процессов, если Redis доступен)."""
+    try:
+        raw = _client().hgetall(SUPPRESSED_KEY)
+        return {k.decode('utf-8') if isinstance(k, bytes) else k: int(v) for k, v in raw.items()}
+    except redis.RedisError:
+        return dict(_local_suppressed)
@@ -5,11 +5,19 @@
 импорта в тестах и в коде, чтобы не ссылаться напрямую на `app.tasks.core`.
 """
 
-from .core import enqueue_add_file, enqueue_delete_file, process_audio_file, sync_storage_with_db
+from .core import enqueue_add_file, enqueue_add_files_bulk, enqueue_delete_file, enqueue_delete_files_bulk, enqueue_file_events_batch, enqueue_rename_files_bulk, process_audio_batch, process_audio_file, summarize_audio_file, sync_storage_shard, sync_storage_with_db, translate_audio_file
 
 __all__ = [
 	"enqueue_add_file",
+	"enqueue_add_files_bulk",
 	"enqueue_delete_file",
+	"enqueue_delete_files_bulk",
+	"enqueue_file_events_batch",
+	"enqueue_rename_files_bulk",
+	"process_audio_batch",
 	"process_audio_file",
+	"summarize_audio_file",
+	"sync_storage_shard",
 	"sync_storage_with_db",
+	"translate_audio_file",
 ]
@@ -0,0 +1,62 @@
+"""
+Маршрутизация задач обработки по очередям Celery.
+
+Назначение:
+    - `process_audio_file` больше не уходит в общую очередь: продюсер выбирает очередь по
+      модели Whisper и длительности файла (`audio_duration_seconds`, см. `app.processing.probe`),
+      поэтому трёхчасовой файл для `large` не задерживает сотни коротких файлов для `base`.
+    - Очереди:
+        * `asr.<model>` — обычные задачи модели;
+        * `asr.<model>.short` — файлы не длиннее ASR_SHORT_JOB_SECONDS (короткая полоса:
+          длинные задачи той же модели её не занимают).
+      Файлы с неизвестной длительностью (0) идут в обычную очередь модели.
+    - В режиме пакетов (`app.tasks.batching`) короткую полосу обслуживает
+      `process_audio_batch`.
+    - Служебные задачи (enqueue_*, sync_*) остаются в очереди по умолчанию `celery`.
+    - Воркер подписывается только на очереди моделей, для которых ему хватает RAM:
+        celery -A app.tasks.core.celery_app worker -Q asr.base.short,asr.base,asr.small.short,asr.small
+
+Конфигурация через окружение:
+    - ASR_SHORT_JOB_SECONDS - порог короткой полосы, с (по умолчанию 120; 0 — без короткой полосы).
+"""
+
+import os
+from typing import List, Optional
+
+from app.models.enums import WhisperModel
+
+DEFAULT_QUEUE = 'celery'
+
+
+def _short_job_seconds() -> float:
+    try:
+        return float(os.getenv('ASR_SHORT_JOB_SECONDS', '120'))
+    except Exception:
+        return 120.0
+
+
+def model_queue(whisper_model) -> str:
+    """Обычная очередь модели: 'base' / 'BASE' / WhisperModel.BASE -> 'asr.base'."""
+    return f"asr.{str(getattr(whisper_model, 'value', whisper_model)).lower()}"
+
+
+def short_queue(whisper_model) -> str:
+    """Короткая полоса модели: 'base' -> 'asr.base.short'."""
+    return f"{model_queue(whisper_model)}.short"
+
+
+def is_short(duration: Optional[float]) -> bool:
+    """True, если файл такой длительности идёт в короткую полосу."""
+    limit = _short_job_seconds()
+    return duration is not None and 0 < duration <= limit
+
+
+def processing_queue(whisper_model, duration: Optional[float]) -> str:
+    """Очередь `process_audio_file` для файла данной модели и длительности."""
+    return short_queue(whisper_model) if is_short(duration) else model_queue(whisper_model)
+
+
+def processing_queues(models=None) -> List[str]:
+    """Все очереди обработки для моделей (по умолчанию для всех `WhisperModel`), короткие первыми."""
+    models = list(models) if models is not None else list(WhisperModel)
+    return [short_queue(m) for m in models] + [model_queue(m) for m in models]
@@ -0,0 +1,244 @@
+"""
+Адаптивный polling-observer для watchdog.
+
+Назначение:
+    - Замена `watchdog.observers.polling.PollingObserver` для томов, где inotify не работает
+      (Docker на Windows/WSL, сетевые ФС). Стандартный PollingObserver на каждом тике
+      заново stat'ит всё дерево; здесь на тике выполняется один `stat` на каталог, а
+      перечитывается (scandir) только каталог, чей mtime изменился.
+    - Изменения содержимого файла «на месте» mtime каталога не меняют, поэтому недавно
+      созданные/изменённые («горячие») файлы дополнительно перепроверяются `stat`'ом,
+      пока не простоят HOT_SECONDS без изменений (нужно детектору завершения загрузки).
+    - Интервал опроса адаптивный: сбрасывается к минимуму при событиях или наличии горячих
+      файлов и растёт в `backoff` раз на каждом пустом тике до максимума.
+    Итог: стоимость тика пропорциональна числу каталогов и частоте изменений, а не размеру дерева.
+
+Конфигурация через окружение:
+    - WATCHER_POLL_MIN_SECONDS - минимальный интервал опроса (по умолчанию 0.5).
+    - WATCHER_POLL_MAX_SECONDS - максимальный интервал опроса в простое (по умолчанию 5).
+"""
+
+import os
+import threading
+import time
+from functools import partial
+from typing import Dict, Optional, Set, Tuple
+
+from watchdog.events import (
+    DirCreatedEvent, DirDeletedEvent, FileCreatedEvent, FileDeletedEvent, FileModifiedEvent, FileMovedEvent,
+)
+from watchdog.observers.api import DEFAULT_OBSERVER_TIMEOUT, BaseObserver, EventEmitter
+
+try:
+    _MIN_INTERVAL = float(os.getenv('WATCHER_POLL_MIN_SECONDS', '0.5'))
+except Exception:
+    _MIN_INTERVAL = 0.5
+try:
+    _MAX_INTERVAL = float(os.getenv('WATCHER_POLL_MAX_SECONDS', '5'))
+except Exception:
+    _MAX_INTERVAL = 5.0
+
+# Сколько секунд без изменений файл остаётся «горячим» (перепроверяется stat'ом на каждом тике)
+HOT_SECONDS = 10.0
+
+# mtime каталога свежее N секунд не считаем окончательным: на ФС с грубым разрешением
+# mtime второе изменение в ту же секунду иначе осталось бы незамеченным
+_MTIME_SETTLE_SECONDS = 2.0
+
+# (inode, size, mtime_ns)
+FileStat = Tuple[int, int, int]
+
+
+class _DirState:
+    __slots__ = ('mtime_ns', 'files', 'subdirs')
+
+    def __init__(self, mtime_ns: Optional[int], files: Dict[str, FileStat], subdirs: Set[str]):
+        self.mtime_ns = mtime_ns
+        self.files = files
+        self.subdirs = subdirs
+
+
+def _list_dir(path: str) -> Optional[_DirState]:
+    """Снимок одного каталога; None, если каталог исчез."""
+    try:
+        dir_mtime_ns: Optional[int] = os.stat(path).st_mtime_ns
+        files: Dict[str, FileStat] = {}
+        subdirs: Set[str] = set()
+        with os.scandir(path) as it:
+            for entry in it:
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        subdirs.add(entry.name)
+                    elif entry.is_file(follow_symlinks=False):
+                        st = entry.stat(follow_symlinks=False)
+                        files[entry.name] = (entry.inode(), st.st_size, st.st_mtime_ns)
+                except OSError:
+                    continue
+    except (FileNotFoundError, NotADirectoryError):
+        return None
+    if dir_mtime_ns is not None and time.time() - dir_mtime_ns / 1e9 < _MTIME_SETTLE_SECONDS:
+        dir_mtime_ns = None
+    return _DirState(dir_mtime_ns, files, subdirs)
+
+
+class AdaptivePollingEmitter(EventEmitter):
+    """Emitter с проверкой mtime каталогов, горячими файлами и адаптивным интервалом."""
+
+    def __init__(self, event_queue, watch, *, timeout=DEFAULT_OBSERVER_TIMEOUT, event_filter=None,
+                 min_interval: Optional[float] = None, max_interval: Optional[float] = None,
+                 backoff: float = 1.5):
+        super().__init__(event_queue, watch, timeout=timeout, event_filter=event_filter)
+        self.min_interval = _MIN_INTERVAL if min_interval is None else min_interval
+        self.max_interval = max(self.min_interval, _MAX_INTERVAL if max_interval is None else max_interval)
+        self.backoff = backoff
+        self.interval = self.min_interval
+        self._dirs: Dict[str, _DirState] = {}
+        # путь файла -> время последнего изменения (monotonic)
+        self._hot: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def on_thread_start(self) -> None:
+        self._dirs.clear()
+        self._hot.clear()
+        self._add_tree(self.watch.path, emit=False)
+
+    def queue_events(self, timeout: float) -> None:
+        # интервал опроса задаёт сам emitter, а не timeout observer'а
+        if self.stopped_event.wait(self.interval):
+            return
+        with self._lock:
+            if not self.should_keep_running():
+                return
+            changes = self.poll()
+            if changes or self._hot:
+                self.interval = self.min_interval
+            else:
+                self.interval = min(self.max_interval, self.interval * self.backoff)
+
+    def poll(self) -> int:
+        """Один тик опроса; возвращает число поставленных событий."""
+        changes = 0
+        now = time.monotonic()
+        for path in list(self._dirs):
+            state = self._dirs.get(path)
+            if state is None:
+                continue
+            try:
+                dir_mtime_ns = os.stat(path).st_mtime_ns
+            except OSError:
+                changes += self._drop_tree(path)
+                continue
+            if state.mtime_ns is not None and dir_mtime_ns == state.mtime_ns:
+                continue
+            new = _list_dir(path)
+            if new is None:
+                changes += self._drop_tree(path)
+                continue
+            changes += self._diff_files(path, state, new, now)
+            self._dirs[path] = new
+            if self.watch.is_recursive:
+                for name in sorted(state.subdirs - new.subdirs):
+                    changes += self._drop_tree(os.path.join(path, name))
+                for name in sorted(new.subdirs - state.subdirs):
+                    changes += self._add_tree(os.path.join(path, name), emit=True)
+        return changes + self._poll_hot(now)
+
+    def _diff_files(self, path: str, old: _DirState, new: _DirState, now: float) -> int:
+        removed = {n: st for n, st in old.files.items() if n not in new.files}
+        added = sorted(n for n in new.files if n not in old.files)
+        changes = 0
+        # переименование внутри каталога: исчезнувшее и появившееся имя с тем же inode
+        by_inode = {st[0]: n for n, st in removed.items() if st[0]}
+        created = []
+        for name in added:
+            src = by_inode.pop(new.files[name][0], None)
+            if src is not None and removed.pop(src, None) is not None:
+                self.queue_event(FileMovedEvent(os.path.join(path, src), os.path.join(path, name)))
+                # недописанный файл, переименованный из временного имени, остаётся горячим
+                if self._hot.pop(os.path.join(path, src), None) is not None:
+                    self._hot[os.path.join(path, name)] = now
+            else:
+                created.append(name)
+        for name in sorted(removed):
+            self.queue_event(FileDeletedEvent(os.path.join(path, name)))
+            self._hot.pop(os.path.join(path, name), None)
+        for name in created:
+            self.queue_event(FileCreatedEvent(os.path.join(path, name)))
+            self._hot[os.path.join(path, name)] = now
+        for name, st in new.files.items():
+            if name not in old.files or old.files[name] == st:
+                continue
+            file_path = os.path.join(path, name)
+            if old.files[name][0] != st[0]:
+                # имя заменено другим файлом (например, rename поверх существующего)
+                self.queue_event(FileDeletedEvent(file_path))
+                self.queue_event(FileCreatedEvent(file_path))
+            else:
+                self.queue_event(FileModifiedEvent(file_path))
+            self._hot[file_path] = now
+            changes += 1
+        return changes + len(added) + len(removed)
+
+    def _poll_hot(self, now: float) -> int:
+        changes = 0
+        for file_path, last_change in list(self._hot.items()):
+            dir_path, name = os.path.split(file_path)
+            state = self._dirs.get(dir_path)
+            if state is None or name not in state.files:
+                self._hot.pop(file_path, None)
+                continue
+            try:
+                st = os.stat(file_path)
+            except OSError:
+                # удаление заметит проверка mtime каталога
+                continue
+            current = (state.files[name][0], st.st_size, st.st_mtime_ns)
+            if current != state.files[name]:
+                state.files[name] = current
+                self._hot[file_path] = now
+                self.queue_event(FileModifiedEvent(file_path))
+                changes += 1
+            elif now - last_change > HOT_SECONDS:
+                self._hot.pop(file_path, None)
+        return changes
+
+    def _add_tree(self, path: str, emit: bool) -> int:
+        state = _list_dir(path)
+        if state is None:
+            return 0
+        changes = 0
+        self._dirs[path] = state
+        if emit:
+            if path != self.watch.path:
+                self.queue_event(DirCreatedEvent(path))
+            now = time.monotonic()
+            for name in sorted(state.files):
+                self.queue_event(FileCreatedEvent(os.path.join(path, name)))
+                self._hot[os.path.join(path, name)] = now
+            changes += 1 + len(state.files)
+        if self.watch.is_recursive:
+            for name in sorted(state.subdirs):
+                changes += self._add_tree(os.path.join(path, name), emit)
+        return changes
+
+    def _drop_tree(self, path: str) -> int:
+        state = self._dirs.pop(path, None)
+        if state is None:
+            return 0
+        changes = 1 + len(state.files)
+        for name in sorted(state.subdirs):
+            changes += self._drop_tree(os.path.join(path, name))
+        for name in sorted(state.files):
+            self.queue_event(FileDeletedEvent(os.path.join(path, name)))
+            self._hot.pop(os.path.join(path, name), None)
+        self.queue_event(DirDeletedEvent(path))
+        return changes
+
+
+class AdaptivePollingObserver(BaseObserver):
+    """Observer на базе `AdaptivePollingEmitter` (интерфейс как у `PollingObserver`)."""
+
+    def __init__(self, *, min_interval: Optional[float] = None, max_interval: Optional[float] = None,
+                 timeout: float = DEFAULT_OBSERVER_TIMEOUT):
+        emitter_cls = partial(AdaptivePollingEmitter, min_interval=min_interval, max_interval=max_interval)
+        super().__init__(emitter_cls, timeout=timeout)  # type: ignore[arg-type]
@@ -6,35 +6,67 @@ import os
     - Наблюдает за директорией, указанной в `settings.STORAGE_DIR`, на предмет
         появления и удаления аудиофайлов (например, `storage/base/*.mp3`).
     - Не выполняет прямых мутаций в базе данных из процесса FastAPI/Watcher. Вместо этого
-        он ставит задачи в Celery (enqueue_add_file / enqueue_delete_file). Это обеспечивае
+        он ставит задачи в Celery (enqueue_add_file / enqueue_delete_file, пачки событий — enqueue_file_events_batch). Это обеспечивае
         т централизацию всех изменений БД в worker'ах и избежание смешивания async/sync сессий.
 
 Основные компоненты:
-    - AudioFileHandler(FileSystemEventHandler): обрабатывает события create/delete и
-        откладывает enqueue задач (с debounce для уменьшения дубликатов).
-    - start_watching(): конфигурирует Observer или PollingObserver (на Windows/WSL
-        PollingObserver рекомендован), стартует наблюдение и ставит первоначальную задачу
+    - AudioFileHandler(FileSystemEventHandler): обрабатывает события create/delete/move и
+        откладывает enqueue задач (с debounce для уменьшения дубликатов). Переименование
+        внутри папки модели обновляет запись на месте (enqueue_rename_files_bulk), сохраняя
+        готовые результаты обработки.
+    - start_watching(): конфигурирует Observer или polling-observer (на Windows/WSL
+        polling рекомендован; по умолчанию `AdaptivePollingObserver`, перечитывающий только
+        каталоги с изменившимся mtime), стартует наблюдение и ставит первоначальную задачу
         full-sync в Celery через `sync_storage_with_db.delay()`.
 
 Надёжность и мотивация:
     - В Docker/WSL/Windows filesystem events могут теряться; поэтому предусмотрен
         периодический full-sync, который сверяет содержимое `storage` с БД и исправляет
         рассинхронизацию.
+    - Если брокер недоступен, события не теряются: они записываются в локальный outbox
+        (SQLite, WAL) и переотправляются по порядку пачками после восстановления брокера.
     - Debounce в обработчике уменьшает вероятность мульти-вызывов enqueue при атомарных
         операциях копирования/обновления файлов (копирование через временный файл -> переименование).
+        Все дедлайны обслуживает один поток `DebounceScheduler`, поэтому число потоков не
+        растёт при массовом копировании файлов.
+    - Новый файл ставится в очередь только после завершения загрузки: `StabilityTracker`
+        ждёт, пока size/mtime не меняются адаптивный интервал (on_modified его переносит),
+        а on_closed (IN_CLOSE_WRITE) ставит файл сразу. Загрузка через временный файл с
+        последующим переименованием приходит как on_moved и обрабатывается как создание.
 
 Конфигурация через окружение:
-    - WATCHER_USE_POLLING - включает PollingObserver (true/1/yes).
-    - WATCHER_DEBOUNCE_SECONDS - интервал дебаунса в секундах (по умолчанию 1.5).
+    - WATCHER_USE_POLLING - включает polling-observer (true/1/yes).
+    - WATCHER_POLLING_BACKEND - adaptive (по умолчанию, см. `app.utils.adaptive_polling`)
+        или watchdog (стандартный PollingObserver с полным обходом дерева на каждом тике).
+    - WATCHER_DEBOUNCE_SECONDS - минимальный «тихий» интервал, в течение которого size/mtime
+        нового файла не должны меняться (по умолчанию 1.5).
+    - WATCHER_STABLE_MAX_SECONDS - верхняя граница адаптивного тихого интервала (по умолчанию 30).
+    - WATCHER_BATCH_WINDOW_SECONDS - окно накопления событий в одно сообщение (по умолчанию 0.5).
+    - WATCHER_BATCH_MAX_EVENTS - максимальный размер пачки событий (по умолчанию 200).
+    - WATCHER_OUTBOX_PATH - файл outbox для событий, не отправленных из-за недоступного брокера
+        (по умолчанию `/var/lib/sciber/watcher_outbox.sqlite3`, см. `app.utils.event_outbox`).
+    - WATCHER_OUTBOX_RETRY_SECONDS - период попыток переотправки outbox (по умолчанию 5).
+    - WATCHER_LOG_LEVEL - уровень логов watcher'а (по умолчанию INFO); события файлов пишутся
+        на DEBUG с ограничением частоты (см. `app.utils.ratelimited_log`).
     - ENABLE_IN_PROCESS_WATCHER_SYNC - поддержка старого поведения периодического
         in-process sync (по безопасности отключена по умолчанию).
 
+Метрики (события по типам, отфильтрованные события, размер очередей, задержка и ошибки
+enqueue) собираются в `app.utils.metrics` и отдаются через `/metrics`.
+
 Примечание: все изменения БД выполняются воркером Celery; watcher только ставит задачи.
 """
 from watchdog.observers import Observer
 from watchdog.observers.polling import PollingObserver
-from watchdog.events import FileSystemEventHandler
+from watchdog.events import FileSystemEventHandler, FileCreatedEvent, FileDeletedEvent
 from app.utils.settings import settings
+from app.utils.adaptive_polling import AdaptivePollingObserver
+from app.utils.debounce import DebounceScheduler
+from app.utils.event_batcher import EventBatcher
+from app.utils.event_outbox import EventOutbox, outbox_path
+from app.utils.upload_stability import StabilityTracker
+from app.utils import metrics
+from app.utils.ratelimited_log import RateLimitedLogger, get_logger
 from app.models.enums import WhisperModel
 from app.models.database import Base
 from app.models.audio_file import AudioFile
@@ -47,12 +79,20 @@ from typing import Dict, Tuple
 # Глобальный lock для сериализации доступа к БД из watcher (периодический sync + обработчики событий)
 sync_lock = threading.Lock()
 
-# Debounce buffers: map (model, filename) -> Timer
+# Debounce scheduler: one thread + heap of deadlines keyed by (model, filename)
 # Purpose: prevent rapid duplicate enqueue_add_file calls for the same file
-_debounce_timers: Dict[Tuple[str, str], threading.Timer] = {}
+# without spawning a Timer thread per event
+_debounce = DebounceScheduler('watcher-debounce')
 # Debounce interval in seconds
 import sys
 
+# Per-event logging is level-gated and rate-limited: print() per event is itself a bottleneck in event storms
+_log = RateLimitedLogger(get_logger('watcher'))
+
+# (model, filename) -> monotonic time of the first event, for the event-to-enqueue latency histogram
+_first_seen: Dict[Tuple[str, str], float] = {}
+_FIRST_SEEN_MAX_AGE = 600.0
+
 # Default debounce interval; tests run under pytest should see immediate enqueue
 try:
     _env_val = os.getenv('WATCHER_DEBOUNCE_SECONDS')
@@ -60,89 +100,354 @@ try:
 except Exception:
     _DEBOUNCE_SECONDS = 1.5
 
+# Upper bound of the adaptive quiet interval for slow/stalling uploads
+try:
+    _STABLE_MAX_SECONDS = float(os.getenv('WATCHER_STABLE_MAX_SECONDS', '30'))
+except Exception:
+    _STABLE_MAX_SECONDS = 30.0
+
 # If running under pytest (unit tests), disable debounce to keep tests deterministic
 if 'pytest' in sys.modules:
     _DEBOUNCE_SECONDS = 0.0
 
 
+# Durable outbox for events that could not be sent while the broker was down
+_outbox = None
+_replay_lock = threading.Lock()
+try:
+    _OUTBOX_RETRY_SECONDS = float(os.getenv('WATCHER_OUTBOX_RETRY_SECONDS', '5'))
+except Exception:
+    _OUTBOX_RETRY_SECONDS = 5.0
+
+# Event batching: ready add/delete events are published as one broker message per
+# window (counted from the first event, so a lone upload waits at most one window)
+# or as soon as the batch reaches WATCHER_BATCH_MAX_EVENTS
+try:
+    _BATCH_WINDOW_SECONDS = float(os.getenv('WATCHER_BATCH_WINDOW_SECONDS', '0.5'))
+except Exception:
+    _BATCH_WINDOW_SECONDS = 0.5
+try:
+    _BATCH_MAX_EVENTS = int(os.getenv('WATCHER_BATCH_MAX_EVENTS', '200'))
+except Exception:
+    _BATCH_MAX_EVENTS = 200
+if 'pytest' in sys.modules:
+    _BATCH_WINDOW_SECONDS = 0.0
+
+
+def _collapse_events(events):
+    """Схлопнуть события одного файла, сохраняя порядок удаления и повторного создания.
+
+    Удаление отменяет предыдущее добавление того же файла; добавление после удаления
+    не заменяет его, а идёт следом (воркер применяет удаления первыми), поэтому файл,
+    удалённый и созданный заново в одном окне, получает новую запись вместо старой.
+    """
+    latest = {}
+    for event in events:
+        kind, model, filename = event[:3]
+        if kind == 'delete':
+            latest.pop(('add', model, filename), None)
+        latest.pop((kind, model, filename), None)
+        latest[(kind, model, filename)] = event
+    return list(latest.values())
+
+
+def _send_events(events):
+    """Отправить пачку событий `(kind, model, filename, payload)` в Celery (исключение — брокер недоступен).
+
+    Одиночное событие идёт прежней задачей enqueue_add_file/enqueue_delete_file,
+    пачка — одним сообщением enqueue_file_events_batch (одна транзакция в воркере).
+    """
+    events = _collapse_events(events)
+    adds = [payload for kind, _, _, payload in events if kind == 'add']
+    deletes = [(model, filename) for kind, model, filename, _ in events if kind == 'delete']
+    from app.tasks import core
+    if len(events) > 1:
+        core.enqueue_file_events_batch.delay(adds, deletes)
+    elif adds:
+        f = adds[0]
+        core.enqueue_add_file.delay(f['filename'], f['whisper_model'], f['storage_path'], f['size'],
+                                    f['original_name'], 1, mtime_ns=f['mtime_ns'], inode=f['inode'])
+    elif deletes:
+        core.enqueue_delete_file.delay(deletes[0][1], deletes[0][0])
+
+
+def _get_outbox():
+    global _outbox
+    if _outbox is None:
+        _outbox = EventOutbox(outbox_path())
+    return _outbox
+
+
+def _publish_events(events):
+    """Отправить пачку событий; если брокер недоступен — сохранить её в outbox.
+
+    Пока в outbox есть неотправленные события, новые дописываются за ними,
+    чтобы порядок событий для одного файла не нарушался.
+    """
+    try:
+        outbox = _get_outbox()
+        if outbox.count():
+            outbox.append(events)
+            metrics.WATCHER_OUTBOX_EVENTS.labels('stored').inc(len(events))
+            replay_outbox()
+            return
+    except Exception as e:
+        _log.warning('outbox', "Outbox unavailable: %s", e)
+        outbox = None
+    if _send_timed(events):
+        return
+    if outbox is None:
+        _release_dedup(events)
+        _log.warning('enqueue', "Failed to enqueue %d file events", len(events))
+        return
+    outbox.append(events)
+    metrics.WATCHER_OUTBOX_EVENTS.labels('stored').inc(len(events))
+    _log.warning('enqueue', "Broker unavailable, stored %d file events in outbox", len(events))
+
+
+def _release_dedup(events):
+    """Снять dedup-ключи отброшенных событий, чтобы beat мог поставить эти файлы сам."""
+    from app.tasks import dedup
+    dedup.release(*[(dedup.add_key if kind == 'add' else dedup.delete_key)(model, filename)
+                    for kind, model, filename, _ in events])
+
+
+def _send_timed(events):
+    """`_send_events` с метриками задержки/ошибок; True, если сообщение ушло в брокер."""
+    started = time.perf_counter()
+    try:
+        _send_events(events)
+    except Exception as e:
+        metrics.WATCHER_ENQUEUE_FAILURES.inc()
+        _log.warning('enqueue-error', "Broker publish failed: %s", e)
+        return False
+    metrics.WATCHER_ENQUEUE_SECONDS.observe(time.perf_counter() - started)
+    now = time.monotonic()
+    for _, model, filename, _ in events:
+        first = _first_seen.pop((model, filename), None)
+        if first is not None:
+            metrics.WATCHER_EVENT_TO_ENQUEUE_SECONDS.observe(now - first)
+    return True
+
+
+def replay_outbox():
+    """Переотправить события из outbox по порядку пачками до WATCHER_BATCH_MAX_EVENTS.
+
+    Returns:
+        int: число переотправленных событий (0, если брокер всё ещё недоступен).
+    """
+    if not _replay_lock.acquire(blocking=False):
+        return 0
+    sent = 0
+    try:
+        outbox = _get_outbox()
+        while True:
+            batch = outbox.peek(_BATCH_MAX_EVENTS)
+            if not batch:
+                break
+            if not _send_timed([event for _, event in batch]):
+                _log.info('outbox-replay', "Outbox replay postponed, broker still unavailable")
+                break
+            outbox.ack(batch[-1][0])
+            metrics.WATCHER_OUTBOX_EVENTS.labels('replayed').inc(len(batch))
+            sent += len(batch)
+    finally:
+        _replay_lock.release()
+    if sent:
+        print(f"[Watcher] Replayed {sent} file events from outbox")
+    return sent
+
+
+_batcher = EventBatcher(_publish_events, _BATCH_WINDOW_SECONDS, _BATCH_MAX_EVENTS, _debounce)
+
+
+def _enqueue_stable(key, filepath, st):
+    """Файл дописан: отбросить дубликат через dedup и добавить событие в пачку."""
+    from app.tasks import dedup
+    whisper_model, filename = key
+    try:
+        # Дубликат (тот же файл уже поставлен из watcher/beat) отбрасываем до брокера
+        if not dedup.claim_add(whisper_model, filename, st.st_size, st.st_mtime_ns):
+            metrics.WATCHER_EVENTS_FILTERED.labels('duplicate').inc()
+            _first_seen.pop(key, None)
+            return
+        _batcher.add(('add', *key), ('add', whisper_model, filename, _add_payload(whisper_model, filename, filepath, st)))
+    except Exception as e:
+        dedup.release(dedup.add_key(whisper_model, filename))
+        metrics.WATCHER_ENQUEUE_FAILURES.inc()
+        _log.warning('enqueue-add', "Failed to enqueue add task: %s", e)
+
+
+def _add_payload(whisper_model, filename, filepath, st):
+    return {
+        'filename': filename, 'whisper_model': whisper_model,
+        'storage_path': os.path.relpath(filepath, settings.STORAGE_DIR),
+        'size': st.st_size, 'original_name': filename, 'mtime_ns': st.st_mtime_ns, 'inode': st.st_ino,
+    }
+
+
+_uploads = StabilityTracker(_debounce, _enqueue_stable, _DEBOUNCE_SECONDS, _STABLE_MAX_SECONDS)
+
+metrics.track_pending('debounce', _debounce.pending)
+metrics.track_pending('uploads', _uploads.pending)
+metrics.track_pending('batch', _batcher.pending)
+
+
+def _upload_key(filepath):
+    """Ключ (model, filename) для аудиофайла в папке модели, иначе None."""
+    whisper_model = _model_of(filepath)
+    if not whisper_model or not _is_audio(filepath):
+        return None
+    return whisper_model, os.path.basename(filepath)
+
+
+def _model_of(filepath):
+    """Имя папки модели для пути `storage/<model>/<file>` либо None для прочих путей."""
+    parts = os.path.relpath(filepath, settings.STORAGE_DIR).split(os.sep)
+    if len(parts) != 2 or parts[0] not in [m.value for m in WhisperModel]:
+        return None
+    return parts[0]
+
+
+def _is_audio(filepath):
+    return filepath.lower().endswith(('.mp3', '.wav'))
+
+
 class AudioFileHandler(FileSystemEventHandler):
+    def on_moved(self, event):
+        if event.is_directory:
+            metrics.WATCHER_EVENTS_FILTERED.labels('directory').inc()
+            return
+        metrics.WATCHER_EVENTS.labels('moved').inc()
+        src, dest = event.src_path, event.dest_path
+        _log.debug('event', "on_moved event: %s -> %s", src, dest)
+        src_model, dest_model = _model_of(src), _model_of(dest)
+        src_key = _upload_key(src)
+        if src_key and _uploads.is_tracked(src_key):
+            # файл переименовали до окончания загрузки: в очередь он ещё не ставился
+            _uploads.cancel(src_key)
+            _first_seen.pop(src_key, None)
+            if dest_model:
+                self.on_created(FileCreatedEvent(dest))
+            return
+        if src_model and src_model == dest_model and _is_audio(src) and _is_audio(dest):
+            self._enqueue_rename(src_model, os.path.basename(src), dest)
+            return
+        # Перемещение между моделями или смена расширения: удаление + создание.
+        # Дальнейшее распознавание переименования по inode сделает воркер (enqueue_add_file).
+        if src_model and _is_audio(src):
+            self.on_deleted(FileDeletedEvent(src))
+        if dest_model:
+            self.on_created(FileCreatedEvent(dest))
+
+    def _enqueue_rename(self, whisper_model, old_filename, dest):
+        from app.tasks import dedup
+        new_filename = os.path.basename(dest)
+        try:
+            st = os.stat(dest)
+        except OSError:
+            # файл уже снова переместили/удалили — разберётся следующий sync
+            return
+        # Путь добавления (beat) не должен ставить новое имя повторно
+        dedup.claim_add(whisper_model, new_filename, st.st_size, st.st_mtime_ns)
+        try:
+            from app.tasks.core import enqueue_rename_files_bulk
+            enqueue_rename_files_bulk.delay(whisper_model, [(old_filename, new_filename)])
+        except Exception as e:
+            # Через outbox уходит добавление нового имени: воркер распознает
+            # переименование по inode/size/mtime (старого файла на диске уже нет)
+            metrics.WATCHER_ENQUEUE_FAILURES.inc()
+            _log.warning('enqueue-rename', "Failed to enqueue rename task, deferring as add: %s", e)
+            _publish_events([('add', whisper_model, new_filename, _add_payload(whisper_model, new_filename, dest, st))])
+
     def on_deleted(self, event):
         if event.is_directory:
+            metrics.WATCHER_EVENTS_FILTERED.labels('directory').inc()
             return
+        metrics.WATCHER_EVENTS.labels('deleted').inc()
         filepath = event.src_path
-        print(f"[Watcher] on_deleted event: {filepath}")
+        _log.debug('event', "on_deleted event: %s", filepath)
         filename = os.path.basename(filepath)
         # Извлекаем имя модели из пути
         rel_path = os.path.relpath(filepath, settings.STORAGE_DIR)
         parts = rel_path.split(os.sep)
         if len(parts) < 2:
+            metrics.WATCHER_EVENTS_FILTERED.labels('unknown_model').inc()
             return
         whisper_model = parts[0]
         # Проверяем, что модель допустима
         if whisper_model not in [m.value for m in WhisperModel]:
+            metrics.WATCHER_EVENTS_FILTERED.labels('unknown_model').inc()
             return
-        # Удаляем файл: ставим задачу в Celery, воркер выполнит удаление синхронно
-        try:
-            from app.tasks.core import enqueue_delete_file
-            enqueue_delete_file.delay(filename, whisper_model)
-        except Exception as e:
-            print(f"[Watcher] Failed to enqueue delete task: {e}")
+        # Отложенное добавление этого файла больше не актуально
+        _uploads.cancel((whisper_model, filename))
+        # Удаляем файл: событие уходит в пачку, воркер выполнит удаление синхронно
+        from app.tasks import dedup
+        if not dedup.claim_delete(whisper_model, filename):
+            metrics.WATCHER_EVENTS_FILTERED.labels('duplicate').inc()
+            _first_seen.pop((whisper_model, filename), None)
+            return
+        _first_seen.setdefault((whisper_model, filename), time.monotonic())
+        # отложенное добавление снимается; повторное создание после удаления уйдёт следом за ним
+        _batcher.discard(('add', whisper_model, filename))
+        _batcher.add(('delete', whisper_model, filename), ('delete', whisper_model, filename, None))
 
     def on_created(self, event):
         if event.is_directory:
+            metrics.WATCHER_EVENTS_FILTERED.labels('directory').inc()
             return
-        print(f"[Watcher] on_created event: {event.src_path}")
+        metrics.WATCHER_EVENTS.labels('created').inc()
+        _log.debug('event', "on_created event: %s", event.src_path)
         filepath = event.src_path
         # Проверяем, что это аудиофайл по расширению
         if not filepath.lower().endswith(('.mp3', '.wav')):
+            metrics.WATCHER_EVENTS_FILTERED.labels('extension').inc()
             return
         filename = os.path.basename(filepath)
         # Извлекаем имя модели из пути
         rel_path = os.path.relpath(filepath, settings.STORAGE_DIR)
         parts = rel_path.split(os.sep)
         if len(parts) < 2:
+            metrics.WATCHER_EVENTS_FILTERED.labels('unknown_model').inc()
             return
         whisper_model = parts[0]
         # Проверяем, что модель допустима
         if whisper_model not in [m.value for m in WhisperModel]:
+            metrics.WATCHER_EVENTS_FILTERED.labels('unknown_model').inc()
             return
-        # Добавляем файл: ставим задачу в Celery, воркер выполнит вставку и поставит задачу обработки
-        # Use debounce to avoid multiple rapid enqueues for the same file
-        key = (whisper_model, filename)
-
-        def _enqueue():
-            try:
-                from app.tasks.core import enqueue_add_file
-                enqueue_add_file.delay(filename, whisper_model, rel_path, os.path.getsize(filepath), filename, 1)
-            except Exception as e:
-                print(f"[Watcher] Failed to enqueue add task: {e}")
-            finally:
-                # remove timer reference
-                try:
-                    _debounce_timers.pop(key, None)
-                except Exception:
-                    pass
-
-        # Cancel existing timer if present
-        existing = _debounce_timers.get(key)
-        if existing:
-            try:
-                existing.cancel()
-            except Exception:
-                pass
-
-        if _DEBOUNCE_SECONDS and _DEBOUNCE_SECONDS > 0:
-            t = threading.Timer(_DEBOUNCE_SECONDS, _enqueue)
-            _debounce_timers[key] = t
-            t.daemon = True
-            t.start()
-        else:
-            # Immediate execution (useful for tests or when debounce disabled)
-            _enqueue()
-
-
-def start_watching():
+        # Добавляем файл: ставим задачу в Celery, когда загрузка завершится (size/mtime стабильны)
+        _first_seen.setdefault((whisper_model, filename), time.monotonic())
+        _uploads.touch((whisper_model, filename), filepath)
+
+    def on_modified(self, event):
+        # Запись в ещё не поставленный файл переносит проверку стабильности
+        if event.is_directory:
+            return
+        metrics.WATCHER_EVENTS.labels('modified').inc()
+        key = _upload_key(event.src_path)
+        if key and _uploads.is_tracked(key):
+            _uploads.touch(key, event.src_path)
+
+    def on_closed(self, event):
+        # IN_CLOSE_WRITE: писатель закрыл файл — быстрый путь без ожидания тихого интервала
+        if event.is_directory:
+            return
+        metrics.WATCHER_EVENTS.labels('closed').inc()
+        key = _upload_key(event.src_path)
+        if key:
+            _uploads.closed(key)
+
+
+def start_watching(stop_event=None):
+    """
+    Запустить observer над storage и блокироваться до `stop_event` (или KeyboardInterrupt).
+
+    Args:
+        stop_event: threading.Event для остановки (сервис watcher'а выставляет его при потере
+            лидерства или по SIGTERM). Без него функция работает до прерывания процесса.
+    """
     storage_dir = settings.STORAGE_DIR
+    stop_event = stop_event or threading.Event()
     # Синхронизация файлов и БД при запуске
     # Используем модульный sync_lock, чтобы не запускать несколько sync одновременно (asyncpg InterfaceError)
     try:
@@ -155,8 +460,13 @@ def start_watching():
     event_handler = AudioFileHandler()
     # Allow switching to PollingObserver when filesystem events are unreliable (Docker on Windows/WSL)
     use_polling = os.getenv("WATCHER_USE_POLLING", "false").lower() in ("1", "true", "yes")
-    observer = PollingObserver() if use_polling else Observer()
-    print(f"[Watcher] Using {'PollingObserver' if use_polling else 'Observer'}")
+    if not use_polling:
+        observer = Observer()
+    elif os.getenv("WATCHER_POLLING_BACKEND", "adaptive").lower() == "watchdog":
+        observer = PollingObserver()
+    else:
+        observer = AdaptivePollingObserver()
+    print(f"[Watcher] Using {type(observer).__name__}")
     observer.schedule(event_handler, storage_dir, recursive=True)
     observer.start()
     print(f"[Watcher] Monitoring {storage_dir} for new audio files...")
@@ -167,12 +477,6 @@ def start_watching():
     enable_in_process_sync = os.getenv("ENABLE_IN_PROCESS_WATCHER_SYNC", "false").lower() in ("1", "true", "yes")
     if not enable_in_process_sync:
         print("[Watcher] In-process periodic sync is disabled (use ENABLE_IN_PROCESS_WATCHER_SYNC=true to enable)")
-        try:
-            while True:
-                time.sleep(1)
-        except KeyboardInterrupt:
-            observer.stop()
-        observer.join()
 
     # If enabled, retain the previous periodic sync behavior (kept for backward compatibility)
     try:
@@ -181,11 +485,24 @@ def start_watching():
         sync_interval = 30
 
     last_sync = time.time()
+    last_replay = 0.0
     try:
-        while True:
-            time.sleep(1)
+        while not stop_event.wait(1):
+            # События, отложенные в outbox при недоступном брокере, переотправляем по порядку
+            if time.time() - last_replay >= _OUTBOX_RETRY_SECONDS:
+                last_replay = time.time()
+                # файлы, так и не поставленные в очередь (удалены до конца загрузки и т.п.)
+                stale = time.monotonic() - _FIRST_SEEN_MAX_AGE
+                for key, first in list(_first_seen.items()):
+                    if first < stale:
+                        _first_seen.pop(key, None)
+                try:
+                    if _get_outbox().count():
+                        replay_outbox()
+                except Exception as e:
+                    print(f"[Watcher] Outbox replay failed: {e}")
             # По таймеру вызываем полную синхронизацию — ставим задачу в Celery
-            if time.time() - last_sync >= sync_interval:
+            if enable_in_process_sync and time.time() - last_sync >= sync_interval:
                 # Попытка получить lock без блокировки — если предыдущий enqueue ещё выполняется, пропускаем запуск
                 if not sync_lock.acquire(blocking=False):
                     print("[Watcher] Previous sync still running, skipping this periodic sync")
@@ -205,5 +522,9 @@ def start_watching():
                         pass
                 last_sync = time.time()
     except KeyboardInterrupt:
-        observer.stop()
+        pass
+    observer.stop()
     observer.join()
+    # Уже накопленные события не теряем: отправляем неполную пачку
+    _batcher.flush()
+    print("[Watcher] Stopped")
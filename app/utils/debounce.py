@@ -0,0 +1,104 @@
+"""
+Планировщик отложенных вызовов с debounce на одном потоке.
+
+Назначение:
+    - Заменяет `threading.Timer` на каждое событие watcher'а: все отложенные вызовы
+      хранятся в одной min-куче по дедлайну и исполняются одним фоновым потоком.
+      Всплеск из 10k событий создаёт 10k записей в куче, а не 10k потоков ОС.
+    - Повторный `schedule` с тем же ключом переносит дедлайн (debounce): в куче
+      остаётся устаревшая запись, которая пропускается при извлечении (ленивое удаление).
+
+Пример использования:
+    scheduler = DebounceScheduler('watcher-debounce')
+    scheduler.schedule(('base', 'a.mp3'), 1.5, enqueue)
+    scheduler.cancel(('base', 'a.mp3'))
+"""
+
+import heapq
+import itertools
+import threading
+import time
+from typing import Callable, Dict, Hashable, List, Optional, Tuple
+
+
+class DebounceScheduler:
+    """Один поток + min-куча дедлайнов; потокобезопасные schedule/cancel."""
+
+    def __init__(self, name: str = 'debounce'):
+        self.name = name
+        self._cond = threading.Condition()
+        # (deadline, seq, key); актуальна только запись с seq из self._entries
+        self._heap: List[Tuple[float, int, Hashable]] = []
+        self._entries: Dict[Hashable, Tuple[int, Callable[[], None]]] = {}
+        self._seq = itertools.count()
+        self._thread: Optional[threading.Thread] = None
+        self._stopped = False
+
+    def schedule(self, key: Hashable, delay: float, fn: Callable[[], None]) -> None:
+        """Вызвать `fn` через `delay` секунд; повторный вызов с тем же key переносит дедлайн."""
+        with self._cond:
+            seq = next(self._seq)
+            self._entries[key] = (seq, fn)
+            heapq.heappush(self._heap, (time.monotonic() + delay, seq, key))
+            # устаревшие записи копятся при частых переносах — периодически сжимаем кучу
+            if len(self._heap) > 2 * len(self._entries) + 64:
+                self._heap = [item for item in self._heap if self._is_current(item)]
+                heapq.heapify(self._heap)
+            self._ensure_thread()
+            self._cond.notify()
+
+    def cancel(self, key: Hashable) -> bool:
+        """Отменить отложенный вызов; True, если он был запланирован."""
+        with self._cond:
+            return self._entries.pop(key, None) is not None
+
+    def pending(self) -> int:
+        """Число запланированных (ещё не выполненных) вызовов."""
+        with self._cond:
+            return len(self._entries)
+
+    def stop(self) -> None:
+        """Остановить поток; невыполненные вызовы отбрасываются."""
+        with self._cond:
+            self._stopped = True
+            self._entries.clear()
+            self._heap.clear()
+            self._cond.notify()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+
+    def _is_current(self, item: Tuple[float, int, Hashable]) -> bool:
+        entry = self._entries.get(item[2])
+        return entry is not None and entry[0] == item[1]
+
+    def _ensure_thread(self) -> None:
+        if self._thread is None or not self._thread.is_alive():
+            self._stopped = False
+            self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+            self._thread.start()
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                fn = None
+                while fn is None:
+                    if self._stopped:
+                        return
+                    if not self._heap:
+                        self._cond.wait()
+                        continue
+                    deadline, seq, key = self._heap[0]
+                    if not self._is_current(self._heap[0]):
+                        heapq.heappop(self._heap)
+                        continue
+                    timeout = deadline - time.monotonic()
+                    if timeout > 0:
+                        self._cond.wait(timeout)
+                        continue
+                    heapq.heappop(self._heap)
+                    fn = self._entries.pop(key)[1]
+            # вызов вне lock'а: callback может сам планировать новые вызовы
+            try:
+                fn()
+            except Exception as e:
+                print(f"[{self.name}] Scheduled call failed: {e}")
@@ -0,0 +1,63 @@
+"""
+Накопление событий watcher'а в пачки для одной отправки в брокер.
+
+Назначение:
+    - Вместо сообщения Celery на каждый файл события собираются в окне `window`
+      секунд или до `max_events` штук и публикуются одним вызовом `flush`.
+    - Окно отсчитывается от первого события пачки и не продлевается следующими,
+      поэтому одиночная загрузка уходит не позже чем через `window` секунд.
+    - Несколько событий для одного ключа внутри окна схлопываются: в пачку попадает
+      последнее; `discard` снимает отложенное событие ключа.
+
+Таймер окна обслуживает общий `DebounceScheduler`, отдельных потоков не создаётся.
+"""
+
+import threading
+from typing import Any, Callable, Dict, Hashable, List
+
+from app.utils.debounce import DebounceScheduler
+
+
+class EventBatcher:
+    """Буфер событий с ограничением по времени (window) и по размеру (max_events)."""
+
+    def __init__(self, flush: Callable[[List[Any]], None], window: float, max_events: int,
+                 scheduler: DebounceScheduler):
+        self._flush = flush
+        self.window = window
+        self.max_events = max(1, max_events)
+        self._scheduler = scheduler
+        self._lock = threading.Lock()
+        self._events: Dict[Hashable, Any] = {}
+        self._timer_key = ('event-batch', id(self))
+
+    def add(self, key: Hashable, event: Any) -> None:
+        """Добавить событие; при заполнении пачки или нулевом окне она публикуется сразу."""
+        with self._lock:
+            # более позднее событие для того же ключа заменяет прежнее и уходит в конец пачки
+            self._events.pop(key, None)
+            self._events[key] = event
+            first = len(self._events) == 1
+            full = len(self._events) >= self.max_events
+        if self.window <= 0 or full:
+            self.flush()
+        elif first:
+            self._scheduler.schedule(self._timer_key, self.window, self.flush)
+
+    def discard(self, key: Hashable) -> bool:
+        """Убрать отложенное событие ключа; True, если оно было в пачке."""
+        with self._lock:
+            return self._events.pop(key, None) is not None
+
+    def flush(self) -> None:
+        """Опубликовать накопленные события (пустая пачка игнорируется)."""
+        with self._lock:
+            events = list(self._events.values())
+            self._events.clear()
+        self._scheduler.cancel(self._timer_key)
+        if events:
+            self._flush(events)
+
+    def pending(self) -> int:
+        with self._lock:
+            return len(self._events)
@@ -0,0 +1,91 @@
+"""
+Локальный outbox событий watcher'а на SQLite (WAL).
+
+Назначение:
+    - Если брокер (Redis) недоступен, события add/delete не теряются: они дописываются
+      в журнал на диске и после восстановления брокера переотправляются по порядку
+      пачками — дешёвая дельта вместо полного пересканирования storage.
+    - Журнал append-only: строки удаляются только после подтверждённой отправки
+      (`ack` по максимальному id отправленной пачки).
+
+Формат события: `(kind, whisper_model, filename, payload)` — тот же, что у пачек
+`EventBatcher` в `app.utils.audio_watcher`.
+
+Конфигурация через окружение:
+    - WATCHER_OUTBOX_PATH - путь к файлу outbox (по умолчанию
+        `/var/lib/sciber/watcher_outbox.sqlite3`). Outbox лежит на локальном диске контейнера
+        watcher'а (в docker-compose — именованный том), а не в общем storage: SQLite WAL
+        ненадёжен на сетевых ФС, и журнал одного экземпляра не должен видеть другой.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, List, Optional, Tuple
+
+Event = Tuple[str, str, str, Optional[dict]]
+
+DEFAULT_OUTBOX_PATH = '/var/lib/sciber/watcher_outbox.sqlite3'
+
+
+def outbox_path() -> str:
+    """Путь к файлу outbox (WATCHER_OUTBOX_PATH или путь по умолчанию)."""
+    return os.getenv('WATCHER_OUTBOX_PATH') or DEFAULT_OUTBOX_PATH
+
+
+class EventOutbox:
+    """Упорядоченный журнал неотправленных событий (одно соединение SQLite под lock'ом)."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        # WAL + NORMAL: запись переживает падение процесса, fsync только на checkpoint
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS events ('
+            ' id INTEGER PRIMARY KEY AUTOINCREMENT,'
+            ' kind TEXT NOT NULL,'
+            ' whisper_model TEXT NOT NULL,'
+            ' filename TEXT NOT NULL,'
+            ' payload TEXT,'
+            ' created_at REAL NOT NULL)'
+        )
+
+    def append(self, events: List[Event]) -> None:
+        """Дописать события в конец журнала одной транзакцией."""
+        now = time.time()
+        rows = [(kind, model, filename, json.dumps(payload) if payload is not None else None, now)
+                for kind, model, filename, payload in events]
+        with self._lock, self._conn:
+            self._conn.executemany(
+                'INSERT INTO events (kind, whisper_model, filename, payload, created_at) VALUES (?, ?, ?, ?, ?)',
+                rows,
+            )
+
+    def peek(self, limit: int) -> List[Tuple[int, Event]]:
+        """Вернуть до `limit` самых старых событий как `(id, event)` без удаления."""
+        with self._lock:
+            rows = self._conn.execute(
+                'SELECT id, kind, whisper_model, filename, payload FROM events ORDER BY id LIMIT ?', (limit,)
+            ).fetchall()
+        return [(id_, (kind, model, filename, json.loads(payload) if payload else None))
+                for id_, kind, model, filename, payload in rows]
+
+    def ack(self, upto_id: int) -> None:
+        """Удалить отправленные события с id <= upto_id."""
+        with self._lock, self._conn:
+            self._conn.execute('DELETE FROM events WHERE id <= ?', (upto_id,))
+
+    def count(self) -> int:
+        with self._lock:
+            row: Any = self._conn.execute('SELECT COUNT(*) FROM events').fetchone()
+        return int(row[0])
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,84 @@
+"""
+Метрики приложения в формате Prometheus (prometheus_client).
+
+Назначение:
+    - Счётчики и гистограммы watcher'а: события по типам, отфильтрованные события,
+      размер очередей debounce/загрузок/пачек, задержка и ошибки постановки в брокер.
+    - Экспорт:
+        * `GET /metrics` процесса API — метрики самого процесса плюс последний снимок,
+          опубликованный отдельным сервисом watcher'а в Redis (`publish_snapshot`);
+        * HTTP-эндпоинт самого сервиса watcher'а (`start_http_server`, порт WATCHER_METRICS_PORT).
+
+Конфигурация через окружение:
+    - WATCHER_METRICS_PORT - порт HTTP-эндпоинта метрик сервиса watcher'а (по умолчанию 9108, 0 — выключен).
+"""
+
+import os
+from typing import Callable
+
+import redis
+from prometheus_client import CollectorRegistry, Counter, Gauge, Histogram, generate_latest
+
+try:
+    WATCHER_METRICS_PORT = int(os.getenv('WATCHER_METRICS_PORT', '9108'))
+except Exception:
+    WATCHER_METRICS_PORT = 9108
+
+# Снимок метрик watcher'а в Redis (для /metrics процесса API)
+SNAPSHOT_KEY = 'sciber:metrics:watcher'
+SNAPSHOT_TTL_SECONDS = 60
+
+REGISTRY = CollectorRegistry(auto_describe=True)
+
+WATCHER_EVENTS = Counter(
+    'sciber_watcher_events_total', 'Filesystem events received by the watcher', ['type'], registry=REGISTRY,
+)
+WATCHER_EVENTS_FILTERED = Counter(
+    'sciber_watcher_events_filtered_total', 'Watcher events ignored before enqueue', ['reason'], registry=REGISTRY,
+)
+WATCHER_PENDING = Gauge(
+    'sciber_watcher_pending', 'Entries waiting inside the watcher', ['stage'], registry=REGISTRY,
+)
+WATCHER_ENQUEUE_SECONDS = Histogram(
+    'sciber_watcher_enqueue_seconds', 'Duration of one broker publish from the watcher',
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5),
+    registry=REGISTRY,
+)
+WATCHER_EVENT_TO_ENQUEUE_SECONDS = Histogram(
+    'sciber_watcher_event_to_enqueue_seconds', 'Time from the filesystem event to the broker publish',
+    buckets=(0.1, 0.5, 1.0, 2.0, 5.0, 10.0, 30.0, 60.0, 300.0),
+    registry=REGISTRY,
+)
+WATCHER_ENQUEUE_FAILURES = Counter(
+    'sciber_watcher_enqueue_failures_total', 'Broker publishes from the watcher that failed', registry=REGISTRY,
+)
+WATCHER_OUTBOX_EVENTS = Counter(
+    'sciber_watcher_outbox_events_total', 'Events stored in / replayed from the watcher outbox', ['op'],
+    registry=REGISTRY,
+)
+
+
+def track_pending(stage: str, fn: Callable[[], float]) -> None:
+    """Отдавать значение gauge `sciber_watcher_pending{stage}` из функции в момент сбора."""
+    WATCHER_PENDING.labels(stage).set_function(fn)
+
+
+def render() -> bytes:
+    """Метрики процесса в текстовом формате Prometheus."""
+    return generate_latest(REGISTRY)
+
+
+def publish_snapshot(client) -> None:
+    """Опубликовать метрики процесса в Redis, чтобы их отдавал `/metrics` API."""
+    try:
+        client.set(SNAPSHOT_KEY, render(), ex=SNAPSHOT_TTL_SECONDS)
+    except redis.RedisError:
+        pass
+
+
+def read_snapshot(client) -> bytes:
+    """Последний снимок метрик сервиса watcher'а (пустой, если его нет или Redis недоступен)."""
+    try:
+        return client.get(SNAPSHOT_KEY) or b''
+    except redis.RedisError:
+        return b''
@@ -0,0 +1,67 @@
+"""
+Логирование с ограничением частоты для горячих путей (события watcher'а).
+
+Назначение:
+    - `print()` на каждое событие сам становится узким местом при всплеске событий.
+      `RateLimitedLogger` пропускает не больше `burst` сообщений одного ключа за `period`
+      секунд; остальные считает и сообщает их число одной строкой при следующем
+      пропущенном сообщении этого ключа.
+    - Уровень фильтруется до форматирования: при уровне INFO вызовы debug почти бесплатны.
+
+Конфигурация через окружение:
+    - WATCHER_LOG_LEVEL - уровень логов watcher'а (по умолчанию INFO).
+"""
+
+import logging
+import os
+import threading
+import time
+from typing import Any, Dict, Tuple
+
+
+def get_logger(name: str, level_env: str = 'WATCHER_LOG_LEVEL') -> logging.Logger:
+    """Логгер с уровнем из окружения и простым обработчиком в stderr (если его ещё нет)."""
+    logger = logging.getLogger(name)
+    logger.setLevel(os.getenv(level_env, 'INFO').upper())
+    if not logger.handlers and not logging.getLogger().handlers:
+        handler = logging.StreamHandler()
+        handler.setFormatter(logging.Formatter('%(asctime)s %(levelname)s [%(name)s] %(message)s'))
+        logger.addHandler(handler)
+    return logger
+
+
+class RateLimitedLogger:
+    """Обёртка над logging.Logger: не больше `burst` сообщений на ключ за `period` секунд."""
+
+    def __init__(self, logger: logging.Logger, period: float = 10.0, burst: int = 5):
+        self.logger = logger
+        self.period = period
+        self.burst = burst
+        self._lock = threading.Lock()
+        # ключ -> (начало окна, выведено в окне, подавлено)
+        self._windows: Dict[str, Tuple[float, int, int]] = {}
+
+    def log(self, level: int, key: str, msg: str, *args: Any) -> None:
+        if not self.logger.isEnabledFor(level):
+            return
+        now = time.monotonic()
+        with self._lock:
+            started, emitted, suppressed = self._windows.get(key, (now, 0, 0))
+            if now - started >= self.period:
+                started, emitted = now, 0
+            if emitted >= self.burst:
+                self._windows[key] = (started, emitted, suppressed + 1)
+                return
+            self._windows[key] = (started, emitted + 1, 0)
+        if suppressed:
+            msg = f"{msg} ({suppressed} similar messages suppressed)"
+        self.logger.log(level, msg, *args)
+
+    def debug(self, key: str, msg: str, *args: Any) -> None:
+        self.log(logging.DEBUG, key, msg, *args)
+
+    def info(self, key: str, msg: str, *args: Any) -> None:
+        self.log(logging.INFO, key, msg, *args)
+
+    def warning(self, key: str, msg: str, *args: Any) -> None:
+        self.log(logging.WARNING, key, msg, *args)
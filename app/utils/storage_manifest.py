@@ -0,0 +1,179 @@
+"""
+Манифест содержимого storage для инкрементальной синхронизации.
+
+Назначение:
+    - Хранит для каждой подпапки модели (`storage/<model>`) её mtime и снимок файлов
+      `{имя: (size, mtime_ns, inode)}` с прошлого прогона beat-синхронизации.
+    - Позволяет пропускать неизменённые папки целиком (mtime директории меняется
+      при создании/удалении/переименовании файлов в ней) и получать только дельту.
+
+Основные компоненты:
+    - StorageManifest: загрузка/атомарное сохранение манифеста в JSON-файл. Разобранный
+      манифест кэшируется в процессе, пока файл не изменился, а сохраняется он только
+      после изменений, поэтому тик без изменений в storage не читает и не пишет JSON.
+    - list_model_dir(path): снимок одной папки (через `storage_scanner.scan_dir`).
+    - scan_incremental(storage_dir, manifest): список DirDelta только для изменённых папок.
+
+Конфигурация через окружение:
+    - STORAGE_MANIFEST_PATH - путь к файлу манифеста
+        (по умолчанию `<STORAGE_DIR>/.sync_manifest.json`).
+
+Примечание: сверка идёт по именам файлов. Перезапись файла «на месте» (то же имя,
+новые size/mtime) не меняет mtime папки и не считается изменением ни инкрементальной,
+ни полной сверкой (deep-verify); полная сверка ловит то, что могло ускользнуть от
+mtime папки: создание/удаление файлов на ФС с грубым разрешением mtime.
+"""
+
+import json
+import os
+import time
+from pathlib import Path
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from app.utils.storage_scanner import scan_dir
+
+# (size, mtime_ns, inode)
+FileStat = Tuple[int, int, int]
+
+# Папку, изменённую позже чем N секунд назад, не запоминаем как «чистую»:
+# на ФС с грубым разрешением mtime файл, созданный в ту же секунду после
+# листинга, иначе потерялся бы до следующей полной сверки.
+_MTIME_SETTLE_SECONDS = 2.0
+
+
+class DirDelta(NamedTuple):
+    """Изменения в одной подпапке модели относительно манифеста."""
+    whisper_model: str
+    dir_mtime_ns: Optional[int]
+    files: Dict[str, FileStat]
+    added: Dict[str, FileStat]
+    removed: Dict[str, FileStat]
+
+
+def manifest_path_for(storage_dir: str) -> str:
+    """Путь к файлу манифеста для данного storage."""
+    return os.getenv('STORAGE_MANIFEST_PATH') or os.path.join(storage_dir, '.sync_manifest.json')
+
+
+def list_model_dir(model_dir: Path) -> Dict[str, FileStat]:
+    """Снимок аудиофайлов одной папки: имя -> (size, mtime_ns, inode)."""
+    return {e.filename: (e.size, e.mtime_ns, e.inode) for e in scan_dir(str(model_dir))}
+
+
+# Разобранные манифесты процесса: путь -> ((mtime_ns, size) файла, манифест)
+_loaded: Dict[str, Tuple[Tuple[int, int], "StorageManifest"]] = {}
+
+
+def _file_key(path: str) -> Optional[Tuple[int, int]]:
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return st.st_mtime_ns, st.st_size
+
+
+class StorageManifest:
+    """Персистентный снимок `{model: {mtime_ns, files}}`, сохраняемый в JSON."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.dirs: Dict[str, dict] = {}
+        # есть несохранённые изменения
+        self.dirty = False
+
+    @classmethod
+    def load(cls, path: str) -> "StorageManifest":
+        """Загрузить манифест; отсутствующий или повреждённый файл даёт пустой манифест.
+
+        Если файл не менялся с прошлой загрузки или сохранения в этом процессе,
+        возвращается уже разобранный манифест без чтения JSON.
+        """
+        key = _file_key(path)
+        cached = _loaded.get(path)
+        if key is not None and cached is not None and cached[0] == key and not cached[1].dirty:
+            return cached[1]
+        manifest = cls(path)
+        try:
+            with open(path, 'r', encoding='utf-8') as fh:
+                data = json.load(fh)
+            manifest.dirs = {
+                model: {
+                    'mtime_ns': entry.get('mtime_ns'),
+                    'files': {name: tuple(v) for name, v in entry.get('files', {}).items()},
+                }
+                for model, entry in data.get('dirs', {}).items()
+            }
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            print(f"[manifest] Failed to load {path}, starting empty: {e}")
+        if key is not None:
+            _loaded[path] = (key, manifest)
+        return manifest
+
+    def save(self) -> None:
+        """Атомарно записать манифест (tmp-файл + os.replace)."""
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as fh:
+            json.dump({'dirs': self.dirs}, fh, separators=(',', ':'))
+        os.replace(tmp_path, self.path)
+        self.dirty = False
+        key = _file_key(self.path)
+        if key is not None:
+            _loaded[self.path] = (key, self)
+
+    def is_empty(self) -> bool:
+        return not self.dirs
+
+    def files(self, whisper_model: str) -> Dict[str, FileStat]:
+        entry = self.dirs.get(whisper_model)
+        return dict(entry['files']) if entry else {}
+
+    def dir_mtime(self, whisper_model: str) -> Optional[int]:
+        entry = self.dirs.get(whisper_model)
+        return entry['mtime_ns'] if entry else None
+
+    def update_dir(self, whisper_model: str, dir_mtime_ns: Optional[int], files: Dict[str, FileStat]) -> None:
+        """Запомнить состояние папки после успешной обработки её дельты."""
+        if dir_mtime_ns is not None and time.time() - dir_mtime_ns / 1e9 < _MTIME_SETTLE_SECONDS:
+            dir_mtime_ns = None
+        self.dirs[whisper_model] = {'mtime_ns': dir_mtime_ns, 'files': dict(files)}
+        self.dirty = True
+
+    def drop_dir(self, whisper_model: str) -> None:
+        if self.dirs.pop(whisper_model, None) is not None:
+            self.dirty = True
+
+    def clear(self) -> None:
+        """Забыть все папки (перед полным пересканированием)."""
+        self.dirs.clear()
+        self.dirty = True
+
+
+def scan_incremental(storage_dir: str, manifest: StorageManifest, models: Iterable[str]) -> Tuple[List[DirDelta], int]:
+    """Пересканировать только папки моделей, чей mtime изменился с прошлого прогона.
+
+    Returns:
+        (deltas, skipped): дельты изменённых папок и число пропущенных неизменённых папок.
+    """
+    deltas: List[DirDelta] = []
+    skipped = 0
+    for model in models:
+        model_dir = Path(storage_dir) / model
+        try:
+            dir_mtime_ns: Optional[int] = model_dir.stat().st_mtime_ns
+        except FileNotFoundError:
+            dir_mtime_ns = None
+        previous = manifest.files(model)
+        if dir_mtime_ns is None:
+            if model in manifest.dirs:
+                deltas.append(DirDelta(model, None, {}, {}, previous))
+            continue
+        if manifest.dir_mtime(model) == dir_mtime_ns:
+            skipped += 1
+            continue
+        current = list_model_dir(model_dir)
+        added = {n: st for n, st in current.items() if n not in previous}
+        removed = {n: st for n, st in previous.items() if n not in current}
+        deltas.append(DirDelta(model, dir_mtime_ns, current, added, removed))
+    return deltas, skipped
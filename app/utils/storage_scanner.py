@@ -0,0 +1,106 @@
+"""
+Сканер содержимого storage на базе `os.scandir`.
+
+Назначение:
+    - Единая точка листинга `storage/<model>/` для beat-синхронизации и манифеста.
+    - Использует данные `DirEntry`: тип файла берётся из d_type без отдельного
+      системного вызова, а size/mtime/inode — из одного `entry.stat()` на файл
+      (вместо пары `Path.is_file()` + `Path.stat()`).
+    - Папки моделей сканируются параллельно в пуле потоков (`os.scandir`/`stat`
+      отпускают GIL), результаты отдаются генератором по мере готовности папок.
+
+Конфигурация через окружение:
+    - STORAGE_SCAN_WORKERS - максимальный размер пула потоков (по умолчанию 4).
+
+Пример использования:
+    for entry in iter_storage(settings.STORAGE_DIR):
+        print(entry.whisper_model, entry.filename, entry.size)
+"""
+
+import os
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+AUDIO_EXTENSIONS: Tuple[str, ...] = ('.mp3', '.wav')
+
+try:
+    _MAX_WORKERS = int(os.getenv('STORAGE_SCAN_WORKERS', '4'))
+except Exception:
+    _MAX_WORKERS = 4
+
+
+class ScanEntry(NamedTuple):
+    """Один файл в storage (данные из `DirEntry`)."""
+    whisper_model: str  # имя подпапки, в которой лежит файл
+    filename: str
+    path: str
+    size: int
+    mtime_ns: int
+    inode: int
+
+
+def scan_dir(dir_path: str, extensions: Optional[Tuple[str, ...]] = AUDIO_EXTENSIONS) -> List[ScanEntry]:
+    """Просканировать одну папку (без рекурсии).
+
+    Args:
+        dir_path: путь к папке.
+        extensions: допустимые расширения в нижнем регистре; None — все файлы.
+
+    Returns:
+        List[ScanEntry]: обычные файлы папки; отсутствующая папка даёт пустой список.
+    """
+    model = os.path.basename(os.path.normpath(dir_path))
+    out: List[ScanEntry] = []
+    try:
+        it = os.scandir(dir_path)
+    except (FileNotFoundError, NotADirectoryError):
+        return out
+    with it:
+        for entry in it:
+            if extensions and not entry.name.lower().endswith(extensions):
+                continue
+            try:
+                if not entry.is_file():
+                    continue
+                st = entry.stat()
+                inode = entry.inode()
+            except OSError:
+                # файл удалён между readdir и stat
+                continue
+            out.append(ScanEntry(model, entry.name, entry.path, st.st_size, st.st_mtime_ns, inode))
+    return out
+
+
+def list_subdirs(root: str) -> List[str]:
+    """Имена непосредственных подпапок `root` (пустой список, если root не существует)."""
+    try:
+        with os.scandir(root) as it:
+            return [e.name for e in it if e.is_dir()]
+    except FileNotFoundError:
+        return []
+
+
+def iter_storage(storage_dir: str, model_dirs: Optional[Iterable[str]] = None,
+                 extensions: Optional[Tuple[str, ...]] = AUDIO_EXTENSIONS,
+                 max_workers: Optional[int] = None) -> Iterator[ScanEntry]:
+    """Сгенерировать файлы из подпапок storage, сканируя папки параллельно.
+
+    Args:
+        storage_dir: корень storage.
+        model_dirs: имена подпапок; по умолчанию — все значения `WhisperModel`.
+        extensions: фильтр расширений (None — все файлы).
+        max_workers: размер пула (по умолчанию STORAGE_SCAN_WORKERS).
+    """
+    if model_dirs is None:
+        from app.models.enums import WhisperModel
+        model_dirs = [m.value for m in WhisperModel]
+    dirs = [os.path.join(storage_dir, name) for name in model_dirs]
+    workers = min(len(dirs), max_workers or _MAX_WORKERS)
+    if workers <= 1:
+        for d in dirs:
+            yield from scan_dir(d, extensions)
+        return
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='storage-scan') as pool:
+        futures = [pool.submit(scan_dir, d, extensions) for d in dirs]
+        for fut in as_completed(futures):
+            yield from fut.result()
@@ -0,0 +1,132 @@
+"""
+Детектор завершения загрузки файла (стабильность size/mtime).
+
+Назначение:
+    - `on_created` приходит, как только файл появился, а большой файл ещё копируется.
+      Трекер ставит файл в очередь только после того, как его size и mtime не менялись
+      в течение «тихого» интервала.
+    - Стабильность подтверждают mtime файла старше тихого интервала либо два одинаковых
+      снимка (size, mtime) подряд.
+    - Интервал адаптивный: 2 x наибольшая пауза между наблюдаемыми записями в файл
+      (медленный или рваный поток записи даёт длинные паузы, быстрый локальный — короткие),
+      в пределах [min_quiet, max_quiet].
+    - `closed()` (inotify IN_CLOSE_WRITE) — быстрый путь: писатель закрыл файл,
+      дожидаться тихого интервала не нужно.
+
+Проверки выполняются на потоке общего `DebounceScheduler`, отдельных потоков нет.
+"""
+
+import os
+import threading
+import time
+from typing import Callable, Dict, Hashable, Optional, Tuple
+
+from app.utils.debounce import DebounceScheduler
+
+
+class _Upload:
+    __slots__ = ('path', 'stat', 'last_change', 'max_gap', 'closed')
+
+    def __init__(self, path: str, now: float):
+        self.path = path
+        self.stat: Optional[Tuple[int, int]] = None  # (size, mtime_ns) на прошлой проверке
+        self.last_change = now
+        self.max_gap = 0.0
+        self.closed = False
+
+
+class StabilityTracker:
+    """Отслеживает растущие файлы и вызывает `on_stable(key, path, stat)` после их стабилизации."""
+
+    def __init__(self, scheduler: DebounceScheduler, on_stable: Callable[[Hashable, str, os.stat_result], None],
+                 min_quiet: float, max_quiet: float):
+        self._scheduler = scheduler
+        self._on_stable = on_stable
+        self.min_quiet = min_quiet
+        self.max_quiet = max(min_quiet, max_quiet)
+        self._lock = threading.Lock()
+        self._uploads: Dict[Hashable, _Upload] = {}
+
+    def touch(self, key: Hashable, path: str) -> None:
+        """Файл создан или в него записали данные: перенести проверку стабильности."""
+        if self.min_quiet <= 0:
+            self._fire(key, path)
+            return
+        now = time.monotonic()
+        with self._lock:
+            upload = self._uploads.get(key)
+            if upload is None:
+                upload = self._uploads[key] = _Upload(path, now)
+            else:
+                upload.max_gap = max(upload.max_gap, now - upload.last_change)
+                upload.last_change = now
+                upload.path = path
+            quiet = self._quiet(upload)
+        self._scheduler.schedule(('stable', key), quiet, lambda: self._check(key))
+
+    def closed(self, key: Hashable) -> None:
+        """Писатель закрыл файл: проверить и поставить его без ожидания тихого интервала."""
+        with self._lock:
+            upload = self._uploads.get(key)
+            if upload is None:
+                return
+            upload.closed = True
+        self._scheduler.schedule(('stable', key), 0, lambda: self._check(key))
+
+    def is_tracked(self, key: Hashable) -> bool:
+        with self._lock:
+            return key in self._uploads
+
+    def cancel(self, key: Hashable) -> None:
+        with self._lock:
+            self._uploads.pop(key, None)
+        self._scheduler.cancel(('stable', key))
+
+    def pending(self) -> int:
+        with self._lock:
+            return len(self._uploads)
+
+    def _quiet(self, upload: _Upload) -> float:
+        return min(self.max_quiet, max(self.min_quiet, 2 * upload.max_gap))
+
+    def _check(self, key: Hashable) -> None:
+        with self._lock:
+            upload = self._uploads.get(key)
+        if upload is None:
+            return
+        try:
+            st = os.stat(upload.path)
+        except OSError:
+            # файл удалён или переименован до завершения загрузки — событие move/delete разберётся
+            self.cancel(key)
+            return
+        now = time.monotonic()
+        current = (st.st_size, st.st_mtime_ns)
+        mtime_age = time.time() - st.st_mtime_ns / 1e9
+        with self._lock:
+            if self._uploads.get(key) is not upload:
+                return
+            if not upload.closed:
+                previous, upload.stat = upload.stat, current
+                if previous is not None and previous != current:
+                    # запись продолжается без событий (например, polling-observer)
+                    upload.max_gap = max(upload.max_gap, now - upload.last_change)
+                    upload.last_change = now
+                quiet = self._quiet(upload)
+                idle = now - upload.last_change
+                # mtime старше тихого интервала или два одинаковых снимка подряд подтверждают,
+                # что запись не шла и между событиями
+                settled = mtime_age >= quiet or previous == current
+                if idle < quiet or not settled:
+                    delay = max(quiet - idle, 0.0 if settled else min(quiet, quiet - mtime_age), 0.05)
+                    self._scheduler.schedule(('stable', key), delay, lambda: self._check(key))
+                    return
+            self._uploads.pop(key, None)
+        self._on_stable(key, upload.path, st)
+
+    def _fire(self, key: Hashable, path: str) -> None:
+        try:
+            st = os.stat(path)
+        except OSError:
+            return
+        self._on_stable(key, path, st)
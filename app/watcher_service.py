@@ -0,0 +1,117 @@
+"""
+Отдельный сервис watcher'а файловой системы с выбором лидера через Redis.
+
+Назначение:
+    - Запускает `start_watching` в собственном процессе вместо потока внутри uvicorn:
+      несколько воркеров API больше не поднимают несколько observer'ов и стартовых sync.
+    - Лидерство: на один storage-том активен ровно один watcher. Экземпляр берёт в Redis
+      lock `sciber:watcher:leader:<volume>` с TTL и продлевает его heartbeat'ом; остальные
+      экземпляры ждут в резерве и перехватывают lock, когда он истечёт.
+    - Если продлить lock не удалось (Redis недоступен или lock истёк), watcher
+      останавливается до повторного захвата — двух активных лидеров не бывает.
+
+Запуск:
+    python -m app.watcher_service
+
+Конфигурация через окружение:
+    - WATCHER_VOLUME_ID - идентификатор storage-тома (по умолчанию абсолютный путь STORAGE_DIR).
+    - WATCHER_LEADER_TTL_SECONDS - TTL lock'а лидера (по умолчанию 15); heartbeat — каждые TTL/3.
+    - WATCHER_METRICS_PORT - порт HTTP-эндпоинта метрик Prometheus (по умолчанию 9108, 0 — выключен).
+      Лидер также публикует снимок метрик в Redis на каждом heartbeat для `GET /metrics` API.
+"""
+
+import os
+import signal
+import threading
+import zlib
+
+import redis
+
+from app.utils import metrics
+from app.utils.settings import settings
+
+try:
+    _LEADER_TTL = max(3, int(os.getenv('WATCHER_LEADER_TTL_SECONDS', '15')))
+except Exception:
+    _LEADER_TTL = 15
+
+
+def leader_key(volume_id=None):
+    """Ключ lock'а лидера для storage-тома."""
+    volume_id = volume_id or os.getenv('WATCHER_VOLUME_ID') or os.path.abspath(settings.STORAGE_DIR)
+    return f"sciber:watcher:leader:{zlib.crc32(volume_id.encode('utf-8')):08x}"
+
+
+def _acquire(client, key, ttl):
+    """Попытаться стать лидером; при недоступном Redis лидерство не берётся (fail-closed)."""
+    lock = client.lock(key, timeout=ttl, blocking=False)
+    try:
+        return lock if lock.acquire(blocking=False) else None
+    except redis.RedisError as e:
+        print(f"[Watcher] Redis unavailable, cannot elect leader: {e}")
+        return None
+
+
+def run_as_leader(stop_event, client=None, ttl=None, watch=None):
+    """
+    Цикл сервиса: ждать лидерства, держать его heartbeat'ом и запускать watcher.
+
+    Args:
+        stop_event: threading.Event завершения сервиса.
+        client: Redis-клиент (по умолчанию `app.tasks.core.redis_client`).
+        ttl: TTL lock'а лидера в секундах.
+        watch: функция `watch(leader_lost_event)` (по умолчанию `start_watching`).
+    """
+    if client is None:
+        from app.tasks.core import redis_client as client
+    if watch is None:
+        from app.utils.audio_watcher import start_watching as watch
+    ttl = ttl or _LEADER_TTL
+    key = leader_key()
+    while not stop_event.is_set():
+        lock = _acquire(client, key, ttl)
+        if lock is None:
+            stop_event.wait(ttl / 3)
+            continue
+        print(f"[Watcher] Became leader for {key}")
+        leader_lost = threading.Event()
+        worker = threading.Thread(target=watch, args=(leader_lost,), name='watcher', daemon=True)
+        worker.start()
+        try:
+            while not stop_event.wait(ttl / 3):
+                if not worker.is_alive():
+                    print("[Watcher] Watcher thread exited, releasing leadership")
+                    break
+                try:
+                    lock.reacquire()
+                except redis.RedisError as e:
+                    print(f"[Watcher] Lost leadership: {e}")
+                    break
+                metrics.publish_snapshot(client)
+        finally:
+            leader_lost.set()
+            worker.join(timeout=ttl)
+            try:
+                lock.release()
+            except redis.RedisError:
+                pass
+
+
+def main():
+    stop_event = threading.Event()
+
+    def _stop(signum, frame):
+        print(f"[Watcher] Received signal {signum}, stopping")
+        stop_event.set()
+
+    signal.signal(signal.SIGTERM, _stop)
+    signal.signal(signal.SIGINT, _stop)
+    if metrics.WATCHER_METRICS_PORT:
+        from prometheus_client import start_http_server
+        start_http_server(metrics.WATCHER_METRICS_PORT, registry=metrics.REGISTRY)
+        print(f"[Watcher] Metrics on :{metrics.WATCHER_METRICS_PORT}/metrics")
+    run_as_leader(stop_event)
+
+
+if __name__ == '__main__':
+    main()
@@ -2,13 +2,16 @@
 Главный модуль приложения.
 
 Назначение:
-	- Инициализирует экземпляр FastAPI, создаёт структуру каталогов для хранения аудиофайлов,
-	  запускает фоновый поток наблюдателя за файловой системой и создаёт административного
-	  пользователя при первом запуске.
+	- Инициализирует экземпляр FastAPI, создаёт структуру каталогов для хранения аудиофайлов
+	  и создаёт административного пользователя при первом запуске.
+	- Наблюдатель за файловой системой работает отдельным сервисом
+	  (`python -m app.watcher_service`, один активный экземпляр на storage-том).
 
 Основные обязанности:
 	- Создание папок для моделей (storage/<model>). 
-	- Стартап фонового watcher'а (thread с вызовом `start_watching`).
+	- Стартап фонового watcher'а в потоке API — только при ENABLE_API_WATCHER=true
+	  (для локального запуска без отдельного сервиса; с несколькими воркерами uvicorn
+	  каждый поднимет свой watcher).
 	- Инициализация admin пользователя в БД (если отсутствует).
 
 Пример использования:
@@ -21,10 +24,11 @@ from sqlalchemy.orm import sessionmaker
 from sqlalchemy import create_engine
 import hashlib
 import threading
-from app.utils.audio_watcher import start_watching
 
 from fastapi import FastAPI
 from app.routes.ping import router as ping_router
+from app.routes.stats import router as stats_router
+from app.routes.metrics import router as metrics_router
 import os
 from app.utils.settings import settings
 from app.models.enums import WhisperModel
@@ -41,9 +45,11 @@ def create_storage_structure():
     
 create_storage_structure()
 
-# Запуск отслеживания новых аудиофайлов в отдельном потоке
-watcher_thread = threading.Thread(target=start_watching, daemon=True)
-watcher_thread.start()
+# Запуск отслеживания новых аудиофайлов в потоке API — только если явно включено
+if os.getenv("ENABLE_API_WATCHER", "false").lower() in ("1", "true", "yes"):
+	from app.utils.audio_watcher import start_watching
+	watcher_thread = threading.Thread(target=start_watching, daemon=True)
+	watcher_thread.start()
 
 # Автоматическое добавление пользователя admin при запуске
 def create_admin_user():
@@ -67,3 +73,5 @@ def create_admin_user():
 create_admin_user()
 
 app.include_router(ping_router)
+app.include_router(stats_router)
+app.include_router(metrics_router)
@@ -0,0 +1,192 @@
+"""
+In-memory Redis для тестов и бенчмарков.
+
+`FakeRedis` реализует только те команды Redis, которые использует приложение (ключи с
+TTL, множества, хэши, списки, pipeline, lock), чтобы тесты (`tests/conftest.py`) и
+скрипты `scripts/benchmark_*.py` работали без поднятого Redis.
+"""
+
+import time
+
+
+class FakeLock:
+    def __init__(self, client, name, timeout=None):
+        self.client = client
+        self.name = name
+        self.timeout = timeout
+        self.token = f'{id(self)}'.encode('utf-8')
+
+    def acquire(self, blocking=True):
+        return bool(self.client.set(self.name, self.token, nx=True, ex=self.timeout))
+
+    def reacquire(self):
+        import redis
+        if self.client.get(self.name) != self.token:
+            raise redis.exceptions.LockNotOwnedError("Cannot reacquire a lock that's no longer owned")
+        self.client.set(self.name, self.token, ex=self.timeout)
+
+    def release(self):
+        if self.client.get(self.name) == self.token:
+            self.client.delete(self.name)
+
+
+class FakePipeline:
+    def __init__(self, client):
+        self.client = client
+        self.calls = []
+
+    def __getattr__(self, name):
+        def queue(*args, **kwargs):
+            self.calls.append((name, args, kwargs))
+            return self
+        return queue
+
+    def execute(self):
+        calls, self.calls = self.calls, []
+        return [getattr(self.client, name)(*args, **kwargs) for name, args, kwargs in calls]
+
+
+class FakeRedis:
+    def __init__(self):
+        self.data = {}
+        self.expires = {}
+
+    def _alive(self, key):
+        exp = self.expires.get(key)
+        if exp is not None and exp <= time.monotonic():
+            self.data.pop(key, None)
+            self.expires.pop(key, None)
+        return key in self.data
+
+    @staticmethod
+    def _b(value):
+        return value if isinstance(value, bytes) else str(value).encode('utf-8')
+
+    def get(self, key):
+        return self.data.get(key) if self._alive(key) else None
+
+    def set(self, key, value, nx=False, ex=None, px=None, get=False):
+        previous = self.get(key)
+        if nx and previous is not None:
+            return None
+        self.data[key] = self._b(value)
+        self.expires.pop(key, None)
+        if ex is not None:
+            self.expires[key] = time.monotonic() + ex
+        elif px is not None:
+            self.expires[key] = time.monotonic() + px / 1000.0
+        return previous if get else True
+
+    def delete(self, *keys):
+        removed = 0
+        for key in keys:
+            if self._alive(key):
+                removed += 1
+            self.data.pop(key, None)
+            self.expires.pop(key, None)
+        return removed
+
+    def exists(self, key):
+        return int(self._alive(key))
+
+    def expire(self, key, seconds):
+        if not self._alive(key):
+            return False
+        self.expires[key] = time.monotonic() + seconds
+        return True
+
+    def incr(self, key, amount=1):
+        value = int(self.get(key) or 0) + amount
+        self.data[key] = self._b(value)
+        return value
+
+    def sadd(self, key, *members):
+        s = self.data.setdefault(key, set())
+        before = len(s)
+        s.update(self._b(m) for m in members)
+        return len(s) - before
+
+    def srem(self, key, *members):
+        s = self.data.get(key, set())
+        before = len(s)
+        s.difference_update(self._b(m) for m in members)
+        return before - len(s)
+
+    def smembers(self, key):
+        return set(self.data.get(key, set()))
+
+    def hincrby(self, key, field, amount=1):
+        h = self.data.setdefault(key, {})
+        f = self._b(field)
+        h[f] = self._b(int(h.get(f, b'0')) + amount)
+        return int(h[f])
+
+    def hset(self, key, field=None, value=None, mapping=None):
+        h = self.data.setdefault(key, {})
+        items = dict(mapping or {})
+        if field is not None:
+            items[field] = value
+        added = sum(1 for f in items if self._b(f) not in h)
+        h.update({self._b(f): self._b(v) for f, v in items.items()})
+        return added
+
+    def hmget(self, key, fields):
+        h = self.data.get(key, {}) if self._alive(key) else {}
+        return [h.get(self._b(f)) for f in fields]
+
+    def hgetall(self, key):
+        return dict(self.data.get(key, {}))
+
+    def rpush(self, key, *values):
+        items = self.data.setdefault(key, [])
+        items.extend(self._b(v) for v in values)
+        return len(items)
+
+    def lpush(self, key, *values):
+        items = self.data.setdefault(key, [])
+        for v in values:
+            items.insert(0, self._b(v))
+        return len(items)
+
+    def lpop(self, key, count=None):
+        items = self.data.get(key) or []
+        if not items:
+            return None
+        taken = items[:count or 1]
+        del items[:count or 1]
+        return taken if count is not None else taken[0]
+
+    def blpop(self, keys, timeout=0):
+        for key in keys:
+            value = self.lpop(key)
+            if value is not None:
+                return key.encode('utf-8'), value
+        return None
+
+    def lrange(self, key, start, end):
+        items = self.data.get(key) or []
+        return list(items[start:None if end == -1 else end + 1])
+
+    def lmove(self, source, destination, src='LEFT', dest='RIGHT'):
+        items = self.data.get(source) or []
+        if not items:
+            return None
+        value = items.pop(0 if src == 'LEFT' else -1)
+        target = self.data.setdefault(destination, [])
+        if dest == 'LEFT':
+            target.insert(0, value)
+        else:
+            target.append(value)
+        return value
+
+    def blmove(self, source, destination, timeout, src='LEFT', dest='RIGHT'):
+        return self.lmove(source, destination, src, dest)
+
+    def llen(self, key):
+        return len(self.data.get(key) or [])
+
+    def pipeline(self, transaction=True):
+        return FakePipeline(self)
+
+    def lock(self, name, timeout=None, blocking=True, **kwargs):
+        return FakeLock(self, name, timeout)
@@ -0,0 +1,196 @@
+"""
+Бенчмарк микропакетной обработки коротких файлов (`process_audio_batch`).
+
+Назначение:
+    - Генерирует `--files` WAV-файлов (16 кГц, моно) длительностью `--min-seconds`..`--max-seconds`,
+      добавляет их в БД и обрабатывает на стороне воркера в одном процессе и одном потоке
+      (ASR_CPU_THREADS=1), то есть на одном ядре:
+        * single: по задаче `process_audio_file` на файл (ASR_BATCH_SIZE=1);
+        * batch=N: задачи `process_audio_batch` с пачками до N файлов.
+    - Сообщения в брокер перехватываются и выполняются по очереди в процессе (брокер не нужен),
+      Redis заменяется in-memory реализацией (`scripts/_fakes.py`).
+    - Печатает пропускную способность на ядро: файлов и секунд аудио на секунду CPU
+      (`time.process_time`), а также число сообщений в брокер и SQL-запросов на файл.
+      Замеряется этап транскрипции: записи с готовым транскриптом ждут перевода и саммари
+      в статусе PROCESSING (столбец `done`).
+
+Движок:
+    - По умолчанию `fake` — распознавание почти бесплатно, поэтому замер показывает
+      накладные расходы задачи (сессии БД, чтение файла, вызов движка).
+    - `--call-ms` добавляет фиксированную CPU-стоимость каждого вызова движка (подготовка
+      вызова модели: окно энкодера, определение языка), `--rtf` — стоимость на секунду аудио.
+    - `--engine faster_whisper` — настоящая модель (нужен `pip install faster-whisper`).
+
+Использование:
+    python scripts/benchmark_batching.py --files 200 --batch-sizes 4,8,16
+    python scripts/benchmark_batching.py --call-ms 50 --rtf 0.02
+"""
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+import wave
+from typing import Dict, List
+
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, REPO_ROOT)
+# один поток вычислений — замер на ядро
+os.environ['ASR_CPU_THREADS'] = '1'
+os.environ['OMP_NUM_THREADS'] = '1'
+
+
+def make_files(root: str, count: int, lo: float, hi: float, seed: int) -> List[Dict]:
+    """Создать `count` WAV-файлов в `root/base` и вернуть их описания для добавления в БД."""
+    rng = random.Random(seed)
+    os.makedirs(os.path.join(root, 'base'), exist_ok=True)
+    files = []
+    for i in range(count):
+        name = f'bench_{i:05d}.wav'
+        seconds = rng.uniform(lo, hi)
+        with wave.open(os.path.join(root, 'base', name), 'wb') as w:
+            w.setnchannels(1)
+            w.setsampwidth(2)
+            w.setframerate(16000)
+            w.writeframes(bytes([i % 251]) * 2 * int(16000 * seconds))
+        files.append({'filename': name, 'whisper_model': 'base', 'storage_path': os.path.join('base', name),
+                      'size': os.path.getsize(os.path.join(root, 'base', name))})
+    return files
+
+
+def _burn(seconds: float) -> None:
+    """Занять CPU на `seconds` (а не спать): стоимость попадает в process_time."""
+    end = time.process_time() + seconds
+    while time.process_time() < end:
+        pass
+
+
+def register_bench_engine(base: str, call_ms: float, rtf: float) -> str:
+    """Движок-обёртка над `base` с искусственной стоимостью вызова и секунды аудио."""
+    from app.processing import engines
+
+    inner = engines.get_engine(base)
+
+    class BenchEngine(engines.ASREngine):
+        name = 'bench'
+
+        def load(self, model):
+            return inner.load(model)
+
+        def estimate_mb(self, model):
+            return inner.estimate_mb(model)
+
+        def transcribe(self, handle, audio_path, **opts):
+            return self.transcribe_batch(handle, [audio_path], [opts.pop('duration', None)], **opts)[0]
+
+        def transcribe_batch(self, handle, audio_paths, durations=None, **opts):
+            results = inner.transcribe_batch(handle, audio_paths, durations, **opts)
+            _burn(call_ms / 1000.0 + rtf * sum(r.get('duration') or 0.0 for r in results))
+            return results
+
+    engines.register_engine('bench', BenchEngine)
+    return 'bench'
+
+
+def run(mode: str, batch_size: int, files: List[Dict], audio_seconds: float) -> Dict:
+    """Добавить файлы, обработать все сообщения и вернуть метрики прогона."""
+    from unittest.mock import patch
+    from sqlalchemy import delete
+    import app.db.ops.sync_impl as impl
+    import app.tasks.core as tasks
+    from app.models.audio_file import AudioFile
+    from app.models.enums import AudioFileStatus
+
+    os.environ['ASR_BATCH_SIZE'] = str(batch_size)
+    os.environ['ASR_BATCH_WAIT_MS'] = '0'
+    with impl._Session() as s:
+        s.execute(delete(AudioFile))
+        s.commit()
+    tasks.redis_client.data.clear()
+
+    messages: List = []
+    sent = {'count': 0}
+    process_file, process_batch = tasks.process_audio_file, tasks.process_audio_batch
+
+    def _send(task):
+        def apply_async(args, queue=None):
+            sent['count'] += 1
+            messages.append((task, args))
+        return apply_async
+
+    # этапы перевода и саммари (`_start_followup_stages`) в замер транскрипции не входят
+    with patch.object(process_file, 'apply_async', _send(process_file)), \
+            patch.object(process_batch, 'apply_async', _send(process_batch)), \
+            patch.object(tasks, '_start_followup_stages', lambda ids: None):
+        tasks.enqueue_add_files_bulk.run(files)
+        with impl.count_queries() as counter:
+            cpu, wall = time.process_time(), time.perf_counter()
+            while messages:
+                task, args = messages.pop(0)
+                task.run(*args)
+            cpu, wall = time.process_time() - cpu, time.perf_counter() - wall
+    done = sum(1 for _ in impl.iter_audio_files_sync(("id",), status=AudioFileStatus.PROCESSING))
+    return {
+        'mode': mode,
+        'done': done,
+        'files_per_cpu_s': len(files) / cpu,
+        'audio_s_per_cpu_s': audio_seconds / cpu,
+        'wall_s': wall,
+        'messages_per_file': sent['count'] / len(files),
+        'sql_per_file': counter.count / len(files),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Benchmark micro-batched processing of short files per core')
+    parser.add_argument('--files', type=int, default=200)
+    parser.add_argument('--min-seconds', type=float, default=3.0)
+    parser.add_argument('--max-seconds', type=float, default=50.0)
+    parser.add_argument('--batch-sizes', default='4,8,16')
+    parser.add_argument('--engine', default='fake')
+    parser.add_argument('--call-ms', type=float, default=0.0, help='synthetic CPU cost per engine call')
+    parser.add_argument('--rtf', type=float, default=0.0, help='synthetic CPU cost per second of audio')
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import sessionmaker
+    import app.models  # noqa: F401
+    from app.models.database import Base
+    import app.db.ops.sync_impl as impl
+    import app.tasks.core as tasks
+    from scripts._fakes import FakeRedis
+
+    workdir = tempfile.mkdtemp(prefix='sciber_batch_bench_')
+    storage = os.path.join(workdir, 'storage')
+    os.environ['STORAGE_DIR'] = storage
+    impl._engine = create_engine(f"sqlite:///{os.path.join(workdir, 'bench.db')}", future=True)
+    impl._Session = sessionmaker(bind=impl._engine, expire_on_commit=False)
+    Base.metadata.create_all(impl._engine)
+    tasks.redis_client = FakeRedis()
+    os.environ['ASR_ENGINE'] = register_bench_engine(args.engine, args.call_ms, args.rtf) \
+        if (args.call_ms or args.rtf) else args.engine
+
+    files = make_files(storage, args.files, args.min_seconds, args.max_seconds, args.seed)
+    audio_seconds = sum((f['size'] - 44) / 32000 for f in files)
+    # прогрев: загрузка модели в кэш процесса не должна попасть в первый замер
+    run('warmup', 1, files[:2], 1.0)
+
+    rows = [run('single', 1, files, audio_seconds)]
+    rows += [run(f'batch={n}', n, files, audio_seconds) for n in (int(x) for x in args.batch_sizes.split(',') if x)]
+
+    print(f"files={args.files} audio={audio_seconds:.0f}s ({args.min_seconds:g}-{args.max_seconds:g}s each) "
+          f"engine={args.engine} call_ms={args.call_ms:g} rtf={args.rtf:g}")
+    header = (f"{'mode':<10} {'done':>5} {'files/cpu-s':>12} {'audio-s/cpu-s':>14} {'wall_s':>8} "
+              f"{'msgs/file':>10} {'sql/file':>9}")
+    print(header)
+    print('-' * len(header))
+    for r in rows:
+        print(f"{r['mode']:<10} {r['done']:>5} {r['files_per_cpu_s']:>12.1f} {r['audio_s_per_cpu_s']:>14.0f} "
+              f"{r['wall_s']:>8.2f} {r['messages_per_file']:>10.2f} {r['sql_per_file']:>9.2f}")
+
+
+if __name__ == '__main__':
+    main()
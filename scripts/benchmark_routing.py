@@ -0,0 +1,396 @@
+"""
+Бенчмарк маршрутизации задач обработки по очередям.
+
+Назначение:
+    - Сравнивает задержку завершения (время от постановки до окончания обработки) для
+      смешанной нагрузки в двух конфигурациях с одинаковым числом воркеров:
+        * before: все `process_audio_file` в одной очереди `celery`, воркеры берут задачи FIFO;
+        * after: очереди выбираются `app.tasks.routing.processing_queue` (модель + короткая
+          полоса), воркеры подписаны на профили очередей (см. `--profiles`).
+    - Воркер с prefetch=1 берёт следующую задачу из своих очередей по кругу, как транспорт
+      Redis в kombu (после выборки очередь уходит в конец списка опроса).
+
+Режимы:
+    - measure (по умолчанию): настоящий путь задач в одном процессе. Продюсер
+      `enqueue_add_files_bulk` добавляет файлы по расписанию поступлений, `apply_async`
+      кладёт сообщение в in-memory очередь, выбранную маршрутизацией, а потоки-воркеры
+      выполняют `process_audio_file` (SQLite, in-memory Redis из `scripts/_fakes.py`). Задержка —
+      измеренное время от `apply_async` до завершения задачи. Движок — `fake` с
+      искусственной стоимостью: сон на длительность аудио x RTF модели и на загрузку модели,
+      если её нет в кэше воркера (LRU по бюджету RAM воркера, как `app.processing.model_cache`).
+      Часы нагрузки сжимаются в `--time-scale` раз; в отчёте задержки пересчитаны обратно
+      в секунды нагрузки (накладные расходы задачи при этом растут в 1/time-scale раз).
+    - simulate: симуляция дискретных событий по тем же константам без запуска задач;
+      цифры расчётные и сравнивают политики очередей, а не измеряют задержку.
+
+Нагрузка по умолчанию: пуассоновский поток задач; 80% — короткие `base` (5-90 с аудио),
+12% — `small` (2-20 мин), 5% — `medium` (10-60 мин), 3% — `large` (1-3 ч).
+
+Использование:
+    python scripts/benchmark_routing.py --jobs 200 --workers 4 --rate 45 --time-scale 0.002
+    python scripts/benchmark_routing.py --mode simulate --jobs 2000 --workers 4 --rate 45 --seed 1
+    python scripts/benchmark_routing.py --profiles "short:asr.base.short,asr.small.short;heavy:asr.medium,asr.large"
+
+    Профили: 'имя:очередь,очередь;имя:...' раздаются воркерам по порядку (первый профиль —
+    первому воркеру, последний — всем оставшимся).
+
+Примечание: RTF и время загрузки моделей заданы константами (ориентиры для faster-whisper
+int8 на CPU); скорость движка бенчмарк не измеряет.
+"""
+
+import argparse
+import heapq
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Deque, Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, REPO_ROOT)
+
+# Время обработки на секунду аудио, время загрузки модели (с) и её размер в RAM (МБ)
+RTF = {'base': 0.05, 'small': 0.12, 'medium': 0.3, 'large': 0.6}
+LOAD_SECONDS = {'base': 2.0, 'small': 5.0, 'medium': 12.0, 'large': 25.0}
+RAM_MB = {'base': 300, 'small': 900, 'medium': 2500, 'large': 5000}
+
+# (доля, модель, мин. длительность, макс. длительность), с
+MIX = [
+    (0.80, 'base', 5, 90),
+    (0.12, 'small', 120, 1200),
+    (0.05, 'medium', 600, 3600),
+    (0.03, 'large', 3600, 10800),
+]
+
+# Один воркер держит короткую полосу (и лёгкие модели, чтобы не простаивать),
+# остальные подписаны на все очереди обработки
+_ALL = "asr.base.short,asr.small.short,asr.medium.short,asr.large.short,asr.base,asr.small,asr.medium,asr.large"
+DEFAULT_PROFILES = (
+    "short:asr.base.short,asr.small.short,asr.medium.short,asr.large.short,asr.base,asr.small;"
+    f"any:{_ALL}"
+)
+
+
+class Job(NamedTuple):
+    id: int
+    arrival: float
+    model: str
+    duration: float
+
+
+def make_jobs(n: int, rate_per_hour: float, seed: int) -> List[Job]:
+    rng = random.Random(seed)
+    jobs, t = [], 0.0
+    for i in range(n):
+        t += rng.expovariate(rate_per_hour / 3600.0)
+        r, acc = rng.random(), 0.0
+        for share, model, lo, hi in MIX:
+            acc += share
+            if r <= acc:
+                break
+        jobs.append(Job(i, t, model, rng.uniform(lo, hi)))
+    return jobs
+
+
+class Worker:
+    def __init__(self, queues: Sequence[str], ram_mb: int):
+        self.queues = list(queues)
+        self.ram_mb = ram_mb
+        self.models: "OrderedDict[str, int]" = OrderedDict()
+        self.busy = False
+        self._next = 0
+
+    def take(self, queues: Dict[str, Deque[Job]]) -> Optional[Job]:
+        for i in range(len(self.queues)):
+            idx = (self._next + i) % len(self.queues)
+            if queues.get(self.queues[idx]):
+                self._next = idx + 1
+                return queues[self.queues[idx]].popleft()
+        return None
+
+    def service_time(self, job: Job) -> float:
+        load = 0.0
+        if job.model in self.models:
+            self.models.move_to_end(job.model)
+        else:
+            while self.models and sum(self.models.values()) + RAM_MB[job.model] > self.ram_mb:
+                self.models.popitem(last=False)
+            self.models[job.model] = RAM_MB[job.model]
+            load = LOAD_SECONDS[job.model]
+        return load + job.duration * RTF[job.model]
+
+
+def simulate(jobs: List[Job], workers: List[Worker], route) -> Dict[int, float]:
+    """Вернуть время завершения каждой задачи."""
+    queues: Dict[str, Deque[Job]] = {}
+    # (время, порядок, id задачи, воркер): воркер None — поступление задачи, иначе завершение
+    events: List[Tuple[float, int, int, Optional[int]]] = []
+    for job in jobs:
+        heapq.heappush(events, (job.arrival, job.id, job.id, None))
+    by_id = {job.id: job for job in jobs}
+    done: Dict[int, float] = {}
+    seq = len(jobs)
+
+    def dispatch(now: float) -> None:
+        nonlocal seq
+        for idx, worker in enumerate(workers):
+            if worker.busy:
+                continue
+            job = worker.take(queues)
+            if job is not None:
+                worker.busy = True
+                seq += 1
+                heapq.heappush(events, (now + worker.service_time(job), seq, job.id, idx))
+
+    while events:
+        now, _, job_id, worker_idx = heapq.heappop(events)
+        if worker_idx is None:
+            job = by_id[job_id]
+            queues.setdefault(route(job), deque()).append(job)
+        else:
+            workers[worker_idx].busy = False
+            done[job_id] = now
+        dispatch(now)
+    return done
+
+
+def register_routing_engine(worker_ram_mb: int, time_scale: float) -> str:
+    """Движок-обёртка над `fake`: сон на распознавание и на загрузку модели в кэш воркера.
+
+    Каждый поток-воркер держит свой LRU моделей (воркеры Celery — отдельные процессы
+    со своим кэшем), поэтому смена модели стоит загрузки на том воркере, где она случилась.
+    """
+    from app.processing import engines
+
+    inner = engines.get_engine('fake')
+    local = threading.local()
+
+    class RoutingBenchEngine(engines.ASREngine):
+        name = 'routing_bench'
+
+        def load(self, model):
+            return inner.load(model)
+
+        def estimate_mb(self, model):
+            return RAM_MB.get(model, 0)
+
+        def transcribe(self, handle, audio_path, **opts):
+            model = handle['model']
+            models = getattr(local, 'models', None)
+            if models is None:
+                models = local.models = OrderedDict()
+            cost = float(opts.get('duration') or 0.0) * RTF[model]
+            if model in models:
+                models.move_to_end(model)
+            else:
+                while models and sum(models.values()) + RAM_MB[model] > worker_ram_mb:
+                    models.popitem(last=False)
+                models[model] = RAM_MB[model]
+                cost += LOAD_SECONDS[model]
+            time.sleep(cost * time_scale)
+            return inner.transcribe(handle, audio_path, **opts)
+
+    engines.register_engine('routing_bench', RoutingBenchEngine)
+    return 'routing_bench'
+
+
+class Broker:
+    """In-memory очереди сообщений: воркер ждёт сообщение в любой из своих очередей."""
+
+    def __init__(self):
+        self.queues: Dict[str, Deque] = {}
+        self.closed = False
+        self._cond = threading.Condition()
+
+    def put(self, queue: str, message) -> None:
+        with self._cond:
+            self.queues.setdefault(queue, deque()).append(message)
+            self._cond.notify_all()
+
+    def close(self) -> None:
+        with self._cond:
+            self.closed = True
+            self._cond.notify_all()
+
+    def take(self, worker: Worker):
+        """Следующее сообщение для воркера (по кругу его очередей) или None после close()."""
+        with self._cond:
+            while True:
+                for i in range(len(worker.queues)):
+                    idx = (worker._next + i) % len(worker.queues)
+                    if self.queues.get(worker.queues[idx]):
+                        worker._next = idx + 1
+                        return self.queues[worker.queues[idx]].popleft()
+                if self.closed:
+                    return None
+                self._cond.wait()
+
+
+def measure(jobs: List[Job], workers: List[Worker], storage: str, routed: bool,
+            time_scale: float) -> Dict[int, float]:
+    """Прогнать задания через настоящие `enqueue_add_files_bulk` и `process_audio_file`.
+
+    Returns:
+        dict: {id задания: измеренная задержка от `apply_async` до завершения, с}.
+    """
+    from unittest.mock import patch
+    from sqlalchemy import delete
+    import app.db.ops.sync_impl as impl
+    import app.tasks.core as tasks
+    from app.models.audio_file import AudioFile
+    from app.tasks.routing import DEFAULT_QUEUE
+    from scripts._fakes import FakeRedis
+
+    with impl._Session() as s:
+        s.execute(delete(AudioFile))
+        s.commit()
+    tasks.redis_client = FakeRedis()
+    broker = Broker()
+    sent: Dict[int, float] = {}
+    done: Dict[int, float] = {}
+    lock = threading.Lock()
+
+    def apply_async(args, queue=None):
+        with lock:
+            sent[args[0]] = time.perf_counter()
+        broker.put(queue if routed else DEFAULT_QUEUE, args)
+
+    def work(worker: Worker) -> None:
+        while True:
+            args = broker.take(worker)
+            if args is None:
+                return
+            tasks.process_audio_file.run(*args)
+            with lock:
+                done[args[0]] = time.perf_counter()
+
+    ids: Dict[int, int] = {}
+    # этапы перевода и саммари (`_start_followup_stages`) в замер не входят
+    with patch.object(tasks.process_audio_file, 'apply_async', apply_async), \
+            patch.object(tasks, '_start_followup_stages', lambda ids: None):
+        threads = [threading.Thread(target=work, args=(w,), daemon=True) for w in workers]
+        for t in threads:
+            t.start()
+        start = time.perf_counter()
+        for job in jobs:
+            delay = start + job.arrival * time_scale - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            name = f'job_{job.id:05d}.wav'
+            path = os.path.join(job.model, name)
+            with open(os.path.join(storage, path), 'wb') as f:
+                f.write(f'{job.id}'.encode())
+            row_ids = tasks.enqueue_add_files_bulk.run([{
+                'filename': name, 'whisper_model': job.model, 'storage_path': path, 'size': 8,
+                'audio_duration_seconds': job.duration,
+            }])
+            ids[row_ids[0]] = job.id
+        broker.close()
+        for t in threads:
+            t.join()
+    return {job_id: done[row_id] - sent[row_id] for row_id, job_id in ids.items()}
+
+
+def run_measured(jobs: List[Job], args) -> Tuple[Dict[int, float], Dict[int, float]]:
+    """Задержки before/after из `measure`, пересчитанные в секунды нагрузки."""
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import sessionmaker
+    import app.models  # noqa: F401
+    from app.models.database import Base
+    import app.db.ops.sync_impl as impl
+    from app.tasks.routing import DEFAULT_QUEUE
+
+    workdir = tempfile.mkdtemp(prefix='sciber_routing_bench_')
+    storage = os.path.join(workdir, 'storage')
+    for model in RTF:
+        os.makedirs(os.path.join(storage, model), exist_ok=True)
+    os.environ.update({
+        'STORAGE_DIR': storage,
+        # задача на файл, без фрагментов и без повторного использования результатов
+        'ASR_BATCH_SIZE': '1', 'ASR_CHUNK_SECONDS': '0', 'ASR_RESULT_CACHE': '0',
+        # общий кэш процесса держит все модели: вытеснение моделей воркера считает движок
+        'ASR_MODEL_CACHE_MB': str(sum(RAM_MB.values())),
+        'ASR_ENGINE': register_routing_engine(args.worker_ram_mb, args.time_scale),
+    })
+    impl._engine = create_engine(f"sqlite:///{os.path.join(workdir, 'bench.db')}", future=True,
+                                 connect_args={'check_same_thread': False, 'timeout': 30})
+    impl._Session = sessionmaker(bind=impl._engine, expire_on_commit=False)
+    Base.metadata.create_all(impl._engine)
+
+    results = []
+    for routed, queues in ((False, [[DEFAULT_QUEUE]] * args.workers),
+                           (True, parse_profiles(args.profiles, args.workers))):
+        latency = measure(jobs, [Worker(q, args.worker_ram_mb) for q in queues], storage, routed, args.time_scale)
+        results.append({job_id: value / args.time_scale for job_id, value in latency.items()})
+    return results[0], results[1]
+
+
+def percentile(values: List[float], p: float) -> float:
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    k = (len(ordered) - 1) * p
+    lo, hi = int(k), min(int(k) + 1, len(ordered) - 1)
+    return ordered[lo] + (ordered[hi] - ordered[lo]) * (k - lo)
+
+
+def parse_profiles(spec: str, workers: int) -> List[List[str]]:
+    """'name:q1,q2;name:q3' -> очереди воркеров; последний профиль достаётся всем оставшимся."""
+    profiles = [p.split(':', 1)[1].split(',') for p in spec.split(';') if p]
+    return [profiles[min(i, len(profiles) - 1)] for i in range(workers)]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Compare completion latency before/after per-model queue routing')
+    parser.add_argument('--mode', choices=('measure', 'simulate'), default='measure')
+    parser.add_argument('--jobs', type=int, default=None, help='default: 200 (measure), 2000 (simulate)')
+    parser.add_argument('--rate', type=float, default=45.0, help='job arrivals per hour')
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--worker-ram-mb', type=int, default=6000, help='model cache budget per worker')
+    parser.add_argument('--profiles', default=DEFAULT_PROFILES, help='worker queue profiles for the "after" run')
+    parser.add_argument('--time-scale', type=float, default=0.002,
+                        help='measure: wall-clock seconds per second of workload')
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+    if args.jobs is None:
+        args.jobs = 200 if args.mode == 'measure' else 2000
+
+    from app.tasks.routing import DEFAULT_QUEUE, processing_queue
+
+    jobs = make_jobs(args.jobs, args.rate, args.seed)
+    if args.mode == 'measure':
+        before, after = run_measured(jobs, args)
+        label = f"measured latency through the tasks, time-scale={args.time_scale:g}, seconds of workload"
+    else:
+        done_before = simulate(jobs, [Worker([DEFAULT_QUEUE], args.worker_ram_mb) for _ in range(args.workers)],
+                               lambda job: DEFAULT_QUEUE)
+        done_after = simulate(jobs, [Worker(q, args.worker_ram_mb) for q in parse_profiles(args.profiles, args.workers)],
+                              lambda job: processing_queue(job.model, job.duration))
+        before = {j.id: done_before[j.id] - j.arrival for j in jobs}
+        after = {j.id: done_after[j.id] - j.arrival for j in jobs}
+        label = "simulated latency, seconds"
+
+    classes = {
+        'all': lambda j: True,
+        'short (routing lane)': lambda j: processing_queue(j.model, j.duration).endswith('.short'),
+        'small': lambda j: j.model == 'small',
+        'medium': lambda j: j.model == 'medium',
+        'large': lambda j: j.model == 'large',
+    }
+    header = f"{'jobs':<22} {'n':>6} {'p50 before':>12} {'p50 after':>11} {'p95 before':>12} {'p95 after':>11}"
+    print(f"workers={args.workers} jobs={args.jobs} rate={args.rate}/h seed={args.seed} ({label})")
+    print(header)
+    print('-' * len(header))
+    for name, match in classes.items():
+        selected = [j for j in jobs if match(j)]
+        b = [before[j.id] for j in selected]
+        a = [after[j.id] for j in selected]
+        print(f"{name:<22} {len(selected):>6} {percentile(b, 0.5):>12.1f} {percentile(a, 0.5):>11.1f} "
+              f"{percentile(b, 0.95):>12.1f} {percentile(a, 0.95):>11.1f}")
+
+
+if __name__ == '__main__':
+    main()
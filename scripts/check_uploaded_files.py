@@ -3,7 +3,9 @@
 
 Назначение:
     - Подключается к локальной БД и выбирает записи `audio_files` со статусом UPLOADED.
-    - Формирует список кандидатных путей для каждого файла и проверяет, существуют ли они на диске.
+    - Формирует список кандидатных путей для каждого файла и проверяет только их: один stat
+      на уникальный путь (регистровые варианты на регистронезависимой ФС совпадают), поэтому
+      стоимость проверки зависит от числа выбранных строк, а не от размера storage.
     - Выводит JSON с результатами для удобного анализа.
 
 Использование:
@@ -17,7 +19,7 @@
 import os
 import json
 import sys
-from typing import List, Dict, Optional
+from typing import Iterable, Iterator, List, Dict, Optional
 
 try:
     import psycopg2
@@ -77,29 +79,30 @@ def discover_storage_root() -> str:
     return os.path.abspath(os.path.join(repo_root, env_val))
 
 
-def query_uploaded_rows(limit: int = 500) -> List[Dict]:
-    """Запросить из БД последние строки со статусом UPLOADED.
+def query_uploaded_rows(limit: int = 500, batch_size: int = 1000) -> Iterator[Dict]:
+    """Потоково выбрать из БД последние строки со статусом UPLOADED.
 
-    Возвращаем список словарей с полями: id, filename, whisper_model, storage_path, status
+    Используется именованный (server-side) курсор psycopg2: строки приходят пачками
+    по `batch_size`, поэтому даже без лимита память не растёт с размером таблицы.
+
+    Генерирует словари с полями: id, filename, whisper_model, storage_path, status
     """
     conn = None
     cur = None
     try:
         conn = psycopg2.connect(host=DB_HOST, port=DB_PORT, user=DB_USER, password=DB_PASS, dbname=DB_NAME)
-        cur = conn.cursor()
+        cur = conn.cursor(name='check_uploaded_rows')
+        cur.itersize = batch_size
         cur.execute("SELECT id, filename, whisper_model, storage_path, status FROM audio_files WHERE status='UPLOADED' ORDER BY id DESC LIMIT %s", (limit,))
-        rows = cur.fetchall()
-        result = []
-        for r in rows:
+        for r in cur:
             id_, filename, whisper_model, storage_path, status = r
-            result.append({
+            yield {
                 'id': id_,
                 'filename': filename,
                 'whisper_model': whisper_model,
                 'storage_path': storage_path,
                 'status': status,
-            })
-        return result
+            }
     finally:
         if cur:
             try:
@@ -113,9 +116,21 @@ def query_uploaded_rows(limit: int = 500) -> List[Dict]:
                 pass
 
 
-def build_report(rows: List[Dict], storage_root: str) -> List[Dict]:
+def _exists(path: str, checked: Dict[str, bool]) -> bool:
+    """Есть ли файл по пути; результат запоминается по `os.path.normcase(path)`.
+
+    На регистронезависимых ФС (Windows) варианты регистра одного пути дают один stat.
+    """
+    key = os.path.normcase(path)
+    if key not in checked:
+        checked[key] = os.path.isfile(path)
+    return checked[key]
+
+
+def build_report(rows: Iterable[Dict], storage_root: str) -> List[Dict]:
     """Сформировать итоговый список с кандидатами и существующими путями на диске."""
     out: List[Dict] = []
+    checked: Dict[str, bool] = {}
     for row in rows:
         id_ = row.get('id')
         filename = row.get('filename') or ""
@@ -123,7 +138,7 @@ def build_report(rows: List[Dict], storage_root: str) -> List[Dict]:
         storage_path = row.get('storage_path')
 
         candidates = _candidates_for_record(storage_root, filename, whisper_model, storage_path)
-        existing = [p for p in candidates if os.path.exists(p)]
+        existing = [p for p in candidates if _exists(p, checked)]
 
         out.append({
             'id': id_,
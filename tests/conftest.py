@@ -0,0 +1,18 @@
+"""
+Общие фикстуры тестов.
+
+`fake_redis` подменяет `app.tasks.core.redis_client` in-memory реализацией
+(`scripts._fakes.FakeRedis`), чтобы тесты не требовали поднятого Redis.
+"""
+
+import pytest
+
+from scripts._fakes import FakeRedis
+
+
+@pytest.fixture
+def fake_redis(monkeypatch):
+    import app.tasks.core as tasks_core
+    client = FakeRedis()
+    monkeypatch.setattr(tasks_core, 'redis_client', client)
+    return client
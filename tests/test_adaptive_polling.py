@@ -0,0 +1,71 @@
+"""
+Тесты адаптивного polling-emitter'а `app.utils.adaptive_polling`.
+"""
+
+import os
+
+from watchdog.observers.api import EventQueue, ObservedWatch
+
+from app.utils import adaptive_polling
+
+
+def _drain(queue):
+    events = []
+    while not queue.empty():
+        event, _ = queue.get()
+        events.append((event.event_type, os.path.basename(event.src_path), os.path.basename(event.dest_path or '')))
+    return events
+
+
+def _emitter(tmp_path, monkeypatch):
+    # считаем mtime каталогов окончательными сразу, чтобы тест не ждал
+    monkeypatch.setattr(adaptive_polling, '_MTIME_SETTLE_SECONDS', 0)
+    queue = EventQueue()
+    emitter = adaptive_polling.AdaptivePollingEmitter(queue, ObservedWatch(str(tmp_path), recursive=True),
+                                                      min_interval=0.1, max_interval=1.0)
+    emitter.on_thread_start()
+    return emitter, queue
+
+
+def test_unchanged_dirs_are_not_relisted(tmp_path, monkeypatch):
+    for model in ('base', 'small'):
+        (tmp_path / model).mkdir()
+        for i in range(50):
+            (tmp_path / model / f'{i}.mp3').write_bytes(b'1')
+    emitter, queue = _emitter(tmp_path, monkeypatch)
+    listed = []
+    real_list_dir = adaptive_polling._list_dir
+    monkeypatch.setattr(adaptive_polling, '_list_dir', lambda p: listed.append(p) or real_list_dir(p))
+
+    assert emitter.poll() == 0 and listed == []
+    (tmp_path / 'small' / 'new.mp3').write_bytes(b'1')
+    os.utime(tmp_path / 'small', ns=(1, 10**18))
+    emitter.poll()
+    assert listed == [str(tmp_path / 'small')]
+    assert _drain(queue) == [('created', 'new.mp3', '')]
+
+
+def test_rename_in_place_write_and_backoff(tmp_path, monkeypatch):
+    (tmp_path / 'base').mkdir()
+    emitter, queue = _emitter(tmp_path, monkeypatch)
+    base = tmp_path / 'base'
+
+    (base / 'up.part').write_bytes(b'1')
+    os.utime(base, ns=(1, 10**18))
+    emitter.poll()
+    (base / 'up.part').rename(base / 'up.mp3')
+    os.utime(base, ns=(1, 10**18 + 1))
+    emitter.poll()
+    # дозапись в горячий файл не меняет mtime каталога, но замечается
+    with open(base / 'up.mp3', 'ab') as fh:
+        fh.write(b'more')
+    emitter.poll()
+    assert _drain(queue) == [('created', 'up.part', ''), ('moved', 'up.part', 'up.mp3'), ('modified', 'up.mp3', '')]
+
+    emitter._hot.clear()
+    intervals = []
+    for _ in range(10):
+        emitter.stopped_event.wait = lambda timeout: False
+        emitter.queue_events(0)
+        intervals.append(emitter.interval)
+    assert intervals == sorted(intervals) and intervals[-1] == 1.0
@@ -54,3 +54,22 @@ async def test_async_add_get_delete(monkeypatch):
 
     deleted = await public.delete_audio_file('a.mp3', 'BASE')
     assert deleted is True
+
+
+@pytest.mark.asyncio
+async def test_async_stream_audio_files(monkeypatch):
+    engine = create_async_engine('sqlite+aiosqlite:///:memory:', future=True)
+    async with engine.begin() as conn:
+        from app.models.database import Base
+        import app.models  # noqa: F401
+        await conn.run_sync(Base.metadata.create_all)
+    from importlib import import_module
+    impl = import_module('app.db.ops.async_impl')
+    monkeypatch.setattr(impl, 'AsyncSessionLocal', sessionmaker(engine, class_=AsyncSession, expire_on_commit=False))
+    for name in ('a.mp3', 'b.mp3'):
+        await impl.add_audio_file(user_id=1, filename=name, original_name=name, content_type='audio/mpeg',
+                                  size=1, whisper_model='BASE', storage_path=name, audio_duration_seconds=0.0)
+
+    rows = [row async for row in impl.stream_audio_files(('id', 'filename'), batch_size=1)]
+
+    assert sorted(r.filename for r in rows) == ['a.mp3', 'b.mp3']
@@ -84,3 +84,25 @@ def test_add_get_delete_audio_file_sync(monkeypatch):
 
     finally:
         teardown_temp_db(path)
+
+
+def test_iter_audio_files_sync_streams_compact_rows():
+    path, url, engine = setup_temp_db()
+    try:
+        import importlib
+        impl_mod = importlib.import_module('app.db.ops.sync_impl')
+        impl_mod._engine = engine
+        impl_mod._Session = sessionmaker(bind=engine, expire_on_commit=False)
+        files = [{'filename': f'{i}.mp3', 'whisper_model': 'base' if i % 2 else 'small',
+                  'storage_path': f'x/{i}.mp3', 'size': i} for i in range(5)]
+        impl_mod.add_audio_files_bulk_sync(files)
+
+        rows = list(impl_mod.iter_audio_files_sync(('filename', 'size'), batch_size=2, whisper_model='BASE'))
+
+        assert sorted(rows) == [('1.mp3', 1), ('3.mp3', 3)]
+        assert rows[0].filename.endswith('.mp3')
+        assert not hasattr(rows[0], '__dict__')
+        with pytest.raises(ValueError):
+            list(impl_mod.iter_audio_files_sync(('nope',)))
+    finally:
+        teardown_temp_db(path)
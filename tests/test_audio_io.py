@@ -0,0 +1,98 @@
+"""
+Тесты потокового декодирования аудио (`app.processing.audio_io`).
+"""
+
+import shutil
+import struct
+import subprocess
+import wave
+
+import numpy as np
+import pytest
+
+from app.processing import audio_io
+
+
+def _tone(seconds, rate, freq=440.0):
+    t = np.arange(int(seconds * rate)) / rate
+    return (0.5 * np.sin(2 * np.pi * freq * t)).astype(np.float32)
+
+
+def _write_pcm16(path, samples, rate, channels=1):
+    with wave.open(str(path), 'wb') as w:
+        w.setnchannels(channels)
+        w.setsampwidth(2)
+        w.setframerate(rate)
+        w.writeframes(np.repeat((samples * 32767).astype('<i2'), channels).tobytes())
+
+
+def _write_float32(path, samples, rate):
+    data = samples.astype('<f4').tobytes()
+    fmt = struct.pack('<HHIIHH', 3, 1, rate, rate * 4, 4, 32)
+    with open(path, 'wb') as f:
+        f.write(b'RIFF' + struct.pack('<I', 4 + 8 + len(fmt) + 8 + 6 + 8 + len(data)) + b'WAVE')
+        f.write(b'fmt ' + struct.pack('<I', len(fmt)) + fmt)
+        f.write(b'LIST' + struct.pack('<I', 6) + b'INFOxx')  # посторонний chunk перед data
+        f.write(b'data' + struct.pack('<I', len(data)) + data)
+
+
+def test_wav_streams_fixed_blocks_at_model_rate(tmp_path):
+    path = tmp_path / 'stereo.wav'
+    source = _tone(3.0, 16000)
+    _write_pcm16(path, source, 16000, channels=2)
+
+    info = audio_io.read_wav_info(str(path))
+    assert info is not None and info.channels == 2 and info.duration == 3.0
+    blocks = list(audio_io.stream(str(path), block_frames=4096))
+
+    assert all(len(b) == 4096 for b in blocks[:-1]) and all(b.dtype == np.float32 for b in blocks)
+    decoded = np.concatenate(blocks)
+    assert np.allclose(decoded, source, atol=1e-4)
+    # интервал читается со смещением по memmap, без декодирования начала файла
+    assert np.allclose(audio_io.read(str(path), 1.0, 1.5), source[16000:24000], atol=1e-4)
+
+
+def test_float_wav_with_extra_chunks_and_resampling(tmp_path):
+    path = tmp_path / 'float.wav'
+    source = _tone(2.0, 44100, freq=200.0)
+    _write_float32(str(path), source, 44100)
+
+    decoded = audio_io.read(str(path))
+    assert abs(len(decoded) - 32000) <= 1
+    assert np.allclose(decoded[:31000], _tone(2.0, 16000, freq=200.0)[:31000], atol=2e-3)
+
+
+def test_read_refuses_intervals_longer_than_in_memory_cap(tmp_path, monkeypatch):
+    from app.processing import chunking
+    path = tmp_path / 'long.wav'
+    _write_pcm16(path, _tone(12.0, 16000), 16000)
+    monkeypatch.setenv('ASR_MAX_IN_MEMORY_SECONDS', '5')
+
+    with pytest.raises(audio_io.AudioDecodeError):
+        audio_io.read(str(path))
+    # интервал в пределах лимита читается
+    assert len(audio_io.read(str(path), 2.0, 6.0)) == 4 * 16000
+    # фрагменты ограничены так, чтобы с перекрытием помещаться в лимит, даже при ASR_CHUNK_SECONDS больше него
+    assert chunking.chunk_seconds_for(str(path), chunk_seconds=300, duration=12.0) == pytest.approx(2.4)
+
+
+def test_resampler_output_does_not_depend_on_block_size():
+    signal = np.random.default_rng(0).standard_normal(10_007).astype(np.float32)
+    whole = audio_io.StreamingResampler(44100, 16000)
+    expected = np.concatenate([whole.process(signal), whole.flush()])
+
+    for size in (1, 37, 1000):
+        r = audio_io.StreamingResampler(44100, 16000)
+        out = [r.process(signal[i:i + size]) for i in range(0, len(signal), size)] + [r.flush()]
+        assert np.allclose(np.concatenate(out), expected, atol=1e-5)
+
+
+@pytest.mark.skipif(shutil.which('ffmpeg') is None, reason='ffmpeg is not installed')
+def test_mp3_streams_through_ffmpeg(tmp_path):
+    wav, mp3 = tmp_path / 'a.wav', tmp_path / 'a.mp3'
+    _write_pcm16(wav, _tone(2.0, 16000), 16000)
+    subprocess.run(['ffmpeg', '-v', 'error', '-i', str(wav), str(mp3)], check=True)
+
+    blocks = list(audio_io.stream(str(mp3), block_frames=8000))
+    assert all(len(b) == 8000 for b in blocks[:-1])
+    assert abs(sum(len(b) for b in blocks) - 32000) < 2000
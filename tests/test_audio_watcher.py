@@ -8,11 +8,12 @@
 import importlib
 from unittest.mock import MagicMock, patch
 import os
+import time
 
 from app.utils import audio_watcher
 
 
-def test_watcher_enqueues(monkeypatch, tmp_path):
+def test_watcher_enqueues(monkeypatch, tmp_path, fake_redis):
     # Create a watcher instance pointed at tmp_path
     calls = []
 
@@ -50,3 +51,221 @@ def test_watcher_enqueues(monkeypatch, tmp_path):
 
     handler.on_deleted(Event(str(path)))
     assert len(calls) == 2
+
+
+def test_watcher_enqueues_rename_on_move(monkeypatch, tmp_path, fake_redis):
+    import app.tasks.core as tasks_core
+    rename, add, delete = MagicMock(), MagicMock(), MagicMock()
+    monkeypatch.setattr(tasks_core, 'enqueue_rename_files_bulk', rename)
+    monkeypatch.setattr(tasks_core, 'enqueue_add_file', add)
+    monkeypatch.setattr(tasks_core, 'enqueue_delete_file', delete)
+    from app.utils import settings as settings_mod
+    monkeypatch.setattr(settings_mod.settings, 'STORAGE_DIR', str(tmp_path))
+    from watchdog.events import FileMovedEvent
+    (tmp_path / 'base').mkdir()
+    (tmp_path / 'small').mkdir()
+    handler = audio_watcher.AudioFileHandler()
+
+    (tmp_path / 'base' / 'b.mp3').write_bytes(b'1')
+    handler.on_moved(FileMovedEvent(str(tmp_path / 'base' / 'a.mp3'), str(tmp_path / 'base' / 'b.mp3')))
+    rename.delay.assert_called_once_with('base', [('a.mp3', 'b.mp3')])
+
+    # загрузка через временный файл: .part -> .mp3 — обычное создание
+    (tmp_path / 'base' / 'c.mp3').write_bytes(b'1')
+    handler.on_moved(FileMovedEvent(str(tmp_path / 'base' / 'c.part'), str(tmp_path / 'base' / 'c.mp3')))
+    assert add.delay.call_args.args[0] == 'c.mp3'
+    delete.delay.assert_not_called()
+
+    # перенос в другую модель — удаление + создание
+    (tmp_path / 'small' / 'b.mp3').write_bytes(b'1')
+    handler.on_moved(FileMovedEvent(str(tmp_path / 'base' / 'b.mp3'), str(tmp_path / 'small' / 'b.mp3')))
+    delete.delay.assert_called_once_with('b.mp3', 'base')
+    assert add.delay.call_args.args[:2] == ('b.mp3', 'small')
+    assert rename.delay.call_count == 1
+
+
+def test_watcher_batches_events_within_window(monkeypatch, tmp_path, fake_redis):
+    import app.tasks.core as tasks_core
+    batch, add = MagicMock(), MagicMock()
+    monkeypatch.setattr(tasks_core, 'enqueue_file_events_batch', batch)
+    monkeypatch.setattr(tasks_core, 'enqueue_add_file', add)
+    from app.utils import settings as settings_mod
+    monkeypatch.setattr(settings_mod.settings, 'STORAGE_DIR', str(tmp_path))
+    batcher = audio_watcher._batcher
+    monkeypatch.setattr(batcher, 'window', 60)
+    monkeypatch.setattr(batcher, 'max_events', 3)
+    (tmp_path / 'base').mkdir()
+    handler = audio_watcher.AudioFileHandler()
+
+    class Event:
+        def __init__(self, path):
+            self.src_path = path
+            self.is_directory = False
+
+    for name in ('a.mp3', 'b.mp3'):
+        (tmp_path / 'base' / name).write_bytes(b'1')
+        handler.on_created(Event(str(tmp_path / 'base' / name)))
+    # окно ещё не истекло и пачка не заполнена — в брокер ничего не ушло
+    batch.delay.assert_not_called()
+    assert batcher.pending() == 2
+
+    handler.on_deleted(Event(str(tmp_path / 'base' / 'gone.mp3')))
+    adds, deletes = batch.delay.call_args.args
+    assert [f['filename'] for f in adds] == ['a.mp3', 'b.mp3']
+    assert deletes == [('base', 'gone.mp3')]
+    assert batcher.pending() == 0
+
+    # одиночное событие уходит прежней задачей по истечении окна
+    monkeypatch.setattr(batcher, 'window', 0.01)
+    (tmp_path / 'base' / 'c.mp3').write_bytes(b'1')
+    handler.on_created(Event(str(tmp_path / 'base' / 'c.mp3')))
+    deadline = time.monotonic() + 2
+    while not add.delay.called and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert add.delay.call_args.args[0] == 'c.mp3'
+    assert batch.delay.call_count == 1
+
+
+def test_watcher_keeps_delete_before_recreate_in_one_batch(monkeypatch, tmp_path, fake_redis):
+    import app.tasks.core as tasks_core
+    batch = MagicMock()
+    monkeypatch.setattr(tasks_core, 'enqueue_file_events_batch', batch)
+    from app.utils import settings as settings_mod
+    monkeypatch.setattr(settings_mod.settings, 'STORAGE_DIR', str(tmp_path))
+    batcher = audio_watcher._batcher
+    monkeypatch.setattr(batcher, 'window', 60)
+    (tmp_path / 'base').mkdir()
+    handler = audio_watcher.AudioFileHandler()
+
+    class Event:
+        def __init__(self, path):
+            self.src_path = path
+            self.is_directory = False
+
+    path = tmp_path / 'base' / 'a.mp3'
+    handler.on_deleted(Event(str(path)))
+    path.write_bytes(b'new')
+    handler.on_created(Event(str(path)))
+    batcher.flush()
+
+    # удаление не схлопывается в добавление: воркер заменит старую запись новой
+    adds, deletes = batch.delay.call_args.args
+    assert [f['filename'] for f in adds] == ['a.mp3'] and deletes == [('base', 'a.mp3')]
+    # добавление, за которым последовало удаление, отменяется
+    assert audio_watcher._collapse_events([
+        ('add', 'base', 'b.mp3', {}), ('delete', 'base', 'b.mp3', None),
+    ]) == [('delete', 'base', 'b.mp3', None)]
+
+
+def test_outbox_defaults_to_container_local_path(monkeypatch, tmp_path):
+    from app.utils import event_outbox
+    monkeypatch.delenv('WATCHER_OUTBOX_PATH', raising=False)
+    assert event_outbox.outbox_path() == '/var/lib/sciber/watcher_outbox.sqlite3'
+
+    path = tmp_path / 'state' / 'outbox.sqlite3'
+    monkeypatch.setenv('WATCHER_OUTBOX_PATH', str(path))
+    outbox = event_outbox.EventOutbox(event_outbox.outbox_path())
+    outbox.append([('add', 'base', 'a.mp3', {})])
+    assert path.exists() and outbox.count() == 1
+
+
+def test_watcher_outbox_keeps_events_while_broker_is_down(monkeypatch, tmp_path, fake_redis):
+    import app.tasks.core as tasks_core
+    from app.utils.event_outbox import EventOutbox
+    from app.utils import settings as settings_mod
+    monkeypatch.setattr(settings_mod.settings, 'STORAGE_DIR', str(tmp_path))
+    monkeypatch.setattr(audio_watcher, '_outbox', EventOutbox(str(tmp_path / 'outbox.sqlite3')))
+    monkeypatch.setattr(audio_watcher, '_BATCH_MAX_EVENTS', 2)
+    sent = []
+
+    class Broker:
+        down = True
+
+        def __init__(self, name):
+            self.name = name
+
+        def delay(self, *args, **kwargs):
+            if Broker.down:
+                raise ConnectionError('broker down')
+            sent.append((self.name, args))
+
+    for name in ('enqueue_add_file', 'enqueue_delete_file', 'enqueue_file_events_batch'):
+        monkeypatch.setattr(tasks_core, name, Broker(name))
+    (tmp_path / 'base').mkdir()
+    handler = audio_watcher.AudioFileHandler()
+
+    class Event:
+        def __init__(self, path):
+            self.src_path = path
+            self.is_directory = False
+
+    for name in ('a.mp3', 'b.mp3', 'c.mp3'):
+        (tmp_path / 'base' / name).write_bytes(b'1')
+        handler.on_created(Event(str(tmp_path / 'base' / name)))
+    handler.on_deleted(Event(str(tmp_path / 'base' / 'a.mp3')))
+    assert sent == [] and audio_watcher._outbox.count() == 4
+    assert audio_watcher.replay_outbox() == 0
+
+    Broker.down = False
+    assert audio_watcher.replay_outbox() == 4
+    assert audio_watcher._outbox.count() == 0
+    # по порядку, пачками по 2: (add a, add b), затем (add c, delete a)
+    assert [name for name, _ in sent] == ['enqueue_file_events_batch', 'enqueue_file_events_batch']
+    assert [f['filename'] for f in sent[0][1][0]] == ['a.mp3', 'b.mp3']
+    assert [f['filename'] for f in sent[1][1][0]] == ['c.mp3'] and sent[1][1][1] == [('base', 'a.mp3')]
+
+
+def test_dropped_batch_releases_dedup_keys(monkeypatch, fake_redis):
+    from app.tasks import dedup
+
+    def no_outbox():
+        raise OSError('read-only storage')
+
+    monkeypatch.setattr(audio_watcher, '_get_outbox', no_outbox)
+    monkeypatch.setattr(audio_watcher, '_send_timed', lambda events: False)
+    assert dedup.claim_add('base', 'a.mp3', 1, 1) and dedup.claim_delete('base', 'b.mp3')
+    audio_watcher._publish_events([('add', 'base', 'a.mp3', {}), ('delete', 'base', 'b.mp3', None)])
+    # batch отброшен: beat и повторные события должны снова поставить эти файлы
+    assert dedup.claim_add('base', 'a.mp3', 1, 1) and dedup.claim_delete('base', 'b.mp3')
+
+
+def test_watcher_metrics_count_events_and_enqueue(monkeypatch, tmp_path, fake_redis):
+    import app.tasks.core as tasks_core
+    from watchdog.events import FileCreatedEvent
+    from app.utils import metrics
+    add = MagicMock()
+    monkeypatch.setattr(tasks_core, 'enqueue_add_file', add)
+    from app.utils import settings as settings_mod
+    monkeypatch.setattr(settings_mod.settings, 'STORAGE_DIR', str(tmp_path))
+    (tmp_path / 'base').mkdir()
+    (tmp_path / 'base' / 'm.mp3').write_bytes(b'1')
+
+    def sample(name, labels=None):
+        return metrics.REGISTRY.get_sample_value(name, labels) or 0.0
+
+    created = sample('sciber_watcher_events_total', {'type': 'created'})
+    filtered = sample('sciber_watcher_events_filtered_total', {'reason': 'extension'})
+    published = sample('sciber_watcher_enqueue_seconds_count')
+
+    handler = audio_watcher.AudioFileHandler()
+    handler.on_created(FileCreatedEvent(str(tmp_path / 'base' / 'm.mp3')))
+    handler.on_created(FileCreatedEvent(str(tmp_path / 'base' / 'notes.txt')))
+
+    add.delay.assert_called_once()
+    assert sample('sciber_watcher_events_total', {'type': 'created'}) == created + 2
+    assert sample('sciber_watcher_events_filtered_total', {'reason': 'extension'}) == filtered + 1
+    assert sample('sciber_watcher_enqueue_seconds_count') == published + 1
+    assert b'sciber_watcher_pending{stage="debounce"}' in metrics.render()
+
+
+def test_rate_limited_logger_suppresses_bursts(caplog):
+    import logging
+    from app.utils.ratelimited_log import RateLimitedLogger
+    logger = logging.getLogger('test.ratelimited')
+    logger.setLevel(logging.DEBUG)
+    log = RateLimitedLogger(logger, period=60, burst=2)
+    with caplog.at_level(logging.DEBUG, logger='test.ratelimited'):
+        for i in range(10):
+            log.debug('event', "event %d", i)
+        log.debug('other', "other key")
+    assert [r.getMessage() for r in caplog.records] == ['event 0', 'event 1', 'other key']
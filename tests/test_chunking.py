@@ -0,0 +1,72 @@
+"""
+Тесты фрагментной транскрипции (`app.processing.chunking`).
+"""
+
+import wave
+
+import numpy as np
+
+from app.processing import chunking, transcribe
+
+
+def _write_wav(path, seconds, rate=8000, pauses=()):
+    """Тон 440 Гц с тишиной в интервалах `pauses`."""
+    t = np.arange(int(seconds * rate)) / rate
+    samples = 0.5 * np.sin(2 * np.pi * 440 * t)
+    for start, end in pauses:
+        samples[int(start * rate):int(end * rate)] = 0.0
+    with wave.open(str(path), 'wb') as w:
+        w.setnchannels(2)
+        w.setsampwidth(2)
+        w.setframerate(rate)
+        pcm = (samples * 32767).astype('<i2')
+        w.writeframes(np.repeat(pcm, 2).tobytes())
+
+
+def test_plan_chunks_cuts_at_pauses_with_overlap(tmp_path):
+    path = tmp_path / 'long.wav'
+    _write_wav(path, 100, pauses=[(18.0, 19.0), (43.0, 44.0), (61.0, 62.0)])
+    energy, duration = chunking.energy(str(path))
+    assert len(energy) == 1000 and duration == 100.0
+
+    chunks = chunking.plan_chunks(energy, chunking.FRAME_SECONDS, 20.0, 1.0, search_seconds=5.0)
+
+    cuts = [c.own_end for c in chunks[:-1]]
+    for cut, (a, b) in zip(cuts, [(18, 19), (43, 44), (61, 62)]):
+        assert a <= cut <= b
+    assert chunks[0].start == 0.0 and chunks[-1].end == 100.0
+    for prev, nxt in zip(chunks, chunks[1:]):
+        assert prev.own_end == nxt.own_start
+        assert nxt.start == prev.own_end - 1.0 and prev.end == prev.own_end + 1.0
+
+
+def test_stitch_shifts_timestamps_and_drops_overlap_duplicates():
+    chunks = [chunking.Chunk(0, 11, 0, 10), chunking.Chunk(9, 20, 10, 20)]
+    results = [
+        {"segments": [{"start": 0, "end": 5, "text": "a"}, {"start": 8.5, "end": 10.5, "text": "b"}]},
+        # "b" повторно в зоне перекрытия второго фрагмента: его середина (9.5) принадлежит первому
+        {"segments": [{"start": 0, "end": 1, "text": "b"}, {"start": 2, "end": 6, "text": "c"}]},
+    ]
+    out = chunking.stitch(chunks, results, 20.0)
+    assert out["text"] == "a b c"
+    assert [(s["start"], s["end"]) for s in out["segments"]] == [(0, 5), (8.5, 10.5), (11, 15)]
+
+
+def test_transcribe_long_wav_in_parallel_chunks(tmp_path):
+    path = tmp_path / 'long.wav'
+    _write_wav(path, 30, pauses=[(9.5, 10.5), (19.5, 20.5)])
+
+    try:
+        result = transcribe.process(str(path), 'base', engine='fake', chunk_seconds=10, chunk_overlap=0.5,
+                                    chunk_workers=2)
+    finally:
+        chunking.shutdown_pool(wait=True)
+
+    assert result["chunks"] == 3
+    assert result["duration"] == 30.0
+    starts = [s["start"] for s in result["segments"]]
+    assert starts == sorted(starts) and starts[0] == 0.0 and 9 < starts[1] < 11
+    assert result["segments"][-1]["end"] == 30.0
+
+    # короткий файл распознаётся целиком
+    assert "chunks" not in transcribe.process(str(path), 'base', engine='fake', chunk_seconds=60)
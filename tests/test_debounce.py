@@ -0,0 +1,51 @@
+"""
+Тесты планировщика отложенных вызовов `app.utils.debounce`.
+"""
+
+import threading
+import time
+
+from app.utils.debounce import DebounceScheduler
+
+
+def _wait_for(predicate, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.01)
+    return False
+
+
+def test_reschedule_collapses_burst_into_one_call():
+    scheduler = DebounceScheduler('test-debounce')
+    calls = []
+    try:
+        for i in range(100):
+            scheduler.schedule('k', 0.05, lambda i=i: calls.append(i))
+        scheduler.schedule('other', 0.01, lambda: calls.append('other'))
+        assert _wait_for(lambda: len(calls) == 2)
+        # выполняется только последний перенос
+        assert calls == ['other', 99]
+        assert scheduler.pending() == 0
+    finally:
+        scheduler.stop()
+
+
+def test_burst_uses_single_thread_and_cancel():
+    scheduler = DebounceScheduler('test-debounce-burst')
+    calls = []
+    try:
+        for i in range(10_000):
+            scheduler.schedule(i, 60, lambda: calls.append(1))
+        thread = scheduler._thread
+        assert thread is not None and thread.is_alive()
+        assert [t for t in threading.enumerate() if t.name == scheduler.name] == [thread]
+        assert scheduler.pending() == 10_000
+        assert scheduler.cancel(0) and not scheduler.cancel(0)
+        scheduler.schedule('now', 0, lambda: calls.append('now'))
+        assert _wait_for(lambda: calls == ['now'])
+        assert scheduler._thread is thread
+    finally:
+        scheduler.stop()
+    assert not thread.is_alive()
@@ -0,0 +1,135 @@
+"""
+Тесты кэша моделей ASR (`app.processing.model_cache`) и реестра движков.
+"""
+
+import pytest
+
+from app.processing import engines, transcribe
+from app.processing.model_cache import ModelCache
+
+
+class CountingEngine(engines.FakeEngine):
+    name = 'counting'
+
+    def estimate_mb(self, model):
+        return {'base': 100, 'small': 300, 'medium': 600}[model]
+
+
+def test_cache_reuses_models_and_evicts_lru_over_budget():
+    engine = CountingEngine()
+    cache = ModelCache(budget_mb=700, min_free_mb=0, free_mb=lambda: 10_000)
+
+    first = cache.get(engine, 'base')
+    assert cache.get(engine, 'base') is first
+    cache.get(engine, 'small')
+    cache.get(engine, 'base')  # base становится недавно использованной
+    cache.get(engine, 'medium')  # 100 + 300 + 600 > 700: вытесняется small
+
+    assert engine.loads == 3 and cache.hits == 2
+    assert ('counting', 'small') not in cache and ('counting', 'base') in cache
+    assert cache.used_mb == 700
+
+
+def test_cache_evicts_on_low_free_memory():
+    engine = CountingEngine()
+    free = {'mb': 2000}
+    cache = ModelCache(budget_mb=10_000, min_free_mb=1000, free_mb=lambda: free['mb'])
+    cache.get(engine, 'base')
+    cache.get(engine, 'small')
+
+    free['mb'] = 1200  # medium (600 МБ) оставила бы меньше 1000 МБ свободными
+    cache.get(engine, 'medium')
+    assert list(k[1] for k in cache._models) == ['medium']
+
+    free['mb'] = 500
+    assert cache.relieve_pressure() == 1
+    assert len(cache) == 0
+
+
+def test_transcribe_uses_registered_engine(tmp_path, monkeypatch):
+    audio = tmp_path / 'a.wav'
+    audio.write_bytes(b'RIFF....')
+    engine = CountingEngine()
+    engines.register_engine('counting', lambda: engine)
+    from app.processing import model_cache
+    monkeypatch.setattr(model_cache, '_cache', ModelCache(budget_mb=1000, min_free_mb=0, free_mb=lambda: 10_000))
+    monkeypatch.setattr(model_cache, '_cache_pid', __import__('os').getpid())
+
+    first = transcribe.process(str(audio), 'base', engine='counting', duration=2.0)
+    second = transcribe.process(str(audio), 'base', engine='counting', chunk_seconds=0)
+    assert first['text'] == second['text'] and first['text'].startswith('[base] a.wav')
+    assert first['duration'] == 2.0
+    assert engine.loads == 1
+
+    with pytest.raises(transcribe.TranscriptionError):
+        transcribe.process(str(audio), 'base', engine='missing')
+
+
+def test_faster_whisper_batch_splits_segments_back_to_files(tmp_path, monkeypatch):
+    import wave
+    from types import SimpleNamespace
+    paths = []
+    for name, seconds in (('a.wav', 2), ('b.wav', 3)):
+        path = tmp_path / name
+        with wave.open(str(path), 'wb') as w:
+            w.setnchannels(1)
+            w.setsampwidth(2)
+            w.setframerate(16000)
+            w.writeframes(b'\x00\x00' * 16000 * seconds)
+        paths.append(str(path))
+
+    class Model:
+        calls = []
+
+        def transcribe(self, audio, **opts):
+            self.calls.append((len(audio), opts))
+            # a: [0, 2) + пауза 1 с; b: [3, 6) + пауза
+            segs = [(0.1, 1.9, 'one'), (2.2, 2.9, 'tail'), (3.0, 4.0, 'two'), (4.0, 5.9, 'three')]
+            return (SimpleNamespace(start=a, end=b, text=f' {t}') for a, b, t in segs), \
+                SimpleNamespace(duration=len(audio) / 16000, language='en')
+
+    handle = Model()
+    results = engines.FasterWhisperEngine().transcribe_batch(handle, paths)
+
+    assert len(handle.calls) == 1 and handle.calls[0][0] == 16000 * 7
+    assert handle.calls[0][1]['condition_on_previous_text'] is False
+    assert [r['text'] for r in results] == ['one tail', 'two three']
+    assert [r['duration'] for r in results] == [2.0, 3.0]
+    assert [r['language'] for r in results] == ['en', 'en']
+    assert results[1]['segments'][0] == {'start': 0.0, 'end': 1.0, 'text': 'two'}
+    # сегмент из паузы после файла прижимается к концу файла
+    assert results[0]['segments'][1] == {'start': 2.0, 'end': 2.0, 'text': 'tail'}
+
+
+def test_process_batch_falls_back_to_single_files_on_batch_error(tmp_path, monkeypatch):
+    good = tmp_path / 'good.wav'
+    good.write_bytes(b'RIFF....')
+    engine = CountingEngine()
+    engines.register_engine('counting', lambda: engine)
+    from app.processing import model_cache
+    monkeypatch.setattr(model_cache, '_cache', ModelCache(budget_mb=1000, min_free_mb=0, free_mb=lambda: 10_000))
+    monkeypatch.setattr(model_cache, '_cache_pid', __import__('os').getpid())
+
+    results = transcribe.process_batch([str(good), str(tmp_path / 'missing.wav')], 'base', engine='counting')
+
+    assert results[0]['text'].startswith('[base] good.wav')
+    assert isinstance(results[1], transcribe.TranscriptionError)
+    assert engine.batches == 1 and engine.loads == 1
+
+
+def test_incomplete_engine_fails_on_register_and_instantiation():
+    class NoEstimate(engines.ASREngine):
+        name = 'no_estimate'
+
+        def load(self, model):
+            return model
+
+        def transcribe(self, handle, audio_path, **opts):
+            return {}
+
+    with pytest.raises(TypeError, match='estimate_mb'):
+        engines.register_engine('no_estimate', NoEstimate)
+    with pytest.raises(TypeError):
+        NoEstimate()
+    with pytest.raises(ValueError):
+        engines.get_engine('no_estimate')
@@ -0,0 +1,65 @@
+"""
+Тесты определения параметров аудио по заголовкам (`app.processing.probe`).
+"""
+
+import struct
+import wave
+
+import pytest
+
+from app.processing.probe import probe
+
+# MPEG-1 Layer III, 44100 Гц, стерео, без padding; индекс битрейта -> кбит/с
+_BITRATE_INDEX = {128: 9, 160: 10, 192: 11}
+
+
+def _frame(kbps, payload=b''):
+    header = bytes([0xFF, 0xFB, _BITRATE_INDEX[kbps] << 4, 0x00])
+    length = 144 * kbps * 1000 // 44100
+    body = payload + b'\x00' * (length - 4 - len(payload))
+    return header + body
+
+
+def _id3v2(size=300):
+    synchsafe = bytes([(size >> 21) & 0x7F, (size >> 14) & 0x7F, (size >> 7) & 0x7F, size & 0x7F])
+    return b'ID3\x03\x00\x00' + synchsafe + b'\x00' * size
+
+
+def test_wav_header(tmp_path):
+    path = tmp_path / 'a.wav'
+    with wave.open(str(path), 'wb') as w:
+        w.setnchannels(2)
+        w.setsampwidth(2)
+        w.setframerate(22050)
+        w.writeframes(b'\x00' * 22050 * 4 * 3)
+    info = probe(str(path))
+    assert info == (3.0, 22050, 2, 'audio/wav')
+
+
+def test_cbr_mp3_duration_from_size(tmp_path):
+    path = tmp_path / 'cbr.mp3'
+    path.write_bytes(_id3v2() + b''.join(_frame(128) for _ in range(200)) + b'TAG' + b'\x00' * 125)
+    info = probe(str(path))
+    assert info is not None and info.content_type == 'audio/mpeg'
+    assert (info.sample_rate, info.channels) == (44100, 2)
+    assert info.duration == pytest.approx(200 * 1152 / 44100, rel=0.01)
+
+
+def test_xing_header_gives_vbr_frame_count(tmp_path):
+    path = tmp_path / 'xing.mp3'
+    # Xing после side info (32 байта для MPEG-1 стерео): флаг «есть число кадров», 5000 кадров
+    xing = b'\x00' * 32 + b'Xing' + struct.pack('>II', 1, 5000)
+    path.write_bytes(_frame(128, xing) + b''.join(_frame(128) for _ in range(10)))
+    assert probe(str(path)).duration == pytest.approx(5000 * 1152 / 44100)
+
+
+def test_vbr_without_header_scans_frame_headers(tmp_path):
+    path = tmp_path / 'vbr.mp3'
+    path.write_bytes(b'junk' + b''.join(_frame(rate) for rate in [128, 192, 160] * 50))
+    assert probe(str(path)).duration == pytest.approx(150 * 1152 / 44100)
+
+
+def test_unknown_format(tmp_path):
+    path = tmp_path / 'x.mp3'
+    path.write_bytes(b'not audio at all' * 100)
+    assert probe(str(path)) is None
@@ -0,0 +1,34 @@
+"""
+Тесты сканера storage (`app.utils.storage_scanner`).
+
+Проверяют фильтрацию по расширению/типу и параллельный обход нескольких папок моделей.
+"""
+
+import os
+
+from app.utils.storage_scanner import iter_storage, scan_dir
+
+
+def test_scan_dir_filters_and_reads_stat(tmp_path):
+    (tmp_path / 'a.MP3').write_bytes(b'123')
+    (tmp_path / 'b.txt').write_bytes(b'x')
+    (tmp_path / 'sub.wav').mkdir()
+
+    entries = scan_dir(str(tmp_path))
+
+    assert [e.filename for e in entries] == ['a.MP3']
+    st = os.stat(tmp_path / 'a.MP3')
+    assert (entries[0].size, entries[0].mtime_ns, entries[0].inode) == (3, st.st_mtime_ns, st.st_ino)
+    assert scan_dir(str(tmp_path / 'missing')) == []
+
+
+def test_iter_storage_scans_model_dirs_in_parallel(tmp_path):
+    for model in ('base', 'small', 'large'):
+        (tmp_path / model).mkdir()
+        for i in range(3):
+            (tmp_path / model / f'{i}.wav').write_bytes(b'1')
+
+    entries = list(iter_storage(str(tmp_path), max_workers=3))
+
+    assert len(entries) == 9
+    assert {e.whisper_model for e in entries} == {'base', 'small', 'large'}
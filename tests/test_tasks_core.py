@@ -5,9 +5,12 @@
 и что логика enqueue/process работает на уровне вызовов.
 """
 
+import os
 from importlib import import_module
 from unittest.mock import MagicMock
 
+import pytest
+
 
 def test_enqueue_and_process(monkeypatch):
     tasks = import_module('app.tasks.core')
@@ -32,3 +35,602 @@ def test_enqueue_and_process(monkeypatch):
 
     deleted = impl.delete_audio_file_sync('xx', 'BASE')
     assert deleted is True
+
+
+def _use_temp_db(monkeypatch, tmp_path):
+    """Подменить движок sync_impl на временную sqlite базу с созданными таблицами.
+
+    Внешние ключи включены, чтобы ON DELETE CASCADE работал как в PostgreSQL.
+    """
+    from sqlalchemy import create_engine, event
+    from sqlalchemy.orm import sessionmaker
+    from app.models.database import Base
+    from app.models.user import User
+    import app.models  # noqa: F401
+    impl = import_module('app.db.ops.sync_impl')
+    engine = create_engine(f"sqlite:///{tmp_path / 'test.db'}", future=True)
+
+    @event.listens_for(engine, 'connect')
+    def _enable_foreign_keys(dbapi_connection, connection_record):
+        dbapi_connection.execute('PRAGMA foreign_keys=ON')
+
+    Base.metadata.create_all(engine)
+    with engine.begin() as conn:
+        # владелец записей по умолчанию (user_id=1)
+        conn.execute(User.__table__.insert().values(id=1, name='test', hashed_password='x'))
+    monkeypatch.setattr(impl, '_engine', engine)
+    monkeypatch.setattr(impl, '_Session', sessionmaker(bind=engine, expire_on_commit=False))
+    return impl
+
+
+def _run_tasks_inline(monkeypatch):
+    """Выполнять задачи (цепочки этапов) синхронно в процессе теста, без брокера."""
+    tasks = import_module('app.tasks.core')
+    monkeypatch.setattr(tasks.celery_app.conf, 'task_always_eager', True)
+    return tasks
+
+
+def test_sync_shard_diffs_keys_in_one_query(monkeypatch, tmp_path, fake_redis):
+    impl = _use_temp_db(monkeypatch, tmp_path)
+    tasks = import_module('app.tasks.core')
+    storage = tmp_path / 'storage'
+    (storage / 'base').mkdir(parents=True)
+    (storage / 'base' / 'keep.mp3').write_bytes(b'1')
+    (storage / 'base' / 'new.wav').write_bytes(b'22')
+    (storage / 'base' / 'notes.txt').write_bytes(b'x')
+    ids = {}
+    for name in ('keep.mp3', 'gone.mp3'):
+        ids[name] = impl.add_audio_file_sync(user_id=1, filename=name, original_name=name, content_type='audio/mpeg',
+                                             size=1, whisper_model='BASE', storage_path=f'base/{name}', audio_duration_seconds=0.0)
+    monkeypatch.setenv('STORAGE_DIR', str(storage))
+    add, delete = MagicMock(), MagicMock()
+    monkeypatch.setattr(tasks, 'enqueue_add_files_bulk', add)
+    monkeypatch.setattr(tasks, 'enqueue_delete_files_bulk', delete)
+
+    report = tasks.sync_storage_shard.run('base', 0)
+
+    add.delay.assert_called_once_with([{
+        'filename': 'new.wav', 'whisper_model': 'base', 'storage_path': os.path.join('base', 'new.wav'),
+        'size': 2, 'original_name': 'new.wav', 'mtime_ns': (storage / 'base' / 'new.wav').stat().st_mtime_ns,
+        'inode': (storage / 'base' / 'new.wav').stat().st_ino,
+    }], 1)
+    delete.delay.assert_called_once_with([ids['gone.mp3']])
+    assert report['done'] and report['queries'] == 1
+    assert (report['to_add'], report['to_delete']) == (1, 1)
+
+
+def test_sync_shard_resumes_from_cursor_after_time_budget(monkeypatch, tmp_path, fake_redis):
+    impl = _use_temp_db(monkeypatch, tmp_path)
+    tasks = import_module('app.tasks.core')
+    storage = tmp_path / 'storage'
+    (storage / 'small').mkdir(parents=True)
+    for i in range(5):
+        (storage / 'small' / f'{i}.mp3').write_bytes(b'1')
+    monkeypatch.setenv('STORAGE_DIR', str(storage))
+    monkeypatch.setattr(tasks, '_bulk_chunk_size', 2)
+    add = MagicMock()
+    monkeypatch.setattr(tasks, 'enqueue_add_files_bulk', add)
+    monkeypatch.setattr(tasks, 'enqueue_delete_files_bulk', MagicMock())
+
+    reports = [tasks.sync_storage_shard.run('small', 0, time_budget=0) for _ in range(3)]
+
+    assert [r['done'] for r in reports] == [False, False, True]
+    sent = [f['filename'] for c in add.delay.call_args_list for f in c.args[0]]
+    assert sent == ['0.mp3', '1.mp3', '2.mp3', '3.mp3', '4.mp3']
+    assert fake_redis.smembers(tasks.SYNC_PENDING_SHARDS_KEY) == set()
+    assert fake_redis.get(tasks._shard_cursor_key('small', 0)) is None
+
+
+def test_deep_sync_splits_model_into_filename_ranges(monkeypatch, tmp_path, fake_redis):
+    impl = _use_temp_db(monkeypatch, tmp_path)
+    tasks = import_module('app.tasks.core')
+    storage = tmp_path / 'storage'
+    (storage / 'base').mkdir(parents=True)
+    for name in ('a.mp3', 'b.mp3', 'c.mp3', 'd.mp3'):
+        (storage / 'base' / name).write_bytes(b'1')
+    impl.add_audio_files_bulk_sync([
+        {'filename': n, 'whisper_model': 'base', 'storage_path': f'base/{n}', 'size': 1} for n in ('0.mp3', 'b.mp3', 'z.mp3')
+    ])
+    monkeypatch.setenv('STORAGE_DIR', str(storage))
+    monkeypatch.setattr(tasks, '_shard_buckets', 2)
+    add, delete = MagicMock(), MagicMock()
+    monkeypatch.setattr(tasks, 'enqueue_add_files_bulk', add)
+    monkeypatch.setattr(tasks, 'enqueue_delete_files_bulk', delete)
+    monkeypatch.setattr(tasks, '_dispatch_shards', MagicMock(side_effect=len))
+    assert tasks.sync_storage_with_db.run(deep=True)['shards'] == 2 + 1 + 1 + 1
+
+    # шарды не листят папку заново и читают из БД только свой диапазон имён
+    from app.utils import storage_scanner
+    monkeypatch.setattr(storage_scanner, 'scan_dir', MagicMock(side_effect=AssertionError('listed twice')))
+    ranges = []
+    read_range = impl.iter_audio_file_keys_in_range_sync
+    monkeypatch.setattr(impl, 'iter_audio_file_keys_in_range_sync',
+                        lambda model, lo, hi: ranges.append((lo, hi)) or read_range(model, lo, hi))
+    reports = [tasks.sync_storage_shard.run('base', bucket) for bucket in (0, 1)]
+
+    assert ranges == [(None, 'b.mp3'), ('b.mp3', None)]
+    assert [(r['to_add'], r['to_delete']) for r in reports] == [(1, 1), (2, 1)]
+    assert sorted(f['filename'] for c in add.delay.call_args_list for f in c.args[0]) == ['a.mp3', 'c.mp3', 'd.mp3']
+    assert delete.delay.call_count == 2
+
+
+def test_sync_storage_skips_when_lock_is_held(monkeypatch, tmp_path, fake_redis):
+    tasks = import_module('app.tasks.core')
+    (tmp_path / 'base').mkdir()
+    monkeypatch.setenv('STORAGE_DIR', str(tmp_path))
+    fake_redis.set(tasks.SYNC_LOCK_KEY, b'other-worker')
+    dispatch = MagicMock()
+    monkeypatch.setattr(tasks, '_dispatch_shards', dispatch)
+
+    assert tasks.sync_storage_with_db.run() == {'mode': 'skipped'}
+    dispatch.assert_not_called()
+
+
+def test_sync_storage_incremental_uses_manifest_delta(monkeypatch, tmp_path, fake_redis):
+    impl = _use_temp_db(monkeypatch, tmp_path)
+    tasks = import_module('app.tasks.core')
+    manifest_mod = import_module('app.utils.storage_manifest')
+    monkeypatch.setattr(manifest_mod, '_MTIME_SETTLE_SECONDS', 0)
+    storage = tmp_path / 'storage'
+    base = storage / 'base'
+    base.mkdir(parents=True)
+    (base / 'a.mp3').write_bytes(b'1')
+    (base / 'b.mp3').write_bytes(b'1')
+    b_id = impl.add_audio_file_sync(user_id=1, filename='b.mp3', original_name='b.mp3', content_type='audio/mpeg',
+                                    size=1, whisper_model='BASE', storage_path='base/b.mp3', audio_duration_seconds=0.0)
+    monkeypatch.setenv('STORAGE_DIR', str(storage))
+    add, delete = MagicMock(), MagicMock()
+    monkeypatch.setattr(tasks, 'enqueue_add_files_bulk', add)
+    monkeypatch.setattr(tasks, 'enqueue_delete_files_bulk', delete)
+    dispatch = MagicMock(side_effect=len)
+    monkeypatch.setattr(tasks, '_dispatch_shards', dispatch)
+
+    report = tasks.sync_storage_with_db.run()
+    assert report['mode'] == 'deep' and report['shards'] == len(dispatch.call_args.args[0])
+    add.reset_mock()
+
+    # ничего не изменилось — папка пропускается без единого SQL-запроса,
+    # манифест не перечитывается и не переписывается
+    manifest_path = manifest_mod.manifest_path_for(str(storage))
+    written = os.stat(manifest_path).st_mtime_ns
+    monkeypatch.setattr(manifest_mod.json, 'load', MagicMock(side_effect=AssertionError('manifest re-read')))
+    report = tasks.sync_storage_with_db.run()
+    assert report['mode'] == 'incremental'
+    assert (report['dirs_scanned'], report['dirs_skipped'], report['queries']) == (0, 1, 0)
+    add.delay.assert_not_called()
+    assert os.stat(manifest_path).st_mtime_ns == written
+
+    (base / 'b.mp3').unlink()
+    (base / 'c.wav').write_bytes(b'333')
+    os.utime(base, ns=(1, 10**18))
+    report = tasks.sync_storage_with_db.run()
+    assert (report['to_add'], report['to_delete'], report['queries']) == (1, 1, 1)
+    assert [f['filename'] for f in add.delay.call_args.args[0]] == ['c.wav']
+    delete.delay.assert_called_once_with([b_id])
+
+
+def test_enqueue_add_files_bulk_dispatches_only_new_rows(monkeypatch, tmp_path, fake_redis):
+    impl = _use_temp_db(monkeypatch, tmp_path)
+    tasks = import_module('app.tasks.core')
+    existing_id = impl.add_audio_file_sync(user_id=1, filename='old.mp3', original_name='old.mp3', content_type='audio/mpeg',
+                                           size=1, whisper_model='BASE', storage_path='base/old.mp3', audio_duration_seconds=0.0)
+    process = MagicMock()
+    monkeypatch.setattr(tasks, 'process_audio_file', process)
+
+    files = [
+        {'filename': name, 'whisper_model': 'base', 'storage_path': f'base/{name}', 'size': 3}
+        for name in ('old.mp3', 'a.mp3', 'b.wav')
+    ]
+    new_ids = tasks.enqueue_add_files_bulk.run(files)
+
+    assert len(new_ids) == 2 and existing_id not in new_ids
+    assert sorted(c.args[0][0] for c in process.apply_async.call_args_list) == sorted(new_ids)
+    # длительность неизвестна (не аудио) — обычная очередь модели
+    assert {c.kwargs['queue'] for c in process.apply_async.call_args_list} == {'asr.base'}
+    assert impl.get_audio_file_sync('a.mp3', 'BASE').content_type == 'audio/unknown'
+    # повторная вставка тех же файлов ничего не создаёт
+    assert tasks.enqueue_add_files_bulk.run(files) == []
+
+
+def test_delete_audio_files_by_ids_sync_chunks(monkeypatch, tmp_path):
+    from app.models.enums import SummaryStatus, TranscriptStatus, TranslationStatus
+    from app.models.summary import Summary
+    from app.models.transcript import Transcript
+    from app.models.translation import Translation
+    impl = _use_temp_db(monkeypatch, tmp_path)
+    files = [{'filename': f'{i}.mp3', 'whisper_model': 'base', 'storage_path': f'base/{i}.mp3', 'size': 1} for i in range(5)]
+    ids = impl.add_audio_files_bulk_sync(files)
+    for audio_file_id in ids:
+        transcript_id = impl.save_transcript_sync(audio_file_id, TranscriptStatus.DONE, text='t')
+        translation_id = impl.save_translation_sync(transcript_id, TranslationStatus.DONE, text_en='t')
+        impl.save_summary_sync(translation_id, SummaryStatus.DONE, 'en', 'ru', text='s')
+
+    with impl.count_queries() as counter:
+        deleted = impl.delete_audio_files_by_ids_sync(ids[:4] + [10_000], chunk_size=2)
+
+    assert deleted == 4
+    assert counter.count == 3
+    assert [key[1] for key in impl.iter_audio_file_keys_sync()] == ['4.mp3']
+    # дочерние строки удаляет ON DELETE CASCADE базы
+    with impl._Session() as s:
+        assert [tr.audio_file_id for tr in s.query(Transcript)] == [ids[4]]
+        assert s.query(Translation).count() == 1 and s.query(Summary).count() == 1
+
+
+def test_dedup_suppresses_repeated_enqueues(monkeypatch, tmp_path, fake_redis):
+    tasks = import_module('app.tasks.core')
+    dedup = import_module('app.tasks.dedup')
+    storage = tmp_path / 'storage'
+    (storage / 'base').mkdir(parents=True)
+    (storage / 'base' / 'a.mp3').write_bytes(b'1')
+    monkeypatch.setenv('STORAGE_DIR', str(storage))
+    add = MagicMock()
+    monkeypatch.setattr(tasks, 'enqueue_add_files_bulk', add)
+    monkeypatch.setattr(tasks, 'enqueue_delete_files_bulk', MagicMock())
+    monkeypatch.setattr(import_module('app.db.ops.sync_impl'), 'iter_audio_file_keys_in_range_sync',
+                        lambda *a, **k: iter(()))
+
+    # watcher уже поставил файл; два тика beat до вставки строки воркером
+    st = (storage / 'base' / 'a.mp3').stat()
+    assert dedup.claim_add('base', 'a.mp3', st.st_size, st.st_mtime_ns)
+    tasks.sync_storage_shard.run('base', 0)
+    tasks.sync_storage_shard.run('base', 0)
+
+    add.delay.assert_not_called()
+    assert dedup.suppressed_counts() == {'add': 2}
+    # после удаления файл с теми же size/mtime снова проходит
+    assert dedup.claim_delete('base', 'a.mp3')
+    assert not dedup.claim_delete('base', 'a.mp3')
+    assert dedup.claim_add('base', 'a.mp3', st.st_size, st.st_mtime_ns)
+
+
+def test_renamed_file_keeps_its_row_and_transcript(monkeypatch, tmp_path, fake_redis):
+    from datetime import datetime
+    from app.models.transcript import Transcript
+    from app.models.enums import TranscriptStatus
+    impl = _use_temp_db(monkeypatch, tmp_path)
+    tasks = import_module('app.tasks.core')
+    storage = tmp_path / 'storage'
+    (storage / 'base').mkdir(parents=True)
+    old = storage / 'base' / 'old.mp3'
+    old.write_bytes(b'123')
+    st = old.stat()
+    row_id = impl.add_audio_file_sync(user_id=1, filename='old.mp3', original_name='old.mp3', content_type='audio/mpeg',
+                                      size=3, whisper_model='BASE', storage_path='base/old.mp3', audio_duration_seconds=0.0,
+                                      file_inode=st.st_ino, file_mtime_ns=st.st_mtime_ns)
+    with impl._Session() as s:
+        now = datetime.now()
+        s.add(Transcript(audio_file_id=row_id, status=TranscriptStatus.DONE, text='t', created_at=now, updated_at=now))
+        s.commit()
+    old.rename(storage / 'base' / 'new.mp3')
+    monkeypatch.setenv('STORAGE_DIR', str(storage))
+    process = MagicMock()
+    monkeypatch.setattr(tasks, 'process_audio_file', process)
+
+    files = [tasks._file_payload('new.mp3', 'base', 3, st.st_mtime_ns, st.st_ino)]
+    assert tasks.enqueue_add_files_bulk.run(files) == []
+
+    process.apply_async.assert_not_called()
+    assert impl.get_audio_file_sync('old.mp3', 'BASE') is None
+    renamed = impl.get_audio_file_sync('new.mp3', 'BASE')
+    assert renamed.id == row_id and renamed.storage_path == os.path.join('base', 'new.mp3')
+    with impl._Session() as s:
+        assert s.query(Transcript).filter_by(audio_file_id=row_id).count() == 1
+
+
+def test_sync_detects_renames_instead_of_delete_and_add(monkeypatch, tmp_path, fake_redis):
+    impl = _use_temp_db(monkeypatch, tmp_path)
+    tasks = import_module('app.tasks.core')
+    monkeypatch.setattr(import_module('app.utils.storage_manifest'), '_MTIME_SETTLE_SECONDS', 0)
+    storage = tmp_path / 'storage'
+    base = storage / 'base'
+    base.mkdir(parents=True)
+    (base / 'a.mp3').write_bytes(b'1')
+    st = (base / 'a.mp3').stat()
+    impl.add_audio_file_sync(user_id=1, filename='a.mp3', original_name='a.mp3', content_type='audio/mpeg', size=1,
+                             whisper_model='BASE', storage_path='base/a.mp3', audio_duration_seconds=0.0,
+                             file_inode=st.st_ino, file_mtime_ns=st.st_mtime_ns)
+    monkeypatch.setenv('STORAGE_DIR', str(storage))
+    add, delete, rename = MagicMock(), MagicMock(), MagicMock()
+    monkeypatch.setattr(tasks, 'enqueue_add_files_bulk', add)
+    monkeypatch.setattr(tasks, 'enqueue_delete_files_bulk', delete)
+    monkeypatch.setattr(tasks, 'enqueue_rename_files_bulk', rename)
+    monkeypatch.setattr(tasks, '_dispatch_shards', MagicMock(side_effect=len))
+    tasks.sync_storage_with_db.run()
+
+    # инкрементальный прогон: пара removed/added с тем же inode — переименование
+    (base / 'a.mp3').rename(base / 'b.mp3')
+    os.utime(base, ns=(1, 10**18))
+    report = tasks.sync_storage_with_db.run()
+    assert (report['to_add'], report['to_delete'], report['to_rename']) == (0, 0, 1)
+    rename.delay.assert_called_once_with('base', [('a.mp3', 'b.mp3')])
+
+    # полная сверка: строка-сирота с тем же inode тоже переименовывается, а не удаляется
+    rename.reset_mock()
+    tasks.sync_storage_with_db.run(deep=True)
+    report = tasks.sync_storage_shard.run('base', 0)
+    assert (report['to_add'], report['to_delete'], report['to_rename']) == (0, 0, 1)
+    rename.delay.assert_called_once_with('base', [('a.mp3', 'b.mp3')])
+    add.delay.assert_not_called()
+    delete.delay.assert_not_called()
+
+
+def test_file_events_batch_applies_in_one_transaction(monkeypatch, tmp_path, fake_redis):
+    impl = _use_temp_db(monkeypatch, tmp_path)
+    tasks = import_module('app.tasks.core')
+    impl.add_audio_files_bulk_sync([
+        {'filename': n, 'whisper_model': 'base', 'storage_path': f'base/{n}', 'size': 1} for n in ('old.mp3', 'same.mp3')
+    ])
+    process = MagicMock()
+    monkeypatch.setattr(tasks, 'process_audio_file', process)
+    adds = [tasks._file_payload(n, 'base', 2) for n in ('new.mp3', 'same.mp3')]
+
+    with impl.count_queries() as counter:
+        result = tasks.enqueue_file_events_batch.run(adds, [['base', 'old.mp3'], ['base', 'missing.mp3']])
+
+    assert result['deleted'] == 1 and len(result['added']) == 1
+    process.apply_async.assert_called_once_with((result['added'][0],), queue='asr.base')
+    assert sorted(k[1] for k in impl.iter_audio_file_keys_sync()) == ['new.mp3', 'same.mp3']
+    assert counter.count == 2
+
+
+def test_file_events_batch_replaces_deleted_and_recreated_file(monkeypatch, tmp_path, fake_redis):
+    from app.models.enums import TranscriptStatus
+    impl = _use_temp_db(monkeypatch, tmp_path)
+    tasks = import_module('app.tasks.core')
+    [old_id] = impl.add_audio_files_bulk_sync([
+        {'filename': 'a.mp3', 'whisper_model': 'base', 'storage_path': 'base/a.mp3', 'size': 1}
+    ])
+    impl.save_transcript_sync(old_id, TranscriptStatus.DONE, text='old')
+    monkeypatch.setattr(tasks, 'process_audio_file', MagicMock())
+
+    result = tasks.enqueue_file_events_batch.run([tasks._file_payload('a.mp3', 'base', 2)], [['base', 'a.mp3']])
+
+    # старая запись удалена вместе с транскриптом, новый файл получил свою запись
+    assert result['deleted'] == 1 and len(result['added']) == 1 and result['added'][0] != old_id
+    assert impl.get_pipeline_state_sync(result['added'][0])['transcript_id'] is None
+
+
+def test_process_audio_file_runs_all_stages(monkeypatch, tmp_path, fake_redis):
+    impl = _use_temp_db(monkeypatch, tmp_path)
+    tasks = _run_tasks_inline(monkeypatch)
+    from app.models.enums import AudioFileStatus, SummaryStatus, TranscriptStatus, TranslationStatus
+    from app.models.transcript import Transcript
+    storage = tmp_path / 'storage'
+    (storage / 'base').mkdir(parents=True)
+    (storage / 'base' / 'a.wav').write_bytes(b'RIFF')
+    monkeypatch.setenv('STORAGE_DIR', str(storage))
+    monkeypatch.setenv('ASR_ENGINE', 'fake')
+    new_id = impl.add_audio_file_sync(1, 'a.wav', 'a.wav', 'audio/wav', 4, 'base', 'base/a.wav', 4.0)
+
+    tasks.process_audio_file.run(new_id)
+
+    assert impl.get_audio_file_by_id_sync(new_id).status == AudioFileStatus.DONE
+    with impl._Session() as s:
+        tr = s.query(Transcript).filter_by(audio_file_id=new_id).one()
+        assert tr.status == TranscriptStatus.DONE
+        assert tr.text.startswith('[base] a.wav') and tr.text_chars == len(tr.text)
+        assert tr.translation.status == TranslationStatus.DONE
+        assert tr.translation.summary.status == SummaryStatus.DONE
+
+
+def test_add_file_persists_probed_duration_and_format(monkeypatch, tmp_path, fake_redis):
+    import wave
+    impl = _use_temp_db(monkeypatch, tmp_path)
+    tasks = import_module('app.tasks.core')
+    storage = tmp_path / 'storage'
+    (storage / 'base').mkdir(parents=True)
+    with wave.open(str(storage / 'base' / 'a.wav'), 'wb') as w:
+        w.setnchannels(1)
+        w.setsampwidth(2)
+        w.setframerate(16000)
+        w.writeframes(b'\x00' * 16000 * 2 * 5)
+    (storage / 'base' / 'b.mp3').write_bytes(b'?')
+    monkeypatch.setenv('STORAGE_DIR', str(storage))
+    process = MagicMock()
+    monkeypatch.setattr(tasks, 'process_audio_file', process)
+
+    new_id = tasks.enqueue_add_file.run('a.wav', 'base', 'base/a.wav', 160044, 'a.wav')
+    [unknown_id] = tasks.enqueue_add_files_bulk.run([tasks._file_payload('b.mp3', 'base', 1)])
+
+    # короткий файл — в короткую полосу модели, неизвестная длительность — в обычную очередь
+    assert [(c.args[0][0], c.kwargs['queue']) for c in process.apply_async.call_args_list] == [
+        (new_id, 'asr.base.short'), (unknown_id, 'asr.base')]
+
+    row = impl.get_audio_file_by_id_sync(new_id)
+    assert (row.audio_duration_seconds, row.sample_rate, row.channels, row.content_type) == (
+        5.0, 16000, 1, 'audio/wav')
+    unknown = impl.get_audio_file_by_id_sync(unknown_id)
+    assert (unknown.audio_duration_seconds, unknown.content_type) == (0.0, 'audio/unknown')
+
+
+def test_short_files_are_batched_into_one_inference_and_transaction(monkeypatch, tmp_path, fake_redis):
+    import wave
+    from app.models.enums import AudioFileStatus, TranscriptStatus
+    from app.models.transcript import Transcript
+    from app.processing.engines import get_engine
+    impl = _use_temp_db(monkeypatch, tmp_path)
+    tasks = import_module('app.tasks.core')
+    storage = tmp_path / 'storage'
+    (storage / 'base').mkdir(parents=True)
+    names = ('a.wav', 'b.wav', 'c.wav')
+    for i, name in enumerate(names):
+        with wave.open(str(storage / 'base' / name), 'wb') as w:
+            w.setnchannels(1)
+            w.setsampwidth(2)
+            w.setframerate(16000)
+            w.writeframes(bytes([i]) * 16000 * 2 * (i + 1))
+    monkeypatch.setenv('STORAGE_DIR', str(storage))
+    monkeypatch.setenv('ASR_ENGINE', 'fake')
+    monkeypatch.setenv('ASR_BATCH_SIZE', '8')
+    monkeypatch.setenv('ASR_BATCH_WAIT_MS', '0')
+    batch_task = tasks.process_audio_batch
+    batch, single = MagicMock(), MagicMock()
+    monkeypatch.setattr(tasks, 'process_audio_batch', batch)
+    monkeypatch.setattr(tasks, 'process_audio_file', single)
+
+    ids = tasks.enqueue_add_files_bulk.run([tasks._file_payload(n, 'base', 1) for n in names])
+
+    # одна задача сборки на пачку, отдельных process_audio_file нет
+    batch.apply_async.assert_called_once_with(('base',), queue='asr.base.short')
+    single.apply_async.assert_not_called()
+
+    followups = MagicMock()
+    monkeypatch.setattr(tasks, '_start_followup_stages', followups)
+    engine = get_engine('fake')
+    batches = engine.batches
+    with impl.count_queries() as counter:
+        done = batch_task.run('base')
+
+    assert sorted(done) == sorted(ids)
+    assert engine.batches == batches + 1
+    # готовые транскрипты: SELECT; claim: SELECT + UPDATE; кэш результатов: UPDATE отпечатков +
+    # SELECT источников; сохранение: SELECT записей, SELECT транскриптов, INSERT, UPDATE статусов
+    assert counter.count == 9
+    with impl._Session() as s:
+        transcripts = {t.audio_file_id: t for t in s.query(Transcript)}
+    # перевод и саммари — следующие этапы, запись остаётся PROCESSING до их завершения
+    assert sorted(followups.call_args_list[-1].args[0]) == sorted(ids)
+    for audio_file_id, name in zip(ids, names):
+        assert impl.get_audio_file_by_id_sync(audio_file_id).status == AudioFileStatus.PROCESSING
+        tr = transcripts[audio_file_id]
+        assert tr.status == TranscriptStatus.DONE and tr.text.startswith(f'[base] {name}')
+        assert tr.processing_seconds is not None
+    # список пуст — следующая задача сборки не ставится, флаг снят
+    batch.apply_async.assert_called_once()
+    assert fake_redis.get('sciber:asr:batch:base:armed') is None
+
+
+def test_batch_ids_survive_worker_crash_and_errors(monkeypatch, fake_redis):
+    from app.tasks import batching
+    tasks = import_module('app.tasks.core')
+    for audio_file_id in (1, 2, 3):
+        batching.push('base', audio_file_id)
+    # воркер забрал пачку задачей t1 и упал: id лежат в её списке «в работе», а не пропали
+    inflight = batching.inflight_key('base', 't1')
+    assert batching.pop('base', 2, 0, inflight) == [1, 2]
+    assert batching.claimed(inflight) == [1, 2]
+
+    processed = MagicMock(return_value=[1, 2])
+    monkeypatch.setattr(tasks, '_process_batch', processed)
+    monkeypatch.setattr(tasks.process_audio_batch, 'apply_async', MagicMock())
+    # повторная доставка того же сообщения продолжает ту же пачку
+    assert tasks.process_audio_batch.apply(('base',), task_id='t1').get() == [1, 2]
+    processed.assert_called_once_with('base', [1, 2])
+    assert batching.claimed(inflight) == []
+
+    # ошибка обработки возвращает id в начало очереди модели
+    monkeypatch.setattr(tasks, '_process_batch', MagicMock(side_effect=RuntimeError('db down')))
+    monkeypatch.setenv('ASR_BATCH_WAIT_MS', '0')
+    assert tasks.process_audio_batch.apply(('base',), task_id='t2').failed()
+    assert batching.claimed(batching.inflight_key('base', 't2')) == []
+    assert batching.pop('base', 8, 0, batching.inflight_key('base', 't3')) == [3]
+
+
+def test_duplicate_upload_copies_results_instead_of_transcribing(monkeypatch, tmp_path, fake_redis):
+    from app.models.enums import AudioFileStatus, TranscriptStatus
+    from app.models.transcript import Transcript
+    from app.processing import transcribe
+    impl = _use_temp_db(monkeypatch, tmp_path)
+    tasks = _run_tasks_inline(monkeypatch)
+    storage = tmp_path / 'storage'
+    for model in ('base', 'small'):
+        (storage / model).mkdir(parents=True)
+    for path in ('base/a.wav', 'base/copy.wav', 'small/a.wav'):
+        (storage / path).write_bytes(b'RIFF same audio')
+    monkeypatch.setenv('STORAGE_DIR', str(storage))
+    monkeypatch.setenv('ASR_ENGINE', 'fake')
+    ids = {path: impl.add_audio_file_sync(1, os.path.basename(path), 'x.wav', 'audio/wav', 15, path.split('/')[0],
+                                          path, 4.0) for path in ('base/a.wav', 'base/copy.wav', 'small/a.wav')}
+
+    tasks.process_audio_file.run(ids['base/a.wav'])
+    with impl._Session() as s:
+        source = s.query(Transcript).filter_by(audio_file_id=ids['base/a.wav']).one()
+        source.translation.text_en = 'hello'
+        source.translation.summary.text = 'short'
+        s.commit()
+    calls = MagicMock(side_effect=transcribe.process)
+    monkeypatch.setattr(transcribe, 'process', calls)
+
+    tasks.process_audio_file.run(ids['base/copy.wav'])
+    tasks.process_audio_file.run(ids['small/a.wav'])
+
+    # копия той же модели — из кэша, другая модель — распознаётся
+    assert [c.args[0] for c in calls.call_args_list] == [str(storage / 'small/a.wav')]
+    assert impl.get_audio_file_by_id_sync(ids['base/copy.wav']).status == AudioFileStatus.DONE
+    with impl._Session() as s:
+        copy = s.query(Transcript).filter_by(audio_file_id=ids['base/copy.wav']).one()
+        assert copy.status == TranscriptStatus.DONE and copy.text == source.text
+        assert copy.processing_seconds == 0.0 and copy.pipeline_version == 'fake/1'
+        assert copy.translation.text_en == 'hello' and copy.translation.summary.text == 'short'
+    hashes = {impl.get_audio_file_by_id_sync(i).content_hash for i in ids.values()}
+    assert len(hashes) == 1 and None not in hashes
+
+    # новая версия конвейера — старые результаты не копируются
+    monkeypatch.setenv('ASR_PIPELINE_VERSION', '2')
+    third = impl.add_audio_file_sync(1, 'b.wav', 'b.wav', 'audio/wav', 15, 'base', 'base/copy.wav', 4.0)
+    tasks.process_audio_file.run(third)
+    assert calls.call_count == 2
+
+
+def test_pipeline_resumes_after_failed_stage_without_retranscribing(monkeypatch, tmp_path, fake_redis):
+    from app.models.enums import AudioFileStatus, TranscriptStatus, TranslationStatus
+    from app.processing import transcribe, translate
+    impl = _use_temp_db(monkeypatch, tmp_path)
+    tasks = _run_tasks_inline(monkeypatch)
+    storage = tmp_path / 'storage'
+    (storage / 'base').mkdir(parents=True)
+    (storage / 'base' / 'a.wav').write_bytes(b'RIFF')
+    monkeypatch.setenv('STORAGE_DIR', str(storage))
+    monkeypatch.setenv('ASR_ENGINE', 'fake')
+    new_id = impl.add_audio_file_sync(1, 'a.wav', 'a.wav', 'audio/wav', 4, 'base', 'base/a.wav', 4.0)
+    asr = MagicMock(side_effect=transcribe.process)
+    monkeypatch.setattr(transcribe, 'process', asr)
+    monkeypatch.setattr(translate, 'process', MagicMock(side_effect=translate.TranslationError('offline')))
+
+    # этап делает retry; после исчерпания попыток ошибка выходит из задачи
+    with pytest.raises(translate.TranslationError):
+        tasks.process_audio_file.run(new_id)
+
+    # транскрипт сохранён до перевода; упавший этап и запись — FAILED, саммари не начиналось
+    state = impl.get_pipeline_state_sync(new_id)
+    assert state['transcript_status'] == TranscriptStatus.DONE
+    assert state['translation_status'] == TranslationStatus.FAILED and state['summary_status'] is None
+    assert impl.get_audio_file_by_id_sync(new_id).status == AudioFileStatus.FAILED
+
+    monkeypatch.setattr(translate, 'process', MagicMock(return_value={'translated_text': 'hi', 'detected_src': 'ru'}))
+    tasks.process_audio_file.run(new_id)
+
+    # повтор продолжает с перевода: распознавание не запускалось второй раз
+    assert asr.call_count == 1
+    state = impl.get_pipeline_state_sync(new_id)
+    assert state['translation_status'] == TranslationStatus.DONE
+    assert (state['source_language'], state['text_en'], state['text_ru']) == ('ru', 'hi', state['transcript_text'])
+    assert impl.get_audio_file_by_id_sync(new_id).status == AudioFileStatus.DONE
+
+
+def test_translation_uses_transcript_language_as_source(monkeypatch, tmp_path):
+    from app.models.enums import TranscriptStatus, TranslationStatus
+    from app.processing import translate
+    impl = _use_temp_db(monkeypatch, tmp_path)
+    tasks = import_module('app.tasks.core')
+    new_id = impl.add_audio_file_sync(1, 'a.wav', 'a.wav', 'audio/wav', 4, 'base', 'base/a.wav', 4.0)
+    impl.save_transcript_sync(new_id, TranscriptStatus.DONE, text='hello', language='en')
+    calls = MagicMock(return_value={'translated_text': 'привет', 'detected_src': 'en'})
+    monkeypatch.setattr(translate, 'process', calls)
+
+    tasks.translate_audio_file.run(new_id)
+
+    # английский транскрипт не переводится на английский: только en -> ru
+    assert [c.args for c in calls.call_args_list] == [('hello', 'en', 'ru')]
+    state = impl.get_pipeline_state_sync(new_id)
+    assert state['translation_status'] == TranslationStatus.DONE
+    assert (state['source_language'], state['text_en'], state['text_ru']) == ('en', 'hello', 'привет')
+
+
+def test_only_processing_tasks_ack_late_within_visibility_timeout():
+    tasks = import_module('app.tasks.core')
+    assert tasks.process_audio_file.acks_late and tasks.process_audio_batch.acks_late
+    assert not tasks.enqueue_add_file.acks_late and not tasks.sync_storage_with_db.acks_late
+    # Redis не переотдаёт сообщение другому воркеру, пока идёт трёхчасовая транскрипция
+    assert tasks.celery_app.conf.broker_transport_options['visibility_timeout'] > 3 * 3600
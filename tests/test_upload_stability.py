@@ -0,0 +1,54 @@
+"""
+Тесты детектора завершения загрузки `app.utils.upload_stability`.
+"""
+
+import time
+
+from app.utils.debounce import DebounceScheduler
+from app.utils.upload_stability import StabilityTracker
+
+
+def _wait_for(predicate, timeout=3.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.01)
+    return False
+
+
+def test_growing_file_is_reported_once_after_it_stops_changing(tmp_path):
+    scheduler = DebounceScheduler('test-stability')
+    stable = []
+    tracker = StabilityTracker(scheduler, lambda key, path, st: stable.append((key, st.st_size)), 0.1, 1.0)
+    path = tmp_path / 'big.mp3'
+    try:
+        with open(path, 'wb') as fh:
+            for _ in range(5):
+                fh.write(b'x' * 1024)
+                fh.flush()
+                tracker.touch('big', str(path))
+                time.sleep(0.05)
+        assert stable == []
+        assert _wait_for(lambda: stable)
+        assert stable == [('big', 5 * 1024)]
+        assert tracker.pending() == 0
+    finally:
+        scheduler.stop()
+
+
+def test_closed_file_skips_quiet_interval_and_cancel_drops_it(tmp_path):
+    scheduler = DebounceScheduler('test-stability')
+    stable = []
+    tracker = StabilityTracker(scheduler, lambda key, path, st: stable.append(key), 30, 60)
+    (tmp_path / 'a.mp3').write_bytes(b'1')
+    (tmp_path / 'b.mp3').write_bytes(b'1')
+    try:
+        tracker.touch('a', str(tmp_path / 'a.mp3'))
+        tracker.touch('b', str(tmp_path / 'b.mp3'))
+        tracker.closed('a')
+        assert _wait_for(lambda: stable == ['a'])
+        tracker.cancel('b')
+        assert tracker.pending() == 0
+    finally:
+        scheduler.stop()
@@ -0,0 +1,48 @@
+"""
+Тесты сервиса watcher'а: выбор единственного лидера через Redis.
+"""
+
+import threading
+import time
+
+from app import watcher_service
+
+
+def _wait_for(predicate, timeout=3.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.01)
+    return False
+
+
+def test_single_leader_and_failover(fake_redis):
+    active = []
+
+    def make_watch(name):
+        def watch(leader_lost):
+            active.append(name)
+            leader_lost.wait()
+            active.remove(name)
+        return watch
+
+    stops = {name: threading.Event() for name in ('a', 'b')}
+    services = {
+        name: threading.Thread(target=watcher_service.run_as_leader,
+                               args=(stops[name], fake_redis, 0.3, make_watch(name)), daemon=True)
+        for name in ('a', 'b')
+    }
+    services['a'].start()
+    assert _wait_for(lambda: active == ['a'])
+    services['b'].start()
+    time.sleep(0.5)
+    # lock продлевается heartbeat'ом — второй экземпляр остаётся в резерве
+    assert active == ['a']
+
+    stops['a'].set()
+    services['a'].join(timeout=2)
+    assert _wait_for(lambda: active == ['b'])
+    stops['b'].set()
+    services['b'].join(timeout=2)
+    assert active == [] and fake_redis.get(watcher_service.leader_key()) is None